@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Claude CLI 分析守护进程
+常驻内存保存扫描清单、逐文件解析结果和分析结果，通过 Unix 域套接字响应请求，
+避免每次调用都重新启动进程、导入模块、读取清单
+
+启动:  python analyzer_daemon.py [--socket PATH]
+调用:  python task_scheduler.py --daemon -t T04
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import threading
+import socketserver
+from pathlib import Path
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from task_scheduler import TaskScheduler
+from shared.models import SessionFile, ScanResult
+from shared.manifest import SCAN_RESULT_RELPATH, load_scan_result, filter_scan_result
+from shared.record_cache import read_jsonl_records, default_record_cache
+from shared.json_backend import read_json_file
+from shared.record_filter import RecordFilter, build_record_filter
+from shared.daemon import default_socket_path, prepare_socket_dir, send_request, DaemonUnavailableError
+from shared.utils import setup_logging, format_bytes
+
+
+# 逐文件解析结果缓存的默认内存预算（按文件大小估算）
+DEFAULT_RECORD_CACHE_MB = 512
+
+# 最多保留的分析结果数
+MAX_MEMO_ENTRIES = 64
+
+# query 请求默认返回的记录数
+DEFAULT_QUERY_LIMIT = 100
+
+
+class RecordCache:
+    """逐文件解析结果的 LRU 缓存，文件大小或修改时间变化后自动失效"""
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.entries: "OrderedDict[str, Tuple[tuple, List[Any]]]" = OrderedDict()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.logger = setup_logging("Daemon_RecordCache")
+
+    def get(self, session_file: SessionFile) -> List[Any]:
+        """返回文件中的全部记录（jsonl 每行一条，json 整个文件一条）"""
+        stat = os.stat(session_file.path)
+        key = (stat.st_size, stat.st_mtime_ns)
+
+        entry = self.entries.get(session_file.path)
+        if entry and entry[0] == key:
+            self.entries.move_to_end(session_file.path)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        records = self._parse(session_file)
+        self._put(session_file.path, key, records)
+        return records
+
+    def query(self, session_file: SessionFile, record_filter: RecordFilter) -> List[Any]:
+        """
+        返回文件中满足条件的记录
+
+        已缓存的文件直接过滤缓存的记录；未缓存的会话文件在原始字节上预筛选，只解码候选行，结果不进入缓存
+        """
+        stat = os.stat(session_file.path)
+        entry = self.entries.get(session_file.path)
+        if (entry and entry[0] == (stat.st_size, stat.st_mtime_ns)) or session_file.file_type != "jsonl":
+            return [record for record in self.get(session_file) if record_filter.matches(record)]
+
+        records, error = read_jsonl_records(session_file.path, record_filter=record_filter)
+        if error is not None:
+            self.logger.warning(f"文件处理错误 {session_file.path}: {error}")
+        return records
+
+    def _parse(self, session_file: SessionFile) -> List[Any]:
+        """会话文件经由磁盘上的解析结果缓存读取"""
+        if session_file.file_type == "jsonl":
+            records, error = read_jsonl_records(session_file.path)
+            if error is not None:
+                self.logger.warning(f"文件处理错误 {session_file.path}: {error}")
+            return records
+
+        try:
+            return [read_json_file(session_file.path)]
+        except Exception as e:
+            self.logger.warning(f"文件处理错误 {session_file.path}: {e}")
+        return []
+
+    def _put(self, path: str, key: tuple, records: List[Any]) -> None:
+        if path in self.entries:
+            self.cached_bytes -= self.entries.pop(path)[0][0]
+        self.entries[path] = (key, records)
+        self.cached_bytes += key[0]
+
+        while self.cached_bytes > self.budget_bytes and len(self.entries) > 1:
+            _, (old_key, _) = self.entries.popitem(last=False)
+            self.cached_bytes -= old_key[0]
+
+
+class AnalyzerDaemon:
+    """分析守护进程：持有进程内调度器及各类缓存，串行处理耗时请求"""
+
+    def __init__(self, base_dir: str = None, record_cache_mb: int = DEFAULT_RECORD_CACHE_MB):
+        self.scheduler = TaskScheduler(base_dir, mode="inprocess")
+        self.records = RecordCache(record_cache_mb * 1024 * 1024)
+        self.memo: "OrderedDict[tuple, Any]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.requests_served = 0
+        self.logger = setup_logging("AnalyzerDaemon")
+
+        self.commands = {
+            "ping": self.cmd_ping,
+            "stats": self.cmd_stats,
+            "run": self.cmd_run,
+            "reload": self.cmd_reload,
+            "analyze": self.cmd_analyze,
+            "session_types": self.cmd_session_types,
+            "query": self.cmd_query,
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """处理一个请求，异常转换为错误响应"""
+        start = time.monotonic()
+        command = request.get("command")
+        handler = self.commands.get(command)
+
+        try:
+            if handler is None:
+                raise ValueError(f"未知命令: {command} (可用: {', '.join(self.commands)}, shutdown)")
+            if command in ("ping", "stats"):
+                result = handler(request)
+            else:
+                with self.lock:
+                    result = handler(request)
+            response = {"ok": True, "result": result}
+        except Exception as e:
+            self.logger.exception(f"请求失败: {request}")
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+        self.requests_served += 1
+        response["elapsed"] = round(time.monotonic() - start, 4)
+        return response
+
+    # ---- 扫描清单 ----
+
+    def scan_result(self) -> ScanResult:
+        """常驻的扫描清单：优先用进程内上下文，其次读 T06 输出，都没有时执行 T06"""
+        context = self.scheduler.context.get("T06") or {}
+        if context.get("scan_result") is not None:
+            return context["scan_result"]
+
+        scan_result_file = self.scheduler.outputs_dir / SCAN_RESULT_RELPATH
+        if not scan_result_file.exists():
+            self._run_tasks(["T06"], force=False)
+            return self.scheduler.context["T06"]["scan_result"]
+
+        scan_result = load_scan_result(str(scan_result_file))
+        self.scheduler.context["T06"] = {"scan_result": scan_result}
+        return scan_result
+
+    def _select(self, request: Dict[str, Any]) -> ScanResult:
+        project, session_id = request.get("project"), request.get("session_id")
+        scan_result = self.scan_result()
+        if project is None and session_id is None:
+            return scan_result
+        return filter_scan_result(scan_result, project, session_id)
+
+    def _memo_key(self, name: str, request: Dict[str, Any], scan_result: ScanResult) -> tuple:
+        """结果缓存键：请求参数 + 相关文件的当前大小与修改时间"""
+        stamps = []
+        for f in scan_result.files:
+            try:
+                stat = os.stat(f.path)
+                stamps.append((f.path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stamps.append((f.path, None, None))
+        return (name, request.get("task"), request.get("project"), request.get("session_id"), tuple(stamps))
+
+    def _memoized(self, key: tuple, compute):
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            return self.memo[key]
+
+        value = compute()
+        self.memo[key] = value
+        while len(self.memo) > MAX_MEMO_ENTRIES:
+            self.memo.popitem(last=False)
+        return value
+
+    # ---- 命令 ----
+
+    def cmd_ping(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "started": self.started.isoformat()}
+
+    def cmd_stats(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        scan = (self.scheduler.context.get("T06") or {}).get("scan_result")
+        disk_cache = default_record_cache()
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round((datetime.now() - self.started).total_seconds(), 1),
+            "requests_served": self.requests_served,
+            "manifest_files": scan.total_files if scan else None,
+            "record_cache": {
+                "files": len(self.records.entries),
+                "bytes": self.records.cached_bytes,
+                "hits": self.records.hits,
+                "misses": self.records.misses
+            },
+            "disk_record_cache": disk_cache.stats() if disk_cache else None,
+            "memo_entries": len(self.memo)
+        }
+
+    def cmd_run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """执行调度器任务（自动补齐依赖，未变化的依赖会命中缓存）"""
+        return self._run_tasks(request.get("tasks"), request.get("force", False), request.get("jobs", 1))
+
+    def cmd_reload(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """重新扫描数据源，刷新常驻的扫描清单"""
+        result = self._run_tasks(["T06"], force=request.get("force", False))
+        scan_result = self.scan_result()
+        result["manifest_files"] = scan_result.total_files
+        return result
+
+    def cmd_analyze(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """对整个数据源或指定项目/Session 执行一个分析任务，直接返回结果而不写输出文件"""
+        task = request.get("task")
+        analyzers = {
+            "T01": self._analyze_fields,
+            "T02": self._analyze_types,
+            "T04": self._analyze_inheritance,
+            "T05": self._analyze_relationships,
+        }
+        if task not in analyzers:
+            raise ValueError(f"不支持的分析任务: {task} (可用: {', '.join(analyzers)})")
+
+        scan_result = self._select(request)
+        if not scan_result.files:
+            raise ValueError("没有匹配的文件")
+
+        key = self._memo_key("analyze", request, scan_result)
+        return self._memoized(key, lambda: analyzers[task](scan_result))
+
+    def cmd_session_types(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """返回指定 Session 中出现的 T02 结构类型及出现次数"""
+        from tasks.T02_message_structure_type.type_analyzer import ObjectTypeAnalyzer
+
+        session_id = request.get("session_id")
+        if not session_id:
+            raise ValueError("缺少 session_id")
+
+        scan_result = self._select({"session_id": session_id})
+        session_files = [f for f in scan_result.files if f.file_type == "jsonl"]
+        if not session_files:
+            raise ValueError(f"Session 不存在: {session_id}")
+
+        def compute():
+            analyzer = ObjectTypeAnalyzer()
+            for session_file in session_files:
+                for record in self.records.get(session_file):
+                    analyzer.analyze_record(record)
+
+            types = sorted(analyzer.object_types.values(), key=lambda t: t.count, reverse=True)
+            return {
+                "session_id": session_id,
+                "files": [f.path for f in session_files],
+                "total_objects": analyzer.total_objects,
+                "type_count": len(types),
+                "types": [{"signature": t.structure_signature, "count": t.count} for t in types]
+            }
+
+        return self._memoized(self._memo_key("session_types", {"session_id": session_id}, scan_result), compute)
+
+    def cmd_query(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        返回整个数据源或指定项目/Session 中满足条件的记录
+
+        请求参数（各条件同时满足）:
+            where: {字段路径: 值或值列表}，如 {"type": "assistant", "message.role": ["user", "assistant"]}
+            has: 必须存在的字段路径列表，如 ["message.usage"]
+            text: 某个字符串值中包含的文本
+            limit: 最多返回的记录数（默认 100，计数不受限制）
+        """
+        record_filter = build_record_filter(request.get("where"), tuple(request.get("has") or ()),
+                                            request.get("text"))
+        if record_filter is None:
+            raise ValueError("缺少查询条件 (where/has/text)")
+        limit = request.get("limit", DEFAULT_QUERY_LIMIT)
+
+        scan_result = self._select(request)
+        matched = 0
+        records = []
+        for file_info in scan_result.files:
+            found = self.records.query(file_info, record_filter)
+            matched += len(found)
+            records.extend(found[:max(0, limit - len(records))])
+
+        return {
+            "filter": record_filter.description,
+            "files_scanned": len(scan_result.files),
+            "matched": matched,
+            "records": records
+        }
+
+    # ---- 实现 ----
+
+    def _run_tasks(self, tasks: Optional[List[str]], force: bool, jobs: int = 1) -> Dict[str, Any]:
+        scheduler = self.scheduler
+        task_ids = self._with_dependencies(tasks) if tasks else None
+
+        scheduler.use_cache = not force
+        scheduler.jobs = max(1, jobs)
+        start = time.monotonic()
+        results = scheduler.run_all_tasks(task_ids)
+
+        return {
+            "total_duration": round(time.monotonic() - start, 3),
+            "task_results": {
+                task_id: {
+                    "name": scheduler.tasks[task_id]["name"],
+                    "status": result.status.value,
+                    "duration": result.duration,
+                    "output_files": result.output_files,
+                    "error_message": result.error_message,
+                    "metrics": result.metrics
+                }
+                for task_id, result in results.items()
+            }
+        }
+
+    def _with_dependencies(self, tasks: List[str]) -> List[str]:
+        """补齐所请求任务的全部上游依赖"""
+        needed, stack = set(), list(tasks)
+        while stack:
+            task_id = stack.pop()
+            if task_id in needed or task_id not in self.scheduler.tasks:
+                continue
+            needed.add(task_id)
+            stack.extend(self.scheduler.tasks[task_id].get("dependencies", []))
+        return sorted(needed)
+
+    def _analyze_fields(self, scan_result: ScanResult) -> Dict[str, Any]:
+        from tasks.T01_deep_field_extraction.field_extractor import FieldExtractor, build_field_outputs
+
+        extractor = FieldExtractor()
+        for file_info in scan_result.files:
+            for record in self.records.get(file_info):
+                extractor.extract_from_record(record)
+            extractor.total_files += 1
+        return build_field_outputs(extractor.get_result())["deduplicated_fields.json"]
+
+    def _analyze_types(self, scan_result: ScanResult) -> Dict[str, Any]:
+        from tasks.T02_message_structure_type.type_analyzer import ObjectTypeAnalyzer
+
+        analyzer = ObjectTypeAnalyzer()
+        for file_info in scan_result.files:
+            for record in self.records.get(file_info):
+                analyzer.analyze_record(record)
+            analyzer.total_files += 1
+        return analyzer.get_type_summary()
+
+    def _analyze_inheritance(self, scan_result: ScanResult) -> Dict[str, Any]:
+        from tasks.T04_session_inheritance.inheritance_analyzer import SessionInheritanceAnalyzer
+        return SessionInheritanceAnalyzer().analyze_session_inheritance(scan_result)
+
+    def _analyze_relationships(self, scan_result: ScanResult) -> Dict[str, Any]:
+        from tasks.T05_session_todos_relationship.relationship_analyzer import SessionTodosRelationshipAnalyzer
+        return SessionTodosRelationshipAnalyzer().analyze_relationship_patterns(scan_result)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """每行一个JSON请求，同一连接上可以连续发送多个请求"""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                response = {"ok": False, "error": f"无效的JSON请求: {e}"}
+            else:
+                if request.get("command") == "shutdown":
+                    response = {"ok": True, "result": "shutting down"}
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                else:
+                    response = self.server.daemon_state.handle(request)
+
+            self.wfile.write((json.dumps(response, ensure_ascii=False, default=str) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str, daemon: AnalyzerDaemon) -> None:
+    """在 Unix 域套接字上提供服务，直到收到 shutdown 请求或中断"""
+    prepare_socket_dir(socket_path)
+    if os.path.exists(socket_path):
+        try:
+            send_request({"command": "ping"}, socket_path, timeout=2)
+        except (DaemonUnavailableError, OSError):
+            os.unlink(socket_path)  # 上次异常退出留下的套接字
+        else:
+            raise RuntimeError(f"守护进程已在运行: {socket_path}")
+
+    # 在收紧的 umask 下绑定：套接字创建时即只允许本用户连接，不存在先创建、后 chmod 之间的窗口
+    previous_umask = os.umask(0o077)
+    try:
+        server = _DaemonServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(previous_umask)
+    server.daemon_state = daemon
+    os.chmod(socket_path, 0o600)
+
+    print(f"🛰️ 分析守护进程已启动 (pid {os.getpid()})")
+    print(f"   套接字: {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print("👋 分析守护进程已退出")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Claude CLI 分析守护进程")
+    parser.add_argument("--socket", "-s", default=None, help=f"Unix 套接字路径 (默认: {default_socket_path()})")
+    parser.add_argument("--base-dir", "-b", help="指定基础目录")
+    parser.add_argument("--record-cache-mb", type=int, default=DEFAULT_RECORD_CACHE_MB,
+                        help=f"逐文件解析结果缓存的内存预算 (默认: {DEFAULT_RECORD_CACHE_MB} MB)")
+    parser.add_argument("--warm", action="store_true", help="启动时预先加载扫描清单")
+    args = parser.parse_args()
+
+    daemon = AnalyzerDaemon(args.base_dir, record_cache_mb=args.record_cache_mb)
+    if args.warm:
+        scan_result = daemon.scan_result()
+        print(f"📋 已加载扫描清单: {scan_result.total_files} 个文件, {format_bytes(scan_result.total_size)}")
+
+    serve(args.socket or default_socket_path(), daemon)
+
+
+if __name__ == "__main__":
+    main()
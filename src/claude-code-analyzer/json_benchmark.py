@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+JSON 解码后端基准测试
+从本机会话记录中取样，比较原有的文本逐行解码与各可用后端（shared/json_backend.py）的吞吐量，
+以及整文件读取时原有的文本方式与内存映射方式（shared/jsonl.py）的吞吐量和触发的垃圾回收次数，
+和只取部分记录时完整解析后过滤与字节级预筛选（shared/record_filter.py）的差别
+
+用法:  python json_benchmark.py [--sample-mb 64] [--repeat 3]
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import List, Tuple
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from shared.json_backend import JSON_BACKEND_ENV, available_backends, get_backend, decode_jsonl_lines
+from shared.jsonl import read_jsonl_file
+from shared.record_filter import RecordFilter, field_equals, has_field, contains_text
+from shared.utils import format_bytes
+
+
+def sample_lines(projects_dir: Path, sample_bytes: int) -> Tuple[List[bytes], int, List[str]]:
+    """按路径顺序读取会话文件的行，直到总量达到 sample_bytes，返回 (行列表, 字节数, 涉及的文件)"""
+    lines = []
+    total = 0
+    files = []
+    for path in sorted(projects_dir.glob("*/*.jsonl")):
+        files.append(str(path))
+        with open(path, 'rb') as f:
+            for line in f:
+                lines.append(line)
+                total += len(line)
+                if total >= sample_bytes:
+                    return lines, total, files
+    return lines, total, files
+
+
+def read_text_files(files: List[str]) -> int:
+    """原有方式：以文本方式打开，逐行 strip() 后用标准库解析"""
+    records = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return len(records)
+
+
+def read_mapped_files(files: List[str]) -> int:
+    """内存映射整个文件，按行把切片交给当前后端"""
+    records = []
+    for path in files:
+        read_jsonl_file(path, records)
+    return len(records)
+
+
+def filter_after_parse(record_filter: RecordFilter):
+    """完整解析每个文件后再过滤"""
+    def decode(files: List[str]) -> int:
+        records = []
+        for path in files:
+            read_jsonl_file(path, records)
+        return sum(1 for record in records if record_filter.matches(record))
+    return decode
+
+
+def filter_pushdown(record_filter: RecordFilter):
+    """在原始字节上预筛选，只解码候选行"""
+    def decode(files: List[str]) -> int:
+        records = []
+        for path in files:
+            read_jsonl_file(path, records, record_filter=record_filter)
+        return len(records)
+    return decode
+
+
+def decode_text_lines(lines: List[bytes]) -> int:
+    """原有方式：逐行 UTF-8 解码、strip() 后用标准库解析"""
+    records = []
+    for line in lines:
+        text = line.decode('utf-8').strip()
+        if not text:
+            continue
+        try:
+            records.append(json.loads(text))
+        except json.JSONDecodeError:
+            continue
+    return len(records)
+
+
+def measure(decode, sample, repeat: int) -> Tuple[float, int, int]:
+    """多次执行取最短耗时，返回 (秒, 记录数, 最后一次执行触发的垃圾回收次数)"""
+    best = None
+    count = 0
+    collections = 0
+    for _ in range(repeat):
+        gc.collect()
+        before = sum(stat["collections"] for stat in gc.get_stats())
+        start = time.perf_counter()
+        count = decode(sample)
+        elapsed = time.perf_counter() - start
+        collections = sum(stat["collections"] for stat in gc.get_stats()) - before
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count, collections
+
+
+def report(candidates, sample, total: int, repeat: int, chosen: str) -> None:
+    """依次测量并输出各方式的吞吐量，倍数相对第一种方式"""
+    baseline = None
+    for label, decode in candidates:
+        elapsed, count, collections = measure(decode, sample, repeat)
+        throughput = total / 1024 / 1024 / elapsed if elapsed > 0 else float('inf')
+        baseline = baseline or throughput
+        marker = " ⭐" if label == chosen else ""
+        print(f"   {label:<20s} {throughput:8.1f} MB/s  {elapsed:6.3f}秒  {count:,} 条记录  "
+              f"GC {collections:4d}次  x{throughput / baseline:.2f}{marker}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="JSON 解码后端基准测试")
+    parser.add_argument("--data-dir", default=os.path.expanduser("~/.claude/projects"),
+                        help="会话记录目录 (默认: ~/.claude/projects)")
+    parser.add_argument("--sample-mb", type=float, default=64, help="取样的数据量 (默认: 64 MB)")
+    parser.add_argument("--repeat", type=int, default=3, help="每个后端的重复次数，取最短耗时 (默认: 3)")
+    args = parser.parse_args()
+
+    lines, total, files = sample_lines(Path(args.data_dir), int(args.sample_mb * 1024 * 1024))
+    if not lines:
+        print(f"❌ 没有找到会话文件: {args.data_dir}")
+        sys.exit(1)
+
+    chosen = get_backend()
+    print("⏱️ JSON 解码后端基准测试")
+    print("=" * 50)
+    print(f"   样本: {len(lines):,} 行, {format_bytes(total)}")
+    print(f"   可用后端: {', '.join(available_backends())}")
+    print(f"   当前选择: {chosen.name}" + (f" (由 {JSON_BACKEND_ENV} 指定)" if os.environ.get(JSON_BACKEND_ENV) else ""))
+    print()
+
+    def run_backend(backend):
+        def decode(sample):
+            records = []
+            decode_jsonl_lines(sample, records, backend)
+            return len(records)
+        return decode
+
+    print("🧮 逐行解码:")
+    candidates = [("文本逐行 (原有方式)", decode_text_lines)]
+    candidates += [(name, run_backend(get_backend(name))) for name in available_backends()]
+    report(candidates, lines, total, args.repeat, chosen.name)
+
+    file_bytes = sum(os.path.getsize(path) for path in files)
+    print(f"\n📂 整文件读取 ({len(files)} 个文件, {format_bytes(file_bytes)}):")
+    report([("文本方式 (原有方式)", read_text_files), (f"内存映射 + {chosen.name}", read_mapped_files)],
+           files, file_bytes, args.repeat, "")
+
+    for record_filter in (field_equals("type", "assistant"), has_field("message.usage"),
+                          field_equals("type", "summary"), contains_text("TodoWrite")):
+        print(f"\n🔎 过滤读取 {record_filter.description}:")
+        report([("完整解析后过滤", filter_after_parse(record_filter)), ("字节级预筛选", filter_pushdown(record_filter))],
+               files, file_bytes, args.repeat, "")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+会话压实工具
+把项目的会话文件 (.jsonl) 改写为紧凑归档 (.cjsonl)：大字符串存入按内容摘要寻址的 blob 仓库
+(~/.claude/projects/.blobs)，相同内容只保存一份（见 shared/compaction.py）。各任务照常读取归档，结果与原会话文件相同。
+
+每个文件压实后先逐条还原比对，与原文件完全一致才替换原文件（保留修改时间）；含无效 UTF-8 或比对不一致的文件保持原样。
+Claude CLI 无法继续归档后的会话，只应压实不再使用的旧会话（--older-than-days）。
+
+用法:
+    python session_compactor.py PROJECT [PROJECT ...] [--older-than-days 30] [--min-blob-chars 1024]
+    python session_compactor.py --all
+    python session_compactor.py PROJECT --expand    # 还原为 .jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, List, Optional
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from shared.compaction import (COMPACT_SUFFIX, BLOB_DIRNAME, DEFAULT_MIN_BLOB_CHARS, BlobStore,
+                               CompactionStats, compact_session, expand_session, rehydrate)
+from shared.utils import format_bytes
+
+
+def load_text_records(path: str, store: Optional[BlobStore] = None) -> List[Any]:
+    """按原有的文本方式逐行解析（无法解析的行保留原文），给定 store 时还原 blob 引用"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                records.append(("<invalid>", line))
+                continue
+            records.append(rehydrate(record, store) if store else record)
+    return records
+
+
+def compact_file(path: Path, store: BlobStore, min_chars: int) -> Optional[CompactionStats]:
+    """压实单个会话文件，比对一致后替换原文件；未替换时返回 None"""
+    target = path.with_name(path.name[:-len(".jsonl")] + COMPACT_SUFFIX)
+    partial = path.with_name(path.name + ".partial")
+    try:
+        stats = compact_session(str(path), str(partial), store, min_chars)
+        if load_text_records(str(partial), store) != load_text_records(str(path)):
+            print(f"   ⚠️ 还原结果与原文件不一致，保持原样: {path.name}")
+            return None
+        stat = os.stat(path)
+        os.replace(partial, target)
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.remove(path)
+        return stats
+    except UnicodeDecodeError:
+        print(f"   ⚠️ 含无效的 UTF-8，保持原样: {path.name}")
+        return None
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+
+def expand_file(path: Path, store: BlobStore) -> bool:
+    """把紧凑归档还原为 .jsonl，成功后删除归档"""
+    target = path.with_name(path.name[:-len(COMPACT_SUFFIX)] + ".jsonl")
+    partial = target.with_name(target.name + ".partial")
+    try:
+        expand_session(str(path), str(partial), store)
+        stat = os.stat(path)
+        os.replace(partial, target)
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.remove(path)
+        return True
+    except OSError as e:
+        print(f"   ❌ 无法还原 {path.name}: {e}")
+        return False
+    finally:
+        if partial.exists():
+            partial.unlink()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="会话压实工具")
+    parser.add_argument("projects", nargs="*", help="要处理的项目目录名")
+    parser.add_argument("--all", action="store_true", help="处理全部项目")
+    parser.add_argument("--data-dir", default=os.path.expanduser("~/.claude/projects"),
+                        help="会话记录目录 (默认: ~/.claude/projects)")
+    parser.add_argument("--older-than-days", type=float, default=30,
+                        help="只压实修改时间早于该天数的会话 (默认: 30)")
+    parser.add_argument("--min-blob-chars", type=int, default=DEFAULT_MIN_BLOB_CHARS,
+                        help=f"存入 blob 仓库的最短字符串 (默认: {DEFAULT_MIN_BLOB_CHARS} 个字符)")
+    parser.add_argument("--expand", action="store_true", help="把紧凑归档还原为 .jsonl")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    if args.all:
+        projects = sorted(p.name for p in data_dir.iterdir() if p.is_dir() and p.name != BLOB_DIRNAME)
+    else:
+        projects = args.projects
+    if not projects:
+        parser.error("需要指定项目或 --all")
+
+    store = BlobStore(data_dir / BLOB_DIRNAME)
+    cutoff = time.time() - args.older_than_days * 86400
+
+    print("🗜️ 会话压实" + (" (还原)" if args.expand else ""))
+    print("=" * 50)
+
+    total = CompactionStats()
+    files = 0
+    for project in projects:
+        project_dir = data_dir / project
+        if not project_dir.is_dir():
+            print(f"❌ 项目不存在: {project_dir}")
+            continue
+
+        if args.expand:
+            expanded = sum(expand_file(path, store) for path in sorted(project_dir.glob(f"*{COMPACT_SUFFIX}")))
+            print(f"📂 {project}: 还原 {expanded} 个会话")
+            files += expanded
+            continue
+
+        candidates = [p for p in sorted(project_dir.glob("*.jsonl")) if p.stat().st_mtime < cutoff]
+        compacted = 0
+        for path in candidates:
+            stats = compact_file(path, store, args.min_blob_chars)
+            if stats is None:
+                continue
+            compacted += 1
+            total.source_bytes += stats.source_bytes
+            total.compact_bytes += stats.compact_bytes
+            total.records += stats.records
+            total.blob_refs += stats.blob_refs
+        print(f"📂 {project}: 压实 {compacted}/{len(candidates)} 个会话")
+        files += compacted
+
+    if args.expand:
+        print(f"\n✅ 共还原 {files} 个会话 (blob 仓库保持不变: {store.root})")
+        return
+
+    stored = total.compact_bytes + store.written_bytes
+    print(f"\n✅ 共压实 {files} 个会话, {total.records:,} 条记录")
+    print(f"   原大小: {format_bytes(total.source_bytes)}")
+    print(f"   归档: {format_bytes(total.compact_bytes)}, 新增 blob: {store.written} 个 {format_bytes(store.written_bytes)}"
+          f" (引用 {total.blob_refs:,} 次, 复用已有 blob {store.reused:,} 次)")
+    if total.source_bytes:
+        print(f"   压实后占用: {format_bytes(stored)} ({stored / total.source_bytes:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,15 @@ Claude CLI 分析器 - 共享组件
 
 from .models import SessionFile, ScanResult, FieldInfo, AnalysisResult
 from .base_analyzer import BaseAnalyzer, FileBasedAnalyzer, ProgressMixin
+from .progress import ProgressReporter  # 子进程模式下导入时注册退出时的内存峰值上报
+from .manifest import (
+    build_scan_report,
+    scan_result_from_report,
+    filter_scan_result,
+    shard_scan_result,
+    load_scan_result,
+    resolve_scan_result
+)
 from .utils import (
     normalize_array_indices,
     generate_structure_signature,
@@ -17,7 +26,10 @@ from .utils import (
     safe_get,
     create_output_structure,
     find_common_patterns,
-    merge_analysis_results
+    merge_analysis_results,
+    save_json_outputs,
+    resolve_upstream_output,
+    MissingDependencyError
 )
 
 __version__ = "3.0.0"
@@ -32,6 +44,15 @@ __all__ = [
     "BaseAnalyzer",
     "FileBasedAnalyzer", 
     "ProgressMixin",
+    "ProgressReporter",
+    
+    # 扫描清单
+    "build_scan_report",
+    "scan_result_from_report",
+    "filter_scan_result",
+    "shard_scan_result",
+    "load_scan_result",
+    "resolve_scan_result",
     
     # 工具函数
     "normalize_array_indices",
@@ -45,5 +66,8 @@ __all__ = [
     "safe_get",
     "create_output_structure",
     "find_common_patterns",
-    "merge_analysis_results"
+    "merge_analysis_results",
+    "save_json_outputs",
+    "resolve_upstream_output",
+    "MissingDependencyError"
 ]
\ No newline at end of file
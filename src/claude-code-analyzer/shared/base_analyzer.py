@@ -7,15 +7,22 @@ import json
 import time
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional
 from datetime import datetime
 
 from .models import SessionFile, ScanResult
+from .record_cache import read_jsonl_records
+from .jsonl import iter_jsonl_file
+from .json_backend import read_json_file
+from .compressed import is_session_path
 
 
 class BaseAnalyzer(ABC):
     """基础分析器抽象类"""
     
+    # iter_record_batches / process_batch 每批的记录数
+    record_batch_size = 1000
+    
     def __init__(self, name: str, version: str = "1.0.0"):
         self.name = name
         self.version = version
@@ -54,20 +61,52 @@ class BaseAnalyzer(ABC):
         print(f"❌ 错误: {error}")
         
     def load_json_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """加载JSON文件"""
+        """加载JSON文件（jsonl 优先使用解析结果缓存）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                if file_path.endswith('.jsonl'):
-                    # JSON Lines格式
-                    return [json.loads(line.strip()) for line in f if line.strip()]
-                else:
-                    # 标准JSON格式
-                    data = json.load(f)
-                    return [data] if isinstance(data, dict) else data
+            if is_session_path(file_path):
+                # JSON Lines格式，任何一行无法解析都视为读取失败
+                records, error = read_jsonl_records(file_path, strict=True)
+                if error is not None:
+                    raise error
+                return records
+            else:
+                # 标准JSON格式
+                data = read_json_file(file_path)
+                return [data] if isinstance(data, dict) else data
         except Exception as e:
             self.log_error(f"读取文件失败: {e}", file_path)
             return []
             
+    def iter_record_batches(self, file_path: str, batch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        分批产出文件中的记录（load_json_file 的流式版本），每批至多 batch_size 条
+        
+        会话文件边解码边产出，同一时刻只保留一批记录，内存占用与批大小而非文件大小相关。
+        解析结果缓存的条目是整个文件的记录列表，读取时需要整体反序列化，因此这里不使用缓存。
+        
+        出错时与 load_json_file 一样记录错误并结束，不抛出异常；但出错前的批次已经产出，
+        调用方已经处理了文件的前一部分（load_json_file 对出错的文件不返回任何记录）。
+        需要“出错的文件不产生任何影响”的调用方使用 load_json_file 或 process_file。
+        """
+        batch_size = batch_size or self.record_batch_size
+        try:
+            if is_session_path(file_path):
+                # JSON Lines格式，任何一行无法解析都视为读取失败
+                yield from iter_jsonl_file(file_path, batch_size, strict=True)
+            else:
+                # 标准JSON格式
+                data = read_json_file(file_path)
+                records = [data] if isinstance(data, dict) else data
+                for start in range(0, len(records), batch_size):
+                    yield records[start:start + batch_size]
+        except Exception as e:
+            self.log_error(f"读取文件失败: {e}", file_path)
+            
+    def iter_records(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """逐条产出文件中的记录，出错的处理见 iter_record_batches"""
+        for batch in self.iter_record_batches(file_path):
+            yield from batch
+            
     def save_json_result(self, data: Any, output_path: str, pretty: bool = True):
         """保存JSON结果"""
         try:
@@ -124,31 +163,67 @@ class BaseAnalyzer(ABC):
 
 
 class FileBasedAnalyzer(BaseAnalyzer):
-    """基于文件的分析器基类"""
+    """
+    基于文件的分析器基类
+    
+    也可以作为 CorpusReader 的访问者：单次遍历语料时，每个文件依次调用 begin_file、
+    每批记录的 process_batch（默认逐条调用 process_record）与 end_file。
+    """
+    
+    # 需要读取的文件类型，CorpusReader 据此跳过无关文件
+    file_types = ("jsonl", "json")
     
     def __init__(self, name: str, version: str = "1.0.0", output_dir: str = "outputs"):
         super().__init__(name, version)
         self.output_dir = Path(output_dir)
         
     def process_file(self, file_path: str, file_type: str = "jsonl") -> int:
-        """处理单个文件"""
+        """
+        处理单个文件：读取全部记录后按 record_batch_size 条一批交给 process_batch
+        
+        与原先一样整体读取（使用解析结果缓存），读取出错的文件不交给 process_batch 任何记录。
+        """
         try:
             records = self.load_json_file(file_path)
             self.processed_files += 1
             
-            for record in records:
-                self.process_record(record)
-                self.processed_records += 1
+            for start in range(0, len(records), self.record_batch_size):
+                self.process_batch(records[start:start + self.record_batch_size])
+                self.processed_records += min(self.record_batch_size, len(records) - start)
                 
             return len(records)
         except Exception as e:
             self.log_error(f"处理文件失败: {e}", file_path)
             return 0
             
+    def begin_file(self, file_info: SessionFile) -> None:
+        """开始处理一个文件前调用"""
+        pass
+        
+    def process_batch(self, records: List[Dict[str, Any]]) -> None:
+        """
+        处理一批记录（至多 record_batch_size 条，按文件中的顺序）
+        
+        默认逐条调用 process_record；子类可以覆盖以摊薄每条记录的开销。
+        抛出异常时 CorpusReader 不再向该访问者分发该文件的后续记录，异常通过 end_file 交给它。
+        """
+        for record in records:
+            self.process_record(record)
+        
     @abstractmethod
     def process_record(self, record: Dict[str, Any]) -> None:
         """处理单条记录 - 需要子类实现"""
         pass
+        
+    def end_file(self, file_info: SessionFile, error: Optional[Exception] = None) -> None:
+        """
+        一个文件处理结束后调用
+        
+        Args:
+            file_info: 文件信息
+            error: 读取或处理该文件时出现的异常，正常结束时为 None
+        """
+        pass
 
 
 class ProgressMixin:
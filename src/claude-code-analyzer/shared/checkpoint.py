@@ -0,0 +1,140 @@
+"""
+分析器检查点
+基于 process_scan_result 的分析器按文件边界定期保存聚合状态与已处理文件列表，
+超时或崩溃后可从最近的检查点继续
+"""
+
+import os
+import time
+import pickle
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Optional
+
+from .models import SessionFile
+from .utils import setup_logging
+
+
+# 检查点文件名，与任务输出保存在同一目录
+CHECKPOINT_FILENAME = ".checkpoint.pkl"
+
+# 调度器 --resume 时设置该环境变量，任务据此决定是否从检查点继续
+RESUME_ENV = "CLAUDE_ANALYZER_RESUME"
+
+# 两次检查点之间的最小间隔（秒）
+CHECKPOINT_INTERVAL = 30.0
+
+
+def resume_requested() -> bool:
+    """本次执行是否要求从检查点继续"""
+    return os.environ.get(RESUME_ENV, "") not in ("", "0")
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """文件的 (大小, 修改时间)，文件不存在时为 None；被改写为相同长度的文件修改时间不同"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Checkpointer:
+    """
+    分析器检查点读写
+
+    只在文件处理完成后保存，保证状态中不包含处理到一半的文件。
+    """
+
+    def __init__(self, output_dir: Path, task_id: str, state_attrs: Tuple[str, ...],
+                 interval: float = CHECKPOINT_INTERVAL):
+        self.checkpoint_file = Path(output_dir) / CHECKPOINT_FILENAME
+        self.task_id = task_id
+        self.state_attrs = state_attrs
+        self.interval = interval
+        self.processed_files: Dict[str, Dict[str, int]] = {}  # path -> {"size", "mtime_ns", "records"}
+        self._last_save = time.monotonic()
+        self.logger = setup_logging(f"{task_id}_Checkpoint")
+
+    def restore(self, analyzer: Any, files: List[SessionFile]) -> Dict[str, Dict[str, int]]:
+        """
+        按需从检查点恢复分析器状态
+
+        未要求恢复时删除旧检查点；检查点损坏、属于其他任务或已处理文件发生变化时从头开始。
+
+        Args:
+            analyzer: 要恢复状态的分析器
+            files: 本次扫描清单中的文件
+
+        Returns:
+            已处理文件 path -> {"size", "mtime_ns", "records"}，从头开始时为空
+        """
+        if not resume_requested():
+            self.clear()
+            return {}
+
+        if not self.checkpoint_file.exists():
+            self.logger.info("没有可用的检查点，从头开始")
+            return {}
+
+        try:
+            with open(self.checkpoint_file, 'rb') as f:
+                checkpoint = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"检查点无法读取，从头开始: {e}")
+            return {}
+
+        current_paths = {f.path for f in files}
+        processed_files = checkpoint.get("processed_files", {})
+        changed = [
+            path for path, info in processed_files.items()
+            if path not in current_paths or _file_stamp(path) != (info["size"], info.get("mtime_ns"))
+        ]
+
+        if checkpoint.get("task_id") != self.task_id or changed:
+            self.logger.warning(f"检查点与当前扫描清单不一致（{len(changed)} 个文件已变化），从头开始")
+            return {}
+
+        for attr, value in checkpoint["state"].items():
+            setattr(analyzer, attr, value)
+        self.processed_files = dict(processed_files)
+
+        self.logger.info(f"从检查点恢复: 已处理 {len(processed_files)} 个文件 (保存于 {checkpoint.get('created')})")
+        return self.processed_files
+
+    def file_done(self, analyzer: Any, file_info: SessionFile, records: int) -> None:
+        """
+        记录一个文件处理完成，距上次保存超过间隔时写入检查点
+
+        Args:
+            analyzer: 当前分析器
+            file_info: 已处理的文件
+            records: 该文件处理的记录数
+        """
+        stamp = _file_stamp(file_info.path) or (file_info.size, None)
+        self.processed_files[file_info.path] = {"size": stamp[0], "mtime_ns": stamp[1], "records": records}
+
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save(analyzer)
+
+    def save(self, analyzer: Any) -> None:
+        """原子写入检查点（先写临时文件再替换）"""
+        checkpoint = {
+            "task_id": self.task_id,
+            "created": datetime.now().isoformat(),
+            "processed_files": self.processed_files,
+            "state": {attr: getattr(analyzer, attr) for attr in self.state_attrs}
+        }
+
+        self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.checkpoint_file.with_suffix(".tmp")
+        with open(temp_file, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, self.checkpoint_file)
+
+        self._last_save = time.monotonic()
+
+    def clear(self) -> None:
+        """任务完成后删除检查点"""
+        if self.checkpoint_file.exists():
+            self.checkpoint_file.unlink()
@@ -0,0 +1,223 @@
+"""
+会话压实
+会话文件反复携带相同的大字符串（系统提示、CLAUDE.md 内容、多次读取同一文件的 tool_result……）。
+压实把会话文件改写为紧凑归档（.cjsonl）：不少于一定长度的字符串值存入按内容摘要寻址的 blob 仓库，
+记录中改为引用字符串，相同内容只保存一份；字段名与其余值原样保留。
+
+引用仍是字符串，记录的结构与基础类型不变：
+    "\\u0000blob:<sha256>:<原长度>:<前 BLOB_PREVIEW_CHARS 个字符>"
+以引用标记开头的原始字符串无论长短都存入 blob，归档中以标记开头的字符串因此一定是引用。
+
+读取方（shared/jsonl.py）读取归档时按需还原：完整读取时从 blob 仓库取回原字符串，结果与读取原会话文件相同；
+结构读取（T02、T03，见 shared/skeleton.py）保留的字符数不超过预览长度时直接使用引用中的预览，不读取 blob。
+blob 仓库位于会话文件所在项目目录的上一级（~/.claude/projects/.blobs），跨项目共享。
+
+用法见 session_compactor.py。
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+COMPACT_SUFFIX = ".cjsonl"
+
+# blob 仓库相对于 projects 目录的位置
+BLOB_DIRNAME = ".blobs"
+
+# 引用标记与引用中保留的预览字符数
+BLOB_REF_MARK = "\x00blob:"
+BLOB_PREVIEW_CHARS = 128
+
+# 默认存入 blob 的最短字符串
+DEFAULT_MIN_BLOB_CHARS = 1024
+
+_DIGEST_CHARS = 64
+
+
+def is_compact(path: str) -> bool:
+    """是否为紧凑归档"""
+    return str(path).endswith(COMPACT_SUFFIX)
+
+
+def blob_store_for(path: str) -> "BlobStore":
+    """会话文件（或紧凑归档）对应的 blob 仓库"""
+    return BlobStore(Path(path).parent.parent / BLOB_DIRNAME)
+
+
+def _encode(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogatepass')  # JSON 字符串可以含单独的代理项
+
+
+class BlobStore:
+    """按内容摘要寻址的字符串仓库：<根目录>/<摘要前两位>/<摘要>"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.written = 0  # 本次新写入的 blob 数
+        self.written_bytes = 0
+        self.reused = 0  # 已存在而复用的次数
+
+    def path(self, blob_id: str) -> Path:
+        return self.root / blob_id[:2] / blob_id
+
+    def put(self, text: str) -> str:
+        """保存字符串（已存在时不重复写入），返回 blob ID"""
+        data = _encode(text)
+        blob_id = hashlib.sha256(data).hexdigest()
+        path = self.path(blob_id)
+        if path.exists():
+            self.reused += 1
+            return blob_id
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{blob_id}.{os.getpid()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self.written += 1
+        self.written_bytes += len(data)
+        return blob_id
+
+    def get(self, blob_id: str) -> str:
+        """
+        取回字符串
+
+        Raises:
+            OSError: blob 不存在或无法读取
+        """
+        with open(self.path(blob_id), 'rb') as f:
+            return f.read().decode('utf-8', 'surrogatepass')
+
+
+def is_blob_ref(value: Any) -> bool:
+    """是否为 blob 引用"""
+    return type(value) is str and value.startswith(BLOB_REF_MARK)
+
+
+def make_blob_ref(blob_id: str, text: str) -> str:
+    return f"{BLOB_REF_MARK}{blob_id}:{len(text)}:{text[:BLOB_PREVIEW_CHARS]}"
+
+
+def parse_blob_ref(ref: str):
+    """拆分引用，返回 (blob ID, 原长度, 预览)"""
+    start = len(BLOB_REF_MARK)
+    blob_id = ref[start:start + _DIGEST_CHARS]
+    length, preview = ref[start + _DIGEST_CHARS + 1:].split(':', 1)
+    return blob_id, int(length), preview
+
+
+def compact_value(value: Any, store: BlobStore, min_chars: int = DEFAULT_MIN_BLOB_CHARS) -> Any:
+    """把 value 中不少于 min_chars 个字符（或以引用标记开头）的字符串值存入仓库并替换为引用"""
+    if type(value) is str:
+        if len(value) >= min_chars or value.startswith(BLOB_REF_MARK):
+            return make_blob_ref(store.put(value), value)
+        return value
+    if type(value) is dict:
+        return {key: compact_value(item, store, min_chars) for key, item in value.items()}
+    if type(value) is list:
+        return [compact_value(item, store, min_chars) for item in value]
+    return value
+
+
+def rehydrate(value: Any, store: BlobStore, string_prefix: Optional[int] = None) -> Any:
+    """
+    把 value 中的引用还原为原字符串
+
+    Args:
+        string_prefix: 只关心结构时给出：原字符串只需保留前 string_prefix 个字符，
+            不超过预览长度时直接使用预览，不读取 blob
+
+    Raises:
+        OSError: 引用的 blob 不存在或无法读取
+    """
+    if type(value) is str:
+        if not value.startswith(BLOB_REF_MARK):
+            return value
+        blob_id, length, preview = parse_blob_ref(value)
+        if string_prefix is not None and string_prefix <= len(preview):
+            return preview[:string_prefix] if length > string_prefix else preview
+        return store.get(blob_id)
+    if type(value) is dict:
+        return {key: rehydrate(item, store, string_prefix) for key, item in value.items()}
+    if type(value) is list:
+        return [rehydrate(item, store, string_prefix) for item in value]
+    return value
+
+
+@dataclass
+class CompactionStats:
+    """一个会话文件的压实结果"""
+    source_bytes: int = 0
+    compact_bytes: int = 0
+    records: int = 0
+    verbatim_lines: int = 0  # 无法解析而原样保留的行
+    blob_refs: int = 0
+
+
+def compact_session(source: str, target: str, store: BlobStore,
+                    min_chars: int = DEFAULT_MIN_BLOB_CHARS) -> CompactionStats:
+    """
+    把会话文件改写为紧凑归档
+
+    按原有的文本方式逐行解析；空行去掉，无法解析的行原样保留（读取时照常跳过）。
+
+    Raises:
+        UnicodeDecodeError: 会话文件含无效的 UTF-8（不压实这样的文件）
+    """
+    stats = CompactionStats(source_bytes=os.path.getsize(source))
+    written_before = store.written + store.reused
+    with open(source, 'r', encoding='utf-8') as src, open(target, 'w', encoding='utf-8') as dst:
+        for line in src:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                dst.write(line + "\n")
+                stats.verbatim_lines += 1
+                continue
+            record = compact_value(record, store, min_chars)
+            try:
+                text = json.dumps(record, ensure_ascii=False)
+                text.encode('utf-8')
+            except UnicodeEncodeError:  # 含单独的代理项：改用 \\uXXXX 转义
+                text = json.dumps(record)
+            dst.write(text + "\n")
+            stats.records += 1
+    stats.compact_bytes = os.path.getsize(target)
+    stats.blob_refs = store.written + store.reused - written_before
+    return stats
+
+
+def expand_session(source: str, target: str, store: Optional[BlobStore] = None) -> int:
+    """
+    把紧凑归档还原为普通会话文件（每行一条记录，逐行解析的结果与原会话文件相同），返回写入的行数
+
+    Raises:
+        OSError: 引用的 blob 不存在或无法读取
+    """
+    store = store or blob_store_for(source)
+    lines = 0
+    with open(source, 'r', encoding='utf-8') as src, open(target, 'w', encoding='utf-8') as dst:
+        for line in src:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                dst.write(line + "\n")
+            else:
+                record = rehydrate(record, store)
+                try:
+                    text = json.dumps(record, ensure_ascii=False)
+                    text.encode('utf-8')
+                except UnicodeEncodeError:
+                    text = json.dumps(record)
+                dst.write(text + "\n")
+            lines += 1
+    return lines
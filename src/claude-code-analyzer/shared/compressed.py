@@ -0,0 +1,138 @@
+"""
+压缩会话文件
+归档的旧会话可以保存为 .jsonl.gz 或 .jsonl.xz，T06 把它们与 .jsonl 一样列入扫描清单（文件类型仍为 jsonl）。
+读取方（shared/jsonl.py、解析结果缓存、BaseAnalyzer）透明地解压：整个文件解压到内存后按普通会话文件的字节内容读取，
+结果与读取解压后的 .jsonl 相同。预读（shared/prefetch.py）在工作进程中解压后续文件，与主线程的解析重叠。
+
+压缩文件与紧凑归档（.cjsonl，见 shared/compaction.py）只作为整体读取：扫描清单不记录它们的完整行偏移，
+增量读取按 (大小, 修改时间) 判断文件是否变化。
+"""
+
+import io
+import os
+import gzip
+import lzma
+import zlib
+from typing import IO, Optional
+
+from .compaction import COMPACT_SUFFIX, is_compact
+
+
+# 压缩后缀 -> 打开方式
+COMPRESSED_SUFFIXES = {
+    ".gz": gzip.open,
+    ".xz": lzma.open,
+}
+
+SESSION_SUFFIX = ".jsonl"
+SESSION_SUFFIXES = ((SESSION_SUFFIX,) + tuple(SESSION_SUFFIX + suffix for suffix in COMPRESSED_SUFFIXES)
+                    + (COMPACT_SUFFIX,))
+
+# 压缩文件损坏或被截断时解压抛出的异常
+DECOMPRESS_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError)
+
+
+def session_stem(filename: str) -> Optional[str]:
+    """会话文件名去掉 .jsonl / .jsonl.gz / .jsonl.xz / .cjsonl 后缀的部分，不是会话文件时为 None"""
+    for suffix in SESSION_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return None
+
+
+def is_session_path(path: str) -> bool:
+    """是否为会话文件（含压缩文件与紧凑归档）"""
+    return session_stem(str(path)) is not None
+
+
+def is_compressed(path: str) -> bool:
+    """是否为压缩文件"""
+    return os.path.splitext(str(path))[1] in COMPRESSED_SUFFIXES
+
+
+def is_archive(path: str) -> bool:
+    """是否为只整体读取的归档（压缩文件或紧凑归档）"""
+    return is_compressed(path) or is_compact(path)
+
+
+def open_binary(path: str) -> IO[bytes]:
+    """以二进制方式打开文件，压缩文件边读边解压"""
+    opener = COMPRESSED_SUFFIXES.get(os.path.splitext(str(path))[1])
+    return opener(path, 'rb') if opener else open(path, 'rb')
+
+
+def open_text(path: str) -> IO[str]:
+    """以 UTF-8 文本方式（通用换行符）打开文件，压缩文件边读边解压"""
+    if not is_compressed(path):
+        return open(path, 'r', encoding='utf-8')
+    return io.TextIOWrapper(open_binary(path), encoding='utf-8')
+
+
+def decompress_file(path: str) -> bytes:
+    """
+    读取并解压整个文件
+
+    Raises:
+        OSError、EOFError、zlib.error、lzma.LZMAError: 文件无法读取、不是有效的压缩格式或被截断
+    """
+    with open_binary(path) as f:
+        return f.read()
+
+
+def expanded_size(path: str) -> int:
+    """
+    解压后大小的估计，用于预读预算
+
+    gzip 取最后一个成员尾部记录的原始大小（模 4 GiB），xz 累加最后一个流索引中各块的原始大小；
+    普通文件、无法解析或估计值小于文件本身时为文件大小。
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    size = os.path.getsize(path)
+    suffix = os.path.splitext(str(path))[1]
+    if suffix not in COMPRESSED_SUFFIXES or size < 12:
+        return size
+
+    with open(path, 'rb') as f:
+        if suffix == ".gz":
+            f.seek(-4, os.SEEK_END)
+            return max(size, int.from_bytes(f.read(4), 'little'))
+
+        f.seek(-12, os.SEEK_END)
+        footer = f.read(12)
+        if footer[10:] != b'YZ':
+            return size
+        backward = (int.from_bytes(footer[4:8], 'little') + 1) * 4
+        if backward > size - 12:
+            return size
+        f.seek(-12 - backward, os.SEEK_END)
+        return max(size, _xz_index_size(f.read(backward)))
+
+
+def _xz_index_size(index: bytes) -> int:
+    """xz 流索引中各块原始大小之和，格式不符时为 0"""
+    if not index or index[0] != 0:
+        return 0
+    position = 1
+
+    def varint() -> int:
+        nonlocal position
+        value = shift = 0
+        while position < len(index):
+            byte = index[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value
+            shift += 7
+        raise ValueError("xz 索引被截断")
+
+    try:
+        total = 0
+        for _ in range(varint()):
+            varint()  # 块压缩后的大小
+            total += varint()
+        return total
+    except ValueError:
+        return 0
@@ -0,0 +1,130 @@
+"""
+单次遍历的语料读取
+每个文件只打开一次、每行只解析一次（会话文件优先使用解析结果缓存），解析出的记录依次分发给
+所有注册的访问者（FileBasedAnalyzer，按访问者的 record_batch_size 分批交给 process_batch），
+并在每个文件开始与结束时调用访问者的 begin_file / end_file 钩子
+
+与各任务逐个读取文件时的语义保持一致:
+    - 空行与无法解析的行跳过
+    - json 文件整体作为一条记录
+    - 读取出错（例如编码错误）时，出错前已分发的记录保留，错误通过 end_file 交给所有访问者
+    - 某个访问者处理一批记录时抛出异常，只停止向它分发该文件的后续记录，其他访问者不受影响；
+      它的 processed_records 只计入出错批次之前的记录
+"""
+
+from typing import Dict, Any, List, Optional
+
+from .models import SessionFile, ScanResult
+from .base_analyzer import FileBasedAnalyzer
+from .progress import ProgressReporter
+from .record_cache import read_jsonl_records
+from .json_backend import read_json_file
+from .prefetch import prefetching
+
+
+# 调度器单次遍历模式下，进程内上下文中保存已完成读取的访问者（任务ID -> 访问者）的键
+CORPUS_PASS_KEY = "corpus_pass"
+
+
+class CorpusReader:
+    """把一次语料读取分发给多个访问者"""
+
+    def __init__(self, visitors: List[FileBasedAnalyzer]):
+        self.visitors = list(visitors)
+        self.files_read = 0
+        self.records_parsed = 0
+
+    def read(self, scan_result: ScanResult, progress: Optional[ProgressReporter] = None) -> int:
+        """
+        按扫描清单顺序读取全部文件
+
+        Args:
+            scan_result: 扫描结果
+            progress: 进度上报器，每读完一个文件前进一次
+
+        Returns:
+            解析出的记录数
+        """
+        wanted = [f for f in scan_result.files if any(f.file_type in v.file_types for v in self.visitors)]
+        with prefetching(wanted):
+            for file_info in scan_result.files:
+                visitors = [v for v in self.visitors if file_info.file_type in v.file_types]
+                count = self.read_file(file_info, visitors) if visitors else 0
+                if progress:
+                    progress.advance(count, file_info.size, file_info.path)
+
+        if progress:
+            progress.finish()
+        return self.records_parsed
+
+    def read_file(self, file_info: SessionFile, visitors: List[FileBasedAnalyzer]) -> int:
+        """读取单个文件并分发给指定的访问者，返回解析出的记录数"""
+        errors: Dict[int, Exception] = {}  # id(访问者) -> 处理该文件时的异常
+        handled: Dict[int, int] = {}  # id(访问者) -> 出错前已处理的记录数
+        active = list(visitors)
+        parsed = 0
+
+        for visitor in visitors:
+            visitor.begin_file(file_info)
+
+        try:
+            if file_info.file_type == "jsonl":
+                records, read_error = read_jsonl_records(file_info.path)
+                batch_size = min(v.record_batch_size for v in visitors)
+                for start in range(0, len(records), batch_size):
+                    active = self._dispatch(records[start:start + batch_size], active, parsed, errors, handled)
+                    parsed = min(start + batch_size, len(records))
+                    if not active:
+                        break
+                if read_error is not None:
+                    raise read_error
+            else:  # json
+                active = self._dispatch([read_json_file(file_info.path)], active, parsed, errors, handled)
+                parsed = 1
+
+        except Exception as e:
+            for visitor in active:
+                errors[id(visitor)] = e
+                handled[id(visitor)] = parsed
+
+        self.files_read += 1
+        self.records_parsed += parsed
+        for visitor in visitors:
+            visitor.processed_files += 1
+            visitor.processed_records += handled.get(id(visitor), parsed)
+            visitor.end_file(file_info, errors.get(id(visitor)))
+
+        return parsed
+
+    @staticmethod
+    def _dispatch(records: List[Any], active: List[FileBasedAnalyzer], parsed: int,
+                  errors: Dict[int, Exception], handled: Dict[int, int]) -> List[FileBasedAnalyzer]:
+        """把一批记录交给仍在处理该文件的访问者，返回此后仍应接收记录的访问者"""
+        failed = False
+        for visitor in active:
+            try:
+                visitor.process_batch(records)
+            except Exception as e:
+                errors[id(visitor)] = e
+                handled[id(visitor)] = parsed
+                failed = True
+
+        if failed:
+            return [v for v in active if id(v) not in errors]
+        return active
+
+
+def take_corpus_visitor(context: Optional[Dict[str, Any]], task_id: str) -> Optional[FileBasedAnalyzer]:
+    """
+    取出调度器为该任务在单次遍历中完成读取的访问者（取出后从上下文移除）
+
+    Args:
+        context: 调度器在进程内模式下共享的任务上下文
+        task_id: 任务ID
+
+    Returns:
+        已读取全部语料的访问者，不在单次遍历模式或该任务未参与时为 None
+    """
+    if not context:
+        return None
+    return context.get(CORPUS_PASS_KEY, {}).pop(task_id, None)
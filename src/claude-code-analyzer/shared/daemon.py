@@ -0,0 +1,116 @@
+"""
+分析守护进程通信
+守护进程与客户端之间通过 Unix 域套接字交换以换行分隔的JSON请求/响应
+
+请求:  {"command": "run", "tasks": ["T04"], ...}
+响应:  {"ok": true, "result": ..., "elapsed": 0.012} 或 {"ok": false, "error": "..."}
+"""
+
+import os
+import json
+import socket
+import tempfile
+from typing import Dict, Any, Optional
+
+
+# 可通过环境变量指定套接字路径
+SOCKET_ENV = "CLAUDE_ANALYZER_SOCKET"
+
+
+class DaemonUnavailableError(ConnectionError):
+    """守护进程未运行或无法连接"""
+
+
+def default_socket_path() -> str:
+    """
+    默认套接字路径
+
+    优先放在 $XDG_RUNTIME_DIR（仅本用户可访问）；否则放在临时目录下本用户专属的 0700 子目录，
+    其他用户无法抢先在可预测的路径上创建套接字（也避免超出 Unix 套接字路径长度限制）。
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "claude-analyzer.sock")
+    return os.path.join(_private_dir(), "daemon.sock")
+
+
+def _private_dir() -> str:
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"claude-analyzer-{uid}")
+
+
+def prepare_socket_dir(socket_path: str) -> None:
+    """
+    守护进程绑定前准备套接字所在目录：默认的专属目录不存在时以 0700 创建，并确认目录属于当前用户
+
+    Raises:
+        PermissionError: 目录属于其他用户，或是指向别处的符号链接
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    private = directory == os.path.abspath(_private_dir())
+    if private and not os.path.lexists(directory):
+        os.mkdir(directory, 0o700)
+
+    stat = os.lstat(directory)
+    if hasattr(os, "getuid") and stat.st_uid not in (os.getuid(), 0):
+        raise PermissionError(f"套接字目录属于其他用户: {directory}")
+    if private:
+        if not os.path.isdir(directory) or os.path.islink(directory) or stat.st_uid != os.getuid():
+            raise PermissionError(f"套接字目录不是当前用户的专属目录: {directory}")
+        if stat.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+
+
+def check_socket_owner(socket_path: str) -> None:
+    """
+    连接前确认套接字由当前用户创建，避免把请求发给其他用户抢先创建的套接字
+
+    Raises:
+        DaemonUnavailableError: 套接字不存在或属于其他用户
+    """
+    try:
+        owner = os.stat(socket_path).st_uid
+    except FileNotFoundError as e:
+        raise DaemonUnavailableError(f"守护进程未运行: {socket_path}") from e
+    if hasattr(os, "getuid") and owner != os.getuid():
+        raise DaemonUnavailableError(f"套接字不属于当前用户 (uid {owner})，拒绝连接: {socket_path}")
+
+
+def send_request(request: Dict[str, Any], socket_path: Optional[str] = None,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    向守护进程发送一个请求并等待响应
+
+    Args:
+        request: 请求内容，必须包含 command
+        socket_path: 套接字路径，默认见 default_socket_path()
+        timeout: 等待响应的超时时间（秒），None 表示一直等待
+
+    Returns:
+        响应字典
+
+    Raises:
+        DaemonUnavailableError: 无法连接守护进程，或套接字属于其他用户
+    """
+    socket_path = socket_path or default_socket_path()
+    check_socket_owner(socket_path)
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            client.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonUnavailableError(f"守护进程未运行: {socket_path}") from e
+
+        client.settimeout(timeout)
+        client.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode('utf-8'))
+
+        with client.makefile('r', encoding='utf-8') as stream:
+            line = stream.readline()
+        if not line:
+            raise DaemonUnavailableError("守护进程关闭了连接")
+        return json.loads(line)
+    finally:
+        client.close()
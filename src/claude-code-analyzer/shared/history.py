@@ -0,0 +1,185 @@
+"""
+任务执行历史
+以 JSON Lines 追加记录每次执行中各任务的耗时、吞吐量与资源使用，
+供调度器估算任务耗时，并与滚动基线比较发现性能回退
+
+每条记录带有本次的执行方式（调度器的执行模式、并行度、增量/单次遍历/流水线/分片等），
+估算耗时与计算基线只参考执行方式相同的记录：切换执行方式本身不应被当作性能变化。
+"""
+
+import json
+from pathlib import Path
+from datetime import datetime
+from statistics import median
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional
+
+
+# 历史文件名，保存在任务输出根目录
+HISTORY_FILENAME = "task_history.jsonl"
+
+# 估算耗时、计算吞吐量基线时只参考每个任务最近几次实际执行
+HISTORY_WINDOW = 5
+
+# 吞吐量比基线下降超过该比例视为回退
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+# 耗时短于该值（秒）的执行不参与吞吐量比较：主要是解释器启动与导入的时间，波动远大于回退阈值
+MIN_COMPARE_DURATION = 1.5
+
+# 至少有这么多次执行方式相同的此前执行才与基线比较
+MIN_BASELINE_RUNS = 3
+
+
+def _rate(amount: Optional[float], duration: Optional[float]) -> Optional[float]:
+    return round(amount / duration, 1) if amount and duration else None
+
+
+def entry_throughput(entry: Dict[str, Any]) -> Optional[float]:
+    """
+    一条历史记录的吞吐量（字节/秒），不参与比较时为 None
+
+    只使用任务上报的处理字节数：没有上报进度的任务（T05、T08 等）处理量与数据源大小无关，
+    按数据源大小折算的"吞吐量"只反映启动耗时；耗时过短的执行同样不参与比较。
+    """
+    if (entry.get("duration") or 0) < MIN_COMPARE_DURATION:
+        return None
+    return entry.get("bytes_per_second") or None
+
+
+@dataclass
+class ThroughputComparison:
+    """某任务最近一次执行与滚动基线的吞吐量比较"""
+    task_id: str
+    run_id: str
+    current: float  # 最近一次的吞吐量（字节/秒）
+    baseline: float  # 此前若干次吞吐量的中位数
+    baseline_runs: int
+    threshold: float
+
+    @property
+    def change(self) -> float:
+        """相对基线的变化比例，负数表示变慢"""
+        return self.current / self.baseline - 1
+
+    @property
+    def regressed(self) -> bool:
+        return self.change < -self.threshold
+
+
+class TaskHistory:
+    """任务执行历史存储"""
+
+    def __init__(self, history_file: Path):
+        self.history_file = Path(history_file)
+
+    def append_run(self, run_id: str, task_results: Dict[str, Dict[str, Any]],
+                   corpus: Optional[Dict[str, int]] = None, mode: Optional[Dict[str, Any]] = None) -> None:
+        """
+        追加一次执行的任务结果，每个任务一行
+
+        Args:
+            run_id: 本次执行标识（开始时间）
+            task_results: task_id -> {"status", "duration", "metrics"}
+            corpus: 本次数据源规模 {"files", "records", "bytes"}
+            mode: 本次的执行方式（见 TaskScheduler.execution_mode）
+        """
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        recorded_at = datetime.now().isoformat()
+
+        with open(self.history_file, 'a', encoding='utf-8') as f:
+            for task_id, result in task_results.items():
+                metrics = result.get("metrics") or {}
+                duration = result.get("duration")
+                entry = {
+                    "run_id": run_id,
+                    "task_id": task_id,
+                    "recorded_at": recorded_at,
+                    "status": result.get("status"),
+                    "duration": duration,
+                    "records_per_second": _rate(metrics.get("records_processed"), duration),
+                    "bytes_per_second": _rate(metrics.get("bytes_processed"), duration),
+                    "peak_rss_bytes": metrics.get("peak_rss_bytes"),
+                    "corpus": corpus,
+                    "mode": mode,
+                    "metrics": metrics
+                }
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def load(self) -> List[Dict[str, Any]]:
+        """读取全部历史记录，忽略损坏的行"""
+        if not self.history_file.exists():
+            return []
+
+        entries = []
+        with open(self.history_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def estimate_durations(self, task_ids: List[str],
+                           mode: Optional[Dict[str, Any]] = None) -> Dict[str, Optional[float]]:
+        """
+        按执行方式相同的最近几次实际执行（不含缓存命中）的耗时中位数估算任务耗时
+
+        Args:
+            task_ids: 需要估算的任务
+            mode: 本次的执行方式，只参考以相同方式执行的记录（未记录执行方式的旧记录不参考）
+
+        Returns:
+            task_id -> 估算耗时（秒），没有历史的任务为 None
+        """
+        durations: Dict[str, List[float]] = {task_id: [] for task_id in task_ids}
+        for entry in self.load():
+            task_id = entry.get("task_id")
+            if (task_id in durations and entry.get("status") == "completed" and entry.get("duration") is not None
+                    and entry.get("mode") == mode):
+                durations[task_id].append(entry["duration"])
+
+        return {
+            task_id: median(values[-HISTORY_WINDOW:]) if values else None
+            for task_id, values in durations.items()
+        }
+
+    def compare_latest(self, threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+                       window: int = HISTORY_WINDOW) -> List[ThroughputComparison]:
+        """
+        将每个任务最近一次实际执行的吞吐量与此前以相同方式执行的 window 次的中位数比较
+
+        只比较上报了处理字节数、耗时不短于 MIN_COMPARE_DURATION 的执行，
+        且此前至少有 MIN_BASELINE_RUNS 次这样的执行时才计算基线。
+
+        Args:
+            threshold: 吞吐量下降超过该比例视为回退
+            window: 基线参考的执行次数（不少于 MIN_BASELINE_RUNS）
+
+        Returns:
+            有基线可比的任务的比较结果（按任务ID排序）
+        """
+        window = max(window, MIN_BASELINE_RUNS)
+        by_task: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in self.load():
+            if entry.get("status") == "completed" and entry_throughput(entry):
+                by_task.setdefault(entry["task_id"], []).append(entry)
+
+        comparisons = []
+        for task_id, entries in sorted(by_task.items()):
+            latest = entries[-1]
+            previous = [e for e in entries[:-1] if e.get("mode") == latest.get("mode")][-window:]
+            if len(previous) < MIN_BASELINE_RUNS:
+                continue
+            comparisons.append(ThroughputComparison(
+                task_id=task_id,
+                run_id=latest["run_id"],
+                current=entry_throughput(latest),
+                baseline=median([entry_throughput(e) for e in previous]),
+                baseline_runs=len(previous),
+                threshold=threshold
+            ))
+        return comparisons
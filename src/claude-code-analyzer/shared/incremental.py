@@ -0,0 +1,299 @@
+"""
+增量读取
+Claude 的会话文件 (.jsonl) 只会在末尾追加。T06 在扫描清单中记录每个会话文件最后一个完整行之后的字节偏移，
+支持增量的任务为每个文件保存可续算的状态和已处理到的偏移，下次只读取新增的完整行并折叠进该文件的状态，
+再按扫描清单中的文件顺序合并各文件的部分聚合（与分片合并相同），结果与从头读取完全相同
+
+仍在写入的文件末尾可能有不完整的行：只处理到最后一个换行符，其余部分留到下次。
+文件开头或已处理部分末尾的内容变化（文件被改写或截断）时，该文件从头读取。
+归档的会话文件（压缩文件、紧凑归档）不会追加，与 todos 文件一样按 (大小, 修改时间) 判断是否需要重新处理。
+
+调度器 --incremental 设置以下环境变量，T06 与各任务据此选择增量方式:
+    CLAUDE_ANALYZER_INCREMENTAL=1
+"""
+
+import io
+import os
+import pickle
+import hashlib
+import inspect
+from abc import ABC, abstractmethod
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Optional
+
+from .models import SessionFile, ScanResult
+from .utils import calculate_file_hash
+from .jsonl import read_jsonl_file
+from .compressed import is_archive
+
+
+INCREMENTAL_ENV = "CLAUDE_ANALYZER_INCREMENTAL"
+
+# 可续算状态保存在任务输出目录下的该文件
+INCREMENTAL_STATE_FILENAME = ".incremental_state.pkl"
+
+# 锚点摘要覆盖的字节数：文件开头与已处理部分末尾各取这么多
+ANCHOR_BYTES = 4096
+
+# 从文件末尾向前查找换行符时每次读取的字节数
+_TAIL_CHUNK = 64 * 1024
+
+# 统计行数时每批解码的行数
+_COUNT_BATCH = 4096
+
+
+def requested_incremental() -> bool:
+    """本次执行是否使用增量读取"""
+    return os.environ.get(INCREMENTAL_ENV, "") not in ("", "0")
+
+
+def complete_line_offset(path: str, size: Optional[int] = None) -> int:
+    """
+    文件前 size 字节中最后一个换行符之后的偏移（没有完整行时为 0）
+
+    Args:
+        path: 文件路径
+        size: 只考虑文件的前 size 字节，默认为整个文件
+    """
+    with open(path, 'rb') as f:
+        end = size if size is not None else os.fstat(f.fileno()).st_size
+        while end > 0:
+            start = max(0, end - _TAIL_CHUNK)
+            f.seek(start)
+            chunk = f.read(end - start)
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def file_anchor(path: str, offset: int) -> str:
+    """文件开头与 offset 之前各 ANCHOR_BYTES 字节的摘要，用于确认文件在 offset 之前没有变化"""
+    digest = hashlib.sha1(str(offset).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(offset, ANCHOR_BYTES)))
+        f.seek(max(0, offset - ANCHOR_BYTES))
+        digest.update(f.read(min(offset, ANCHOR_BYTES)))
+    return digest.hexdigest()
+
+
+def count_lines(path: str, start: int = 0, end: Optional[int] = None) -> int:
+    """
+    统计文件 [start, end) 字节范围内的非空行数（start 必须位于行首）
+
+    按文本方式（UTF-8、通用换行符）划分行，与从头以文本方式读取整个文件时的行划分一致；
+    分批解码，内存占用与文件大小无关。
+
+    Raises:
+        UnicodeDecodeError: 内容不是有效的 UTF-8
+    """
+    count = 0
+    pending = []
+    position = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for line in f:
+            if end is not None:
+                if position >= end:
+                    break
+                line = line[:end - position]
+            position += len(line)
+            pending.append(line)
+            if len(pending) >= _COUNT_BATCH:
+                count += _count_text_lines(b''.join(pending))
+                pending = []
+    return count + _count_text_lines(b''.join(pending))
+
+
+def _count_text_lines(data: bytes) -> int:
+    # 每批以完整行结束，不会截断多字节字符或 \r\n
+    return sum(1 for line in io.StringIO(data.decode('utf-8'), newline=None) if line.strip())
+
+
+def read_jsonl_range(path: str, start: int, end: int) -> Tuple[List[Any], Optional[Exception]]:
+    """
+    读取 jsonl 文件 [start, end) 字节范围内的记录（start 必须位于行首）
+
+    空行与无法解析的行跳过；读取出错或文件已短于 end 时返回出错前已解析的记录和异常。
+
+    Returns:
+        (记录列表, 异常)，正常读取时异常为 None
+    """
+    records = []
+    try:
+        if os.path.getsize(path) < end:
+            raise ValueError(f"文件在扫描后被截断: {path}")
+        read_jsonl_file(path, records, start, end)
+    except Exception as e:
+        return records, e
+    return records, None
+
+
+@dataclass
+class FileState:
+    """一个文件的可续算状态"""
+    offset: int  # 会话文件：已处理到的字节偏移（某个完整行之后）；整体处理的文件为 -1
+    stamp: Any  # 会话文件：该偏移处的锚点摘要；整体处理的文件：(大小, 修改时间)
+    state: Any  # 任务在该文件上的状态（整体处理的文件直接保存部分聚合）
+
+
+class IncrementalFold(ABC):
+    """
+    任务的增量折叠方式
+
+    会话文件的状态从 new_state() 开始，按行顺序用 fold() 折叠新读取的记录，segment() 生成与分片执行相同的
+    部分聚合。读取或处理出错的文件以及 todos 文件、归档的会话文件由 full_segment() 按原有方式完整处理。
+    """
+
+    # 需要处理的文件类型，其余文件的部分聚合为 None
+    file_types = ("jsonl", "json")
+
+    # 能否把一个会话文件按行划分为若干段分别折叠，再用 merge_states() 按顺序合并（见 shared/parallel.py）
+    splittable = False
+
+    @abstractmethod
+    def new_state(self, file_info: SessionFile) -> Any:
+        """空文件的状态"""
+
+    @abstractmethod
+    def fold(self, state: Any, records: List[Any]) -> None:
+        """把按行顺序的新记录折叠进状态"""
+
+    @abstractmethod
+    def segment(self, state: Any, file_info: SessionFile) -> Any:
+        """由状态生成该文件的部分聚合"""
+
+    @abstractmethod
+    def full_segment(self, file_info: SessionFile) -> Any:
+        """完整读取文件，生成部分聚合"""
+
+    def merge_states(self, state: Any, later: Any) -> Any:
+        """
+        把文件中紧随其后一段的状态并入 state，返回合并后的状态（splittable 的折叠方式需要实现）
+
+        结果与把两段的记录依次折叠进同一个状态相同。
+        """
+        raise NotImplementedError
+
+    def version(self) -> str:
+        """
+        状态格式的版本：任务脚本或 shared/ 下任何模块（行划分、解码、过滤、解压……）变化后已保存的状态失效
+
+        与调度器输入指纹中的 shared 部分覆盖同一组文件。
+        """
+        digest = hashlib.sha1(calculate_file_hash(inspect.getfile(type(self))).encode('ascii'))
+        for module in sorted(Path(__file__).parent.glob("*.py")):
+            digest.update(f"\0{module.name}\0{calculate_file_hash(str(module))}".encode('utf-8'))
+        return digest.hexdigest()
+
+
+def update_incremental(output_dir: Path, scan_result: ScanResult,
+                       folder: IncrementalFold) -> List[Tuple[SessionFile, Any]]:
+    """
+    用已保存的状态与新增内容生成各文件的部分聚合，并保存更新后的状态
+
+    Args:
+        output_dir: 任务输出目录
+        scan_result: 扫描结果
+        folder: 任务的增量折叠方式
+
+    Returns:
+        [(文件, 部分聚合)]，按扫描清单中的文件顺序
+    """
+    state_file = Path(output_dir) / INCREMENTAL_STATE_FILENAME
+    version = folder.version()
+    previous = _load_states(state_file, version)
+    states: Dict[str, FileState] = {}
+    segments = []
+    resumed = reread = bytes_read = 0
+
+    for file_info in scan_result.files:
+        if file_info.file_type not in folder.file_types:
+            segments.append((file_info, None))
+            continue
+
+        prev = previous.get(file_info.path)
+        if file_info.file_type != "jsonl" or is_archive(file_info.path):
+            # todos 文件与归档的会话文件整体处理，按 (大小, 修改时间) 判断是否变化
+            try:
+                stat = os.stat(file_info.path)
+                stamp = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                stamp = None
+            if prev is not None and stamp is not None and prev.stamp == stamp:
+                segment = prev.state
+                resumed += 1
+            else:
+                segment = folder.full_segment(file_info)
+                reread += 1
+                bytes_read += file_info.size
+            if stamp is not None:
+                states[file_info.path] = FileState(-1, stamp, segment)
+            segments.append((file_info, segment))
+            continue
+
+        end = file_info.complete_bytes
+        if end is None:
+            end = complete_line_offset(file_info.path, file_info.size)
+
+        start, state = 0, None
+        if prev is not None and prev.offset <= end and _anchor_matches(file_info.path, prev):
+            start, state = prev.offset, prev.state
+            resumed += 1
+        else:
+            state = folder.new_state(file_info)
+            reread += 1
+
+        records, error = read_jsonl_range(file_info.path, start, end) if start < end else ([], None)
+        bytes_read += end - start
+        if error is None:
+            try:
+                folder.fold(state, records)
+            except Exception as e:
+                error = e
+
+        if error is not None:
+            # 读取或处理出错：按原有方式完整处理，不保存状态，下次从头读取
+            segments.append((file_info, folder.full_segment(file_info)))
+            continue
+
+        anchor = file_info.anchor if end == file_info.complete_bytes and file_info.anchor else None
+        try:
+            states[file_info.path] = FileState(end, anchor or file_anchor(file_info.path, end), state)
+        except OSError:
+            pass  # 文件已被删除，下次不再接续
+        segments.append((file_info, folder.segment(state, file_info)))
+
+    _save_states(state_file, version, states)
+    print(f"♻️ 增量读取: {resumed} 个文件接续上次状态, {reread} 个文件从头读取, "
+          f"读取 {bytes_read / 1024 / 1024:.2f} MB (共 {scan_result.total_size / 1024 / 1024:.2f} MB)")
+    return segments
+
+
+def _anchor_matches(path: str, prev: FileState) -> bool:
+    try:
+        return file_anchor(path, prev.offset) == prev.stamp
+    except OSError:
+        return False
+
+
+def _load_states(state_file: Path, version: str) -> Dict[str, FileState]:
+    """读取已保存的状态，文件不存在、损坏或版本不一致时返回空"""
+    try:
+        with open(state_file, 'rb') as f:
+            saved = pickle.load(f)
+    except Exception:
+        return {}
+    if saved.get("version") != version:
+        return {}
+    return saved.get("files", {})
+
+
+def _save_states(state_file: Path, version: str, states: Dict[str, FileState]) -> None:
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = state_file.with_suffix(".tmp")
+    with open(temp_file, 'wb') as f:
+        pickle.dump({"version": version, "files": states}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, state_file)
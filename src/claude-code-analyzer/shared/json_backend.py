@@ -0,0 +1,249 @@
+"""
+JSON 解码后端
+所有读取 jsonl 的代码经由这里解码：安装了加速解码库（orjson、msgspec、pysimdjson）时使用它，否则使用标准库。
+直接解码 bytes 行，省去逐行 UTF-8 解码与 strip()
+
+结果与以文本方式逐行读取、strip() 后 json.loads 完全相同:
+    - 加速库拒绝的行（空行、NaN/Infinity、超出 64 位的整数、非 ASCII 空白等）按原方式用标准库重新解析
+    - 加速库把超出 64 位的整数解析为浮点数时（例如较早版本的 orjson），含 19 位以上连续数字的行交给标准库
+    - 行内含单独的 \\r（文本方式下是换行符）时按原方式拆分
+    - 文件含无效的 UTF-8 时抛出 UnicodeDecodeError，由调用方按原方式以文本读取
+
+可用以下环境变量指定后端（auto 按 JSON_BACKENDS 顺序选择第一个可用的）:
+    CLAUDE_ANALYZER_JSON_BACKEND=auto|orjson|msgspec|simdjson|json
+"""
+
+import io
+import gc
+import os
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from .prefetch import take_prefetched
+
+
+JSON_BACKEND_ENV = "CLAUDE_ANALYZER_JSON_BACKEND"
+
+# 自动选择时的优先顺序
+JSON_BACKENDS = ("orjson", "msgspec", "simdjson", "json")
+
+
+@dataclass
+class JsonBackend:
+    """一个解码后端"""
+    name: str
+    loads: Callable[[bytes], Any]  # 解码一行 UTF-8 编码的 JSON（bytes 或 memoryview）
+    errors: Tuple[type, ...]  # 无法解码时抛出的异常类型
+    exact_ints: bool = True  # 超出 64 位的整数解析为 int 或拒绝，而不是有损地解析为浮点数
+
+
+# 可能超出 64 位整数范围的数字（-9223372036854775809 已有 19 位）：把数字映射为 0、其余字节映射为 . 后查找
+# 连续 19 个 0，比正则表达式快一个数量级
+_DIGIT_TABLE = bytes(0x30 if 0x30 <= i <= 0x39 else 0x2E for i in range(256))
+_LONG_DIGITS = b'0' * 19
+
+
+# 分块查找长数字时每块的字节数
+_DIGIT_CHUNK = 1024 * 1024
+
+
+def _has_long_digits(data: bytes) -> bool:
+    return _LONG_DIGITS in data.translate(_DIGIT_TABLE)
+
+
+def long_digit_positions(buffer, start: int, end: int) -> List[int]:
+    """
+    buffer[start:end] 中 19 位以上连续数字的起始位置（同一段数字可能给出多个位置）
+
+    Args:
+        buffer: 切片得到 bytes 的对象（bytes、mmap）
+    """
+    positions = []
+    for chunk_start in range(start, end, _DIGIT_CHUNK):
+        # 与下一块重叠 18 字节，从本块开始的数字串总能在本块内找到
+        chunk = buffer[chunk_start:min(end, chunk_start + _DIGIT_CHUNK + len(_LONG_DIGITS) - 1)]
+        digits = chunk.translate(_DIGIT_TABLE)
+        hit = digits.find(_LONG_DIGITS)
+        while 0 <= hit < _DIGIT_CHUNK:
+            positions.append(chunk_start + hit)
+            hit = digits.find(_LONG_DIGITS, hit + len(_LONG_DIGITS))
+    return positions
+
+
+def _probe(name: str, loads: Callable[[bytes], Any], errors: Tuple[type, ...]) -> JsonBackend:
+    """检查加速库如何处理超出 64 位的整数"""
+    exact = True
+    for literal in (b'18446744073709551616', b'-9223372036854775809'):
+        try:
+            value = loads(literal)
+        except errors:
+            continue
+        exact = exact and type(value) is int and value == int(literal)
+    return JsonBackend(name, loads, errors, exact)
+
+
+def _orjson() -> JsonBackend:
+    import orjson
+    return _probe("orjson", orjson.loads, (orjson.JSONDecodeError,))
+
+
+def _msgspec() -> JsonBackend:
+    import msgspec
+    return _probe("msgspec", msgspec.json.Decoder().decode, (msgspec.DecodeError,))
+
+
+def _simdjson() -> JsonBackend:
+    import simdjson
+    return _probe("simdjson", lambda line: simdjson.loads(bytes(line)), (ValueError,))
+
+
+def _stdlib() -> JsonBackend:
+    return JsonBackend("json", lambda line: json.loads(str(line, 'utf-8')), (ValueError,))
+
+
+_FACTORIES = {"orjson": _orjson, "msgspec": _msgspec, "simdjson": _simdjson, "json": _stdlib}
+
+_backends = {}
+
+
+def available_backends() -> List[str]:
+    """当前环境中可用的后端名称，按优先顺序"""
+    names = []
+    for name in JSON_BACKENDS:
+        try:
+            get_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name: Optional[str] = None) -> JsonBackend:
+    """
+    取得解码后端
+
+    Args:
+        name: 后端名称，默认见环境变量 CLAUDE_ANALYZER_JSON_BACKEND；auto 时选择第一个可用的
+
+    Raises:
+        ImportError: 指定的后端未安装
+        ValueError: 未知的后端名称
+    """
+    name = name or os.environ.get(JSON_BACKEND_ENV) or "auto"
+    if name == "auto":
+        for candidate in JSON_BACKENDS:
+            try:
+                return get_backend(candidate)
+            except ImportError:
+                continue
+    if name not in _FACTORIES:
+        raise ValueError(f"未知的JSON解码后端: {name} (可选: auto, {', '.join(JSON_BACKENDS)})")
+
+    if name not in _backends:
+        _backends[name] = _FACTORIES[name]()
+    return _backends[name]
+
+
+def decode_jsonl_lines(lines: Iterable[bytes], records: List[Any],
+                       backend: Optional[JsonBackend] = None) -> Tuple[int, Optional[json.JSONDecodeError]]:
+    """
+    解码 bytes 行并追加到 records
+
+    Args:
+        lines: 按 b'\\n' 划分的行（可以带行尾换行符）
+        records: 解码结果追加到这里，空行与无法解析的行跳过
+        backend: 解码后端，默认见 get_backend()
+
+    Returns:
+        (无法解析而跳过的行数, 第一个解析错误)
+
+    Raises:
+        UnicodeDecodeError: 某行不是有效的 UTF-8（此前的行已追加到 records）
+    """
+    backend = backend or get_backend()
+    loads, errors = backend.loads, backend.errors
+    long_digits = None if backend.exact_ints else _has_long_digits
+    append = records.append
+    skipped = 0
+    decode_error = None
+
+    with paused_gc():
+        for line in lines:
+            # 快速路径：行内没有单独的 \r（行尾的 \r\n 除外）且加速库能解析
+            cr = line.find(b'\r')
+            if (cr < 0 or (cr == len(line) - 2 and line[-1] == 0x0A)) and not (long_digits and long_digits(line)):
+                try:
+                    append(loads(line))
+                    continue
+                except errors:
+                    pass
+
+            line_skipped, line_error = decode_text_line(line, records)
+            skipped += line_skipped
+            decode_error = decode_error or line_error
+
+    return skipped, decode_error
+
+
+def decode_text_line(line: bytes, records: List[Any]) -> Tuple[int, Optional[json.JSONDecodeError]]:
+    """
+    按原有的文本方式解码一行（单独的 \r 视为换行），结果追加到 records
+
+    Returns:
+        (无法解析而跳过的行数, 第一个解析错误)
+
+    Raises:
+        UnicodeDecodeError: 该行不是有效的 UTF-8
+    """
+    skipped = 0
+    decode_error = None
+    for text in io.StringIO(line.decode('utf-8'), newline=None):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            records.append(json.loads(text))
+        except json.JSONDecodeError as e:
+            skipped += 1
+            decode_error = decode_error or e
+    return skipped, decode_error
+
+
+@contextmanager
+def paused_gc():
+    """暂停循环垃圾回收：JSON 记录不含循环引用，解码时大量新建容器对象只会反复触发无用的回收"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def decode_json_bytes(data: bytes, backend: Optional[JsonBackend] = None) -> Any:
+    """
+    解码整个 JSON 文件的内容，结果与 json.load 以 UTF-8 文本方式读取相同
+
+    Raises:
+        json.JSONDecodeError: 内容不是有效的JSON
+        UnicodeDecodeError: 内容不是有效的 UTF-8
+    """
+    backend = backend or get_backend()
+    if not backend.exact_ints and _has_long_digits(data):
+        return json.loads(data.decode('utf-8'))
+    try:
+        return backend.loads(data)
+    except backend.errors:
+        return json.loads(data.decode('utf-8'))
+
+
+def read_json_file(path: str, backend: Optional[JsonBackend] = None) -> Any:
+    """读取整个 JSON 文件（例如 todos 文件），结果与 json.load 相同"""
+    data = take_prefetched(path)
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    return decode_json_bytes(data, backend)
@@ -0,0 +1,332 @@
+"""
+基于内存映射的 JSONL 读取
+把文件映射到内存，用 mmap.find 查找换行符，按行产出零拷贝的 memoryview 切片及其字节偏移，
+不为每行分配 bytes/str 对象；加速解码库直接解码这些切片
+
+偏移可用于按行定位与增量读取（从某个完整行之后继续）。
+给定过滤条件（shared/record_filter.py）时先在原始字节上预筛选，整段跳过不可能匹配的行，只解码候选行。
+紧凑归档（shared/compaction.py）中的 blob 引用在解码后还原。
+"""
+
+import os
+import mmap
+import bisect
+from contextlib import contextmanager
+from typing import Any, Generator, Iterator, List, Optional, Tuple
+
+from .json_backend import JsonBackend, get_backend, decode_text_line, long_digit_positions, paused_gc
+from .record_filter import RecordFilter
+from .skeleton import GIANT_LINE_BYTES, skeleton
+from .prefetch import take_prefetched
+from .compressed import is_compressed, decompress_file
+from .compaction import is_compact, blob_store_for, rehydrate
+
+
+@contextmanager
+def mapped_file(path: str):
+    """
+    只读映射整个文件，产出映射对象（空文件为 b''）
+
+    已预读时直接产出预读的内容；压缩文件（见 shared/compressed.py）产出解压后的全部内容。
+    """
+    data = take_prefetched(path)
+    if data is None and is_compressed(path):
+        data = decompress_file(path)
+    if data is not None:
+        yield data
+        return
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            yield b''
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:  # 调用方仍持有切片，映射随切片一起释放
+            pass
+
+
+def iter_lines(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, memoryview]]:
+    """
+    按 b'\\n' 划分文件 [start, end) 字节范围内的行（start 必须位于行首）
+
+    Yields:
+        (行首偏移, 行内容的 memoryview，含行尾换行符)；切片在下一次迭代前有效，需要保留时复制为 bytes
+    """
+    with mapped_file(path) as mapped:
+        end = len(mapped) if end is None else min(end, len(mapped))
+        view = memoryview(mapped)
+        try:
+            position = start
+            while position < end:
+                newline = mapped.find(b'\n', position, end)
+                line_end = end if newline < 0 else newline + 1
+                line = view[position:line_end]
+                yield position, line
+                line.release()
+                position = line_end
+        finally:
+            view.release()
+
+
+def line_ranges(path: str, range_bytes: int) -> List[Tuple[int, int]]:
+    """
+    把文件划分为若干约 range_bytes 字节的 [start, end) 范围，每个范围都从行首开始、在换行符之后结束
+    （最后一个范围到文件末尾），各范围可以分别读取，依次连接即为整个文件
+
+    只适用于未压缩的文件；不读取预读内容，由各范围的读取方照常读取。
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= range_bytes:
+            return [(0, size)]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            bounds = [0]
+            while size - bounds[-1] > range_bytes:
+                newline = mapped.find(b'\n', bounds[-1] + range_bytes - 1)
+                if newline < 0 or newline + 1 >= size:
+                    break
+                bounds.append(newline + 1)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def read_jsonl_file(path: str, records: List[Any], start: int = 0, end: Optional[int] = None,
+                    backend: Optional[JsonBackend] = None, record_filter: Optional[RecordFilter] = None,
+                    string_prefix: Optional[int] = None) -> Tuple[int, Optional[Exception]]:
+    """
+    解码 jsonl 文件 [start, end) 字节范围内的记录并追加到 records，结果与以文本方式逐行读取相同
+
+    含单独 \\r 的行与（后端会把超出 64 位的整数解析为浮点数时）含长数字的行按原有的文本方式解码，
+    其余行的 memoryview 切片直接交给解码后端。
+
+    给定 record_filter 时只追加满足条件的记录，结果与读取全部记录后再过滤相同；
+    不过只有通过预筛选的行才会被解码，其余行中的无效JSON或无效 UTF-8 不计入跳过的行数，也不会报错。
+
+    给定 string_prefix 时按结构读取（见 shared/skeleton.py）：超长行解码后立即化简为骨架，字符串值只保留前
+    string_prefix 个字符，供只关心结构与基础类型的分析使用；不能与 record_filter 同时使用。
+
+    紧凑归档中的 blob 引用还原为原字符串（结构读取时尽量只用引用中的预览），结果与读取原会话文件相同；
+    大字符串不在归档的原始字节中，给定 record_filter 时不做预筛选。
+
+    Returns:
+        (无法解析而跳过的行数, 第一个解析错误)
+
+    Raises:
+        UnicodeDecodeError: 某行不是有效的 UTF-8（此前的行已追加到 records）
+        OSError: 文件无法读取，或紧凑归档引用的 blob 不存在
+    """
+    backend = backend or get_backend()
+
+    if record_filter is not None and record_filter.prefiltered and not is_compact(path):
+        return _read_filtered(path, records, start, end, backend, record_filter)
+
+    if record_filter is not None:
+        matched = []
+        skipped, decode_error = read_jsonl_file(path, matched, start, end, backend)
+        records.extend(record for record in matched if record_filter.matches(record))
+        return skipped, decode_error
+
+    if is_compact(path):
+        # 先解码出带引用的记录（引用本身不能被化简为骨架），再按需还原
+        first = len(records)
+        skipped, decode_error = _read_records(path, records, start, end, backend, None)
+        store = blob_store_for(path)
+        records[first:] = [rehydrate(record, store, string_prefix) for record in records[first:]]
+        return skipped, decode_error
+
+    return _read_records(path, records, start, end, backend, string_prefix)
+
+
+def _read_records(path: str, records: List[Any], start: int, end: Optional[int], backend: JsonBackend,
+                  string_prefix: Optional[int]) -> Tuple[int, Optional[Exception]]:
+    """逐行解码 [start, end) 内的全部记录，见 read_jsonl_file()"""
+    decoding = _decode_lines(path, records, start, end, backend, string_prefix)
+    try:
+        next(decoding)  # 不分批时一次解码到底
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("未分批的解码不应中途产出")
+
+
+def _decode_lines(path: str, records: List[Any], start: int, end: Optional[int], backend: JsonBackend,
+                  string_prefix: Optional[int], batch_size: Optional[int] = None,
+                  strict: bool = False) -> Generator[None, None, Tuple[int, Optional[Exception]]]:
+    """
+    逐行解码并追加到 records，返回 (无法解析而跳过的行数, 第一个解析错误)
+
+    给定 batch_size 时 records 每积累到 batch_size 条就在行边界处产出一次，由调用方取走并清空；
+    产出期间恢复循环垃圾回收。strict 时遇到无法解析的行立即抛出解析错误。
+    """
+    loads, errors = backend.loads, backend.errors
+    append = records.append
+    skipped = 0
+    decode_error = None
+
+    with mapped_file(path) as mapped:
+        end = len(mapped) if end is None else min(end, len(mapped))
+        suspects = _suspect_positions(mapped, start, end, backend)
+        next_suspect = suspects[0] if suspects else end
+        view = memoryview(mapped)
+        try:
+            position = start
+            while position < end:
+                with paused_gc():
+                    while position < end and (batch_size is None or len(records) < batch_size):
+                        newline = mapped.find(b'\n', position, end)
+                        line_end = end if newline < 0 else newline + 1
+
+                        reduce = string_prefix is not None and line_end - position >= GIANT_LINE_BYTES
+                        if next_suspect >= line_end:
+                            line = view[position:line_end]
+                            try:
+                                record = loads(line)
+                                append(skeleton(record, string_prefix) if reduce else record)
+                                position = line_end
+                                continue
+                            except errors:
+                                pass
+                            finally:
+                                line.release()
+                        else:
+                            index = bisect.bisect_left(suspects, line_end)
+                            next_suspect = suspects[index] if index < len(suspects) else end
+
+                        decoded = len(records)
+                        line_skipped, line_error = decode_text_line(mapped[position:line_end], records)
+                        if reduce:
+                            records[decoded:] = [skeleton(record, string_prefix) for record in records[decoded:]]
+                        if strict and line_error is not None:
+                            raise line_error
+                        skipped += line_skipped
+                        decode_error = decode_error or line_error
+                        position = line_end
+                if position < end:
+                    yield
+        finally:
+            view.release()
+
+    return skipped, decode_error
+
+
+def iter_jsonl_file(path: str, batch_size: int, backend: Optional[JsonBackend] = None,
+                    string_prefix: Optional[int] = None,
+                    strict: bool = False) -> Generator[List[Any], None, Tuple[int, Optional[Exception]]]:
+    """
+    分批解码 jsonl 文件，每批至多 batch_size 条记录（最后一批可能更少），结果与 read_jsonl_file() 相同
+
+    同一时刻只保留一批记录（文件本身仍整体映射；压缩文件整体解压在内存中）。紧凑归档的引用逐批还原。
+    出错时先产出出错前已解码的记录再抛出异常。
+
+    Args:
+        strict: 遇到无法解析的行时抛出解析错误（此前的记录已产出）
+
+    Returns:
+        (无法解析而跳过的行数, 第一个解析错误)，作为生成器的返回值
+
+    Raises:
+        UnicodeDecodeError: 某行不是有效的 UTF-8
+        json.JSONDecodeError: strict 时某行无法解析
+        OSError: 文件无法读取，或紧凑归档引用的 blob 不存在
+    """
+    backend = backend or get_backend()
+    store = blob_store_for(path) if is_compact(path) else None
+    pending = []
+
+    def take() -> List[Any]:
+        batch = pending[:]
+        pending.clear()
+        if store is not None:
+            batch = [rehydrate(record, store, string_prefix) for record in batch]
+        return batch
+
+    # 紧凑归档中的引用不能被化简为骨架，还原时再按 string_prefix 处理
+    decoding = _decode_lines(path, pending, 0, None, backend, None if store else string_prefix,
+                             max(1, batch_size), strict)
+    try:
+        while True:
+            next(decoding)
+            yield take()
+    except StopIteration as stop:
+        result = stop.value
+    except Exception:
+        if pending:
+            yield take()
+        raise
+    if pending:
+        yield take()
+    return result
+
+
+def _read_filtered(path: str, records: List[Any], start: int, end: Optional[int], backend: JsonBackend,
+                   record_filter: RecordFilter) -> Tuple[int, Optional[Exception]]:
+    """
+    带预筛选的读取：用各锚点的下一个命中位置直接跳到下一个候选行，通过预筛选的行才解码并复核
+
+    每个锚点只在其上次命中位置落到已读位置之前时才继续向后查找，整个文件的查找总量是线性的；
+    需要按文本方式解码的位置也只在候选行内查找。
+    """
+    loads, errors = backend.loads, backend.errors
+    skipped = 0
+    decode_error = None
+
+    with mapped_file(path) as mapped, paused_gc():
+        end = len(mapped) if end is None else min(end, len(mapped))
+        anchors = record_filter.anchors()
+        hits = [-1] * len(anchors)
+        view = memoryview(mapped)
+        try:
+            position = start
+            while position < end:
+                for i, find in enumerate(anchors):
+                    if hits[i] < position:
+                        hit = find(mapped, position, end)
+                        hits[i] = end if hit < 0 else hit
+                candidate = min(hits)
+                if candidate >= end:
+                    break
+
+                line_start = max(position, mapped.rfind(b'\n', position, candidate) + 1)
+                newline = mapped.find(b'\n', candidate, end)
+                line_end = end if newline < 0 else newline + 1
+                position = line_end
+                if not record_filter.may_match(mapped, line_start, line_end):
+                    continue
+
+                decoded = []
+                if not _suspect_positions(mapped, line_start, line_end, backend):
+                    line = view[line_start:line_end]
+                    try:
+                        decoded.append(loads(line))
+                    except errors:
+                        pass
+                    finally:
+                        line.release()
+                if not decoded:
+                    line_skipped, line_error = decode_text_line(mapped[line_start:line_end], decoded)
+                    skipped += line_skipped
+                    decode_error = decode_error or line_error
+                records.extend(record for record in decoded if record_filter.matches(record))
+        finally:
+            view.release()
+
+    return skipped, decode_error
+
+
+def _suspect_positions(mapped, start: int, end: int, backend: JsonBackend) -> List[int]:
+    """需要按文本方式解码的位置：单独的 \\r（不在 \\n 之前），以及后端会有损解析的长数字"""
+    positions = []
+    cr = mapped.find(b'\r', start, end)
+    while cr >= 0:
+        if cr + 1 >= end or mapped[cr + 1] != 0x0A:
+            positions.append(cr)
+        cr = mapped.find(b'\r', cr + 1, end)
+
+    if not backend.exact_ints:
+        positions.extend(long_digit_positions(mapped, start, end))
+    positions.sort()
+    return positions
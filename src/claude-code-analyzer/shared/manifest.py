@@ -0,0 +1,212 @@
+"""
+扫描清单读写
+在内存中的 ScanResult 与 T06 输出的 scan_results.json 之间转换
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from .models import SessionFile, ScanResult
+from .utils import MissingDependencyError
+
+
+# T06 扫描清单相对于任务输出根目录的位置
+SCAN_RESULT_RELPATH = Path("T06_data_scan") / "scan_results.json"
+
+
+def build_scan_report(scan_result: ScanResult) -> Dict[str, Any]:
+    """
+    生成 T06 扫描报告 (scan_results.json 的内容)
+
+    Args:
+        scan_result: 扫描结果
+
+    Returns:
+        可直接序列化为JSON的报告字典
+    """
+    return {
+        "task_id": "T06",
+        "task_name": "数据源扫描分析",
+        "execution_time": datetime.now().isoformat(),
+        "scan_summary": {
+            "total_files": scan_result.total_files,
+            "total_records": scan_result.total_records,
+            "total_size_mb": round(scan_result.total_size / 1024 / 1024, 2),
+            "projects_count": len(scan_result.projects),
+            "session_files": len([f for f in scan_result.files if f.file_type == "jsonl"]),
+            "todos_files": len([f for f in scan_result.files if f.file_type == "json"])
+        },
+        "projects": scan_result.projects,
+        "date_range": {
+            "start": scan_result.date_range[0].isoformat() if scan_result.date_range else None,
+            "end": scan_result.date_range[1].isoformat() if scan_result.date_range else None
+        },
+        "file_details": [_file_detail(f) for f in scan_result.files]
+    }
+
+
+def _file_detail(f: SessionFile) -> Dict[str, Any]:
+    detail = {
+        "path": f.path,
+        "session_id": f.session_id,
+        "project": f.project,
+        "size": f.size,
+        "records": f.records,
+        "file_type": f.file_type,
+        "modified": f.modified.isoformat()
+    }
+    # 增量读取用的偏移与锚点，只有会话文件才有
+    if f.complete_bytes is not None:
+        detail["complete_bytes"] = f.complete_bytes
+        detail["complete_records"] = f.complete_records
+        detail["anchor"] = f.anchor
+    return detail
+
+
+def scan_result_from_report(report: Dict[str, Any]) -> ScanResult:
+    """
+    从 T06 扫描报告还原 ScanResult
+
+    Args:
+        report: scan_results.json 的内容
+
+    Returns:
+        扫描结果，统计值按文件明细重新计算
+    """
+    result = ScanResult()
+
+    for detail in report.get("file_details", []):
+        result.files.append(SessionFile(
+            path=detail["path"],
+            size=detail["size"],
+            session_id=detail["session_id"],
+            project=detail["project"],
+            modified=datetime.fromisoformat(detail["modified"]),
+            records=detail.get("records", 0),
+            file_type=detail.get("file_type", "jsonl"),
+            complete_bytes=detail.get("complete_bytes"),
+            complete_records=detail.get("complete_records"),
+            anchor=detail.get("anchor")
+        ))
+
+    result.total_files = len(result.files)
+    result.total_records = sum(f.records for f in result.files)
+    result.total_size = sum(f.size for f in result.files)
+    result.projects = report.get("projects") or sorted({f.project for f in result.files})
+
+    date_range = report.get("date_range") or {}
+    if date_range.get("start") and date_range.get("end"):
+        result.date_range = (datetime.fromisoformat(date_range["start"]),
+                             datetime.fromisoformat(date_range["end"]))
+
+    return result
+
+
+def filter_scan_result(scan_result: ScanResult, project: Optional[str] = None,
+                       session_id: Optional[str] = None) -> ScanResult:
+    """
+    按项目或Session筛选扫描结果
+
+    todos 文件不属于任何项目，保留与筛选后Session对应的那些。
+
+    Args:
+        scan_result: 完整扫描结果
+        project: 只保留该项目的Session
+        session_id: 只保留该Session
+
+    Returns:
+        筛选后的扫描结果，统计值按保留的文件重新计算
+    """
+    sessions = [
+        f for f in scan_result.files
+        if f.file_type == "jsonl"
+        and (project is None or f.project == project)
+        and (session_id is None or f.session_id == session_id)
+    ]
+    session_ids = {f.session_id for f in sessions}
+    todos = [f for f in scan_result.files if f.file_type == "json" and f.session_id in session_ids]
+    kept = {id(f) for f in sessions + todos}
+
+    return _subset_scan_result([f for f in scan_result.files if id(f) in kept])
+
+
+def session_shard(session_id: str, shard_count: int) -> int:
+    """Session 所属的分片（稳定哈希，不受进程或机器影响）"""
+    digest = hashlib.sha1(session_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def shard_scan_result(scan_result: ScanResult, shard: int, shard_count: int) -> ScanResult:
+    """
+    按 Session ID 的哈希取出扫描清单中的一个分片
+
+    同一Session的会话文件与 todos 文件总在同一分片。
+
+    Args:
+        scan_result: 完整扫描结果
+        shard: 分片序号（从 0 开始）
+        shard_count: 分片总数
+
+    Returns:
+        该分片的扫描结果，统计值按保留的文件重新计算
+    """
+    return _subset_scan_result(
+        [f for f in scan_result.files if session_shard(f.session_id, shard_count) == shard]
+    )
+
+
+def _subset_scan_result(files: List[SessionFile]) -> ScanResult:
+    """由扫描清单中的部分文件（保持原有顺序）构造扫描结果"""
+    result = ScanResult()
+    result.files = files
+    result.total_files = len(result.files)
+    result.total_records = sum(f.records for f in result.files)
+    result.total_size = sum(f.size for f in result.files)
+    result.projects = sorted({f.project for f in result.files})
+    if result.files:
+        dates = [f.modified for f in result.files]
+        result.date_range = (min(dates), max(dates))
+
+    return result
+
+
+def load_scan_result(scan_result_file: str) -> ScanResult:
+    """
+    加载 T06 扫描清单
+
+    Args:
+        scan_result_file: scan_results.json 路径
+
+    Returns:
+        扫描结果
+    """
+    with open(scan_result_file, 'r', encoding='utf-8') as f:
+        return scan_result_from_report(json.load(f))
+
+
+def resolve_scan_result(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> ScanResult:
+    """
+    获取任务所需的扫描结果：优先使用进程内上下文中已加载的 ScanResult，
+    否则读取输出根目录下的 T06 扫描清单
+
+    Args:
+        output_dir: 当前任务的输出目录
+        context: 调度器在进程内模式下共享的任务上下文
+
+    Returns:
+        扫描结果
+
+    Raises:
+        MissingDependencyError: 上下文中没有扫描结果且扫描清单不存在
+    """
+    if context and context.get("T06", {}).get("scan_result") is not None:
+        return context["T06"]["scan_result"]
+
+    scan_result_file = Path(output_dir).parent / SCAN_RESULT_RELPATH
+    if not scan_result_file.exists():
+        raise MissingDependencyError(2, "依赖文件不存在", str(scan_result_file))
+
+    return load_scan_result(str(scan_result_file))
@@ -17,6 +17,9 @@ class SessionFile:
     modified: datetime
     records: int = 0
     file_type: str = "jsonl"
+    complete_bytes: Optional[int] = None  # 最后一个完整行之后的字节偏移（仅 jsonl）
+    complete_records: Optional[int] = None  # 该偏移之前的记录数
+    anchor: Optional[str] = None  # 该偏移处的锚点摘要，见 shared.incremental.file_anchor
 
 
 @dataclass
@@ -0,0 +1,232 @@
+"""
+并行执行
+会话文件的大小呈长尾分布：少数巨大的会话占了大部分字节，把文件平均分给各进程时，分到大文件的进程
+最后一个结束，其余进程早早空闲。这里按扫描清单中的大小从大到小把文件放入共享队列，空闲的工作进程
+随时取走下一个文件（大文件最先开始，小文件填满各进程的尾部），为每个文件生成与分片执行相同的部分聚合；
+全部完成后按扫描清单中的文件顺序返回，由任务依次折叠（与分片合并、增量读取相同），结果与串行执行完全相同。
+
+任何以 IncrementalFold 描述部分聚合的任务都可以使用（T01、T02、T04），每个文件由 full_segment() 处理。
+
+单个会话文件也可能有数百 MB，只按文件分发时最慢的文件决定整体耗时。折叠方式支持分段（splittable，T02、T04）时，
+超过分段大小的未压缩会话文件按换行符划分为若干字节范围（shared/jsonl.py 中的 line_ranges），
+与其他文件一起按大小分发；各范围在工作进程中从空状态折叠（与增量读取相同的读取方式），
+全部完成后按范围顺序用 merge_states() 合并（T04 的首末条记录因此取自第一个与最后一个有记录的范围），
+再由 segment() 生成该文件的部分聚合。任一范围读取或处理出错时，该文件改由 full_segment() 完整处理。
+
+调度器 --workers 设置以下环境变量，任务据此选择执行方式:
+    CLAUDE_ANALYZER_WORKERS=8         用 8 个工作进程处理语料（1 表示串行）
+    CLAUDE_ANALYZER_RANGE_MB=32       多进程时超过该大小的会话文件分段处理（0 表示不分段）
+"""
+
+import os
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .models import SessionFile, ScanResult
+from .progress import ProgressReporter
+from .prefetch import prefetching
+from .incremental import IncrementalFold, read_jsonl_range
+from .jsonl import line_ranges
+from .compressed import is_archive
+
+
+WORKERS_ENV = "CLAUDE_ANALYZER_WORKERS"
+RANGE_MB_ENV = "CLAUDE_ANALYZER_RANGE_MB"
+
+DEFAULT_RANGE_MB = 32
+
+
+def requested_workers() -> int:
+    """本次执行使用的工作进程数，1 表示串行"""
+    return max(1, int(os.environ.get(WORKERS_ENV) or 1))
+
+
+def requested_range_bytes() -> int:
+    """多进程时会话文件分段处理的大小，0 表示不分段"""
+    return int(float(os.environ.get(RANGE_MB_ENV, DEFAULT_RANGE_MB)) * 1024 * 1024)
+
+
+def largest_first(files: List[SessionFile]) -> List[SessionFile]:
+    """按扫描清单中的大小从大到小排列（大小相同时保持原有顺序）"""
+    return sorted(files, key=lambda f: f.size, reverse=True)
+
+
+@dataclass
+class WorkItem:
+    """交给工作进程的一项工作：在工作进程中调用 work(*args)"""
+    key: Hashable  # 结果的键
+    size: int  # 分发顺序依据的字节数
+    work: Callable[..., Any]
+    args: Tuple = ()
+
+
+class FileExecutor:
+    """
+    按大小从大到小把文件分发给工作进程
+
+    所有文件按大小排好后依次提交到进程池的共享队列，每个工作进程处理完一个文件就取下一个，
+    耗时长的文件不会排在别的文件之后才开始，进程之间也不需要预先划分文件。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+
+    def run(self, items: List[WorkItem], done: Optional[Callable[[WorkItem], None]] = None) -> Dict[Hashable, Any]:
+        """
+        按 size 从大到小执行各项工作（work 及其参数、返回值需要可以序列化）
+
+        Args:
+            items: 要执行的工作
+            done: 每项工作完成时在当前进程中调用
+
+        Returns:
+            key -> work 的返回值
+
+        Raises:
+            work 抛出的异常，或工作进程异常退出时的 BrokenProcessPool
+        """
+        ordered = sorted(items, key=lambda item: item.size, reverse=True)
+        results: Dict[Hashable, Any] = {}
+        if self.workers == 1 or len(items) <= 1:
+            for item in ordered:
+                results[item.key] = item.work(*item.args)
+                if done:
+                    done(item)
+            return results
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            futures = {pool.submit(item.work, *item.args): item for item in ordered}
+            for future in as_completed(futures):
+                item = futures[future]
+                results[item.key] = future.result()
+                if done:
+                    done(item)
+        return results
+
+    def map(self, files: List[SessionFile], work: Callable[[SessionFile], Any],
+            progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+        """
+        对每个文件调用 work（在工作进程中执行，work 与返回值需要可以序列化）
+
+        Args:
+            files: 要处理的文件
+            work: 文件 -> 结果
+            progress: 每个文件完成时按扫描清单中的记录数推进
+
+        Returns:
+            文件路径 -> 结果
+
+        Raises:
+            work 抛出的异常，或工作进程异常退出时的 BrokenProcessPool
+        """
+        if self.workers == 1 or len(files) <= 1:
+            return self._map_serial(files, work, progress)
+
+        def advance(item: WorkItem) -> None:
+            if progress:
+                file_info = item.args[0]
+                progress.advance(file_info.records, file_info.size, file_info.path)
+
+        return self.run([WorkItem(f.path, f.size, work, (f,)) for f in files], advance)
+
+    @staticmethod
+    def _map_serial(files: List[SessionFile], work: Callable[[SessionFile], Any],
+                    progress: Optional[ProgressReporter]) -> Dict[str, Any]:
+        results = {}
+        with prefetching(files):
+            for file_info in files:
+                results[file_info.path] = work(file_info)
+                if progress:
+                    progress.advance(file_info.records, file_info.size, file_info.path)
+        return results
+
+
+def parallel_segments(scan_result: ScanResult, folder: IncrementalFold, task_id: str,
+                      workers: Optional[int] = None) -> List[Tuple[SessionFile, Any]]:
+    """
+    用多个工作进程为每个文件生成部分聚合
+
+    Args:
+        scan_result: 扫描结果
+        folder: 任务的折叠方式，每个文件由 folder.full_segment() 完整处理
+        task_id: 任务ID（进度显示）
+        workers: 工作进程数，默认为环境变量指定的数量
+
+    Returns:
+        [(文件, 部分聚合)]，按扫描清单中的文件顺序；不属于 folder.file_types 的文件部分聚合为 None
+    """
+    workers = workers or requested_workers()
+    files = [f for f in scan_result.files if f.file_type in folder.file_types]
+    progress = ProgressReporter(task_id, sum(f.records for f in files), sum(f.size for f in files))
+
+    # 支持分段时，超过分段大小的会话文件按换行符划分为若干范围
+    range_bytes = requested_range_bytes() if folder.splittable and workers > 1 else 0
+    ranges: Dict[str, List[Tuple[int, int]]] = {}
+    if range_bytes > 0:
+        for file_info in files:
+            if file_info.file_type == "jsonl" and file_info.size > range_bytes and not is_archive(file_info.path):
+                try:
+                    split = line_ranges(file_info.path, range_bytes)
+                except OSError:
+                    continue  # 由 full_segment 照常读取并报告错误
+                if len(split) > 1:
+                    ranges[file_info.path] = split
+
+    if not ranges:
+        print(f"⚙️ {workers} 个工作进程按大小从大到小处理 {len(files)} 个文件")
+        segments = FileExecutor(workers).map(files, folder.full_segment, progress)
+        progress.finish()
+        return [(f, segments.get(f.path)) for f in scan_result.files]
+
+    items = []
+    for file_info in files:
+        if file_info.path not in ranges:
+            items.append(WorkItem(file_info.path, file_info.size, folder.full_segment, (file_info,)))
+            continue
+        for start, end in ranges[file_info.path]:
+            items.append(WorkItem((file_info.path, start), end - start, _fold_range, (folder, file_info, start, end)))
+    print(f"⚙️ {workers} 个工作进程按大小从大到小处理 {len(files)} 个文件 "
+          f"(其中 {len(ranges)} 个大文件分为 {sum(len(r) for r in ranges.values())} 段)")
+
+    pending = {path: len(split) for path, split in ranges.items()}
+
+    def advance(item: WorkItem) -> None:
+        file_info = item.args[0] if isinstance(item.key, str) else item.args[1]
+        if isinstance(item.key, str):
+            progress.advance(file_info.records, file_info.size, file_info.path)
+            return
+        pending[file_info.path] -= 1
+        progress.advance(0 if pending[file_info.path] else file_info.records, item.size, file_info.path)
+
+    results = FileExecutor(workers).run(items, advance)
+    progress.finish()
+
+    segments = []
+    for file_info in scan_result.files:
+        if file_info.path not in ranges:
+            segments.append((file_info, results.get(file_info.path)))
+            continue
+        states = [results[(file_info.path, start)] for start, _ in ranges[file_info.path]]
+        if any(state is None for state in states):
+            # 某个范围读取或处理出错：按原有方式完整处理
+            segments.append((file_info, folder.full_segment(file_info)))
+            continue
+        state = states[0]
+        for later in states[1:]:
+            state = folder.merge_states(state, later)
+        segments.append((file_info, folder.segment(state, file_info)))
+    return segments
+
+
+def _fold_range(folder: IncrementalFold, file_info: SessionFile, start: int, end: int) -> Any:
+    """在工作进程中把会话文件 [start, end) 范围内的记录折叠进空状态；读取或处理出错时为 None"""
+    records, error = read_jsonl_range(file_info.path, start, end)
+    if error is not None:
+        return None
+    state = folder.new_state(file_info)
+    try:
+        folder.fold(state, records)
+    except Exception:
+        return None
+    return state
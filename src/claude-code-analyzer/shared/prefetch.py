@@ -0,0 +1,216 @@
+"""
+预读
+按扫描清单顺序依次处理文件时，由少量读取线程提前把后续文件（或其解析结果缓存条目）读入内存，
+主线程解析当前文件的同时等待磁盘；在网络挂载或冷缓存的主目录上，读取等待原本占 T01/T02 耗时的很大一部分。
+已读入但尚未取用的内容总量不超过字节预算，超出预算的大文件不预读，由读取方照常直接读取。
+压缩的会话文件（见 shared/compressed.py）在工作进程中解压，预算按解压后的大小计算。
+解压后超出预算的压缩文件同样在工作进程中解压：排在它之前的预读内容都被取用后单独提交，
+与前一个文件的解析重叠，内存中只多出这一个文件（读取方本来也要把它整个解压到内存）。
+预算为 0 时不预读，压缩文件由读取方在主线程中解压。
+
+读取方（shared/jsonl.py、解析结果缓存、JSON文件读取）通过 take_prefetched() 取用当前线程的预读内容，
+文件在预读之后被修改时丢弃预读内容，照常重新读取。
+
+调度器通过以下环境变量设置预算与线程数（预算为 0 时不预读）:
+    CLAUDE_ANALYZER_PREFETCH_MB=64
+    CLAUDE_ANALYZER_PREFETCH_THREADS=2
+"""
+
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import Dict, List, Optional, Tuple
+
+from .models import SessionFile
+from .compressed import is_compressed, decompress_file, expanded_size, DECOMPRESS_ERRORS
+
+
+PREFETCH_BUDGET_ENV = "CLAUDE_ANALYZER_PREFETCH_MB"
+PREFETCH_THREADS_ENV = "CLAUDE_ANALYZER_PREFETCH_THREADS"
+
+DEFAULT_PREFETCH_MB = 64
+DEFAULT_PREFETCH_THREADS = 2
+
+
+def _read_file(path: str) -> Optional[Tuple[bytes, Tuple[int, int]]]:
+    """读取整个文件，返回 (内容, (大小, 修改时间))；读取出错或读取期间文件变化时为 None"""
+    try:
+        with open(path, 'rb') as f:
+            before = os.fstat(f.fileno())
+            data = f.read()
+            after = os.fstat(f.fileno())
+    except OSError:
+        return None
+    stamp = (before.st_size, before.st_mtime_ns)
+    if (after.st_size, after.st_mtime_ns) != stamp or len(data) != before.st_size:
+        return None
+    return data, stamp
+
+
+def _decompress_file(path: str) -> Optional[Tuple[bytes, Tuple[int, int]]]:
+    """在工作进程中解压整个文件，返回值同 _read_file；解压出错时为 None，由读取方照常读取并报告错误"""
+    try:
+        before = os.stat(path)
+        data = decompress_file(path)
+        after = os.stat(path)
+    except DECOMPRESS_ERRORS:
+        return None
+    stamp = (before.st_size, before.st_mtime_ns)
+    if (after.st_size, after.st_mtime_ns) != stamp:
+        return None
+    return data, stamp
+
+
+class Prefetcher:
+    """
+    按给定顺序预读文件
+
+    读取方按顺序调用 take()；取用某个文件时，排在它之前而未被取用的预读内容随即丢弃（读取方跳过了这些文件），
+    释放的预算用于继续预读后面的文件。
+    """
+
+    def __init__(self, paths: List[str], budget_bytes: int, threads: int = DEFAULT_PREFETCH_THREADS):
+        self.budget_bytes = budget_bytes
+        self.order = {path: i for i, path in enumerate(paths)}
+        self.pending = deque(paths)
+        self.buffers: Dict[str, Tuple[Future, int]] = {}  # 路径 -> (读取任务, 占用的预算)
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.threads = max(1, threads)
+        self.pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="prefetch")
+        self.decompressors: Optional[ProcessPoolExecutor] = None  # 遇到压缩文件时才启动
+        self._fill()
+
+    def _fill(self) -> None:
+        """在预算内按顺序提交读取（调用方持有锁或尚未共享）"""
+        while self.pending:
+            path = self.pending[0]
+            try:
+                size = expanded_size(path)
+            except OSError:
+                self.pending.popleft()
+                continue
+            if size > self.budget_bytes:
+                if not is_compressed(path):  # 单个文件超出预算：不预读，由读取方映射读取
+                    self.pending.popleft()
+                    continue
+                if self.used_bytes > 0:  # 超出预算的压缩文件：等之前的预读内容都被取用后单独解压
+                    return
+            elif self.used_bytes + size > self.budget_bytes:
+                return
+            self.pending.popleft()
+            self.used_bytes += size
+            self.buffers[path] = (self._submit(path), size)
+
+    def _submit(self, path: str) -> Future:
+        if not is_compressed(path):
+            return self.pool.submit(_read_file, path)
+        if self.decompressors is None:
+            self.decompressors = ProcessPoolExecutor(max_workers=self.threads)
+        return self.decompressors.submit(_decompress_file, path)
+
+    def take(self, path: str) -> Optional[bytes]:
+        """
+        取用文件的预读内容（必要时等待读取完成）
+
+        Returns:
+            与文件当前版本一致的内容；未预读、读取失败或之后文件已变化时为 None
+        """
+        with self.lock:
+            index = self.order.get(path)
+            if index is None:  # 不在预读范围内
+                return None
+            entry = self.buffers.pop(path, None)
+            for skipped in [p for p in self.buffers if self.order[p] < index]:
+                self._discard(skipped)
+            while self.pending and self.order[self.pending[0]] <= index:
+                self.pending.popleft()
+            if entry is None:
+                self.misses += 1
+                self._fill()
+                return None
+            future, size = entry
+
+        result = future.result()
+        with self.lock:
+            self.used_bytes -= size
+            self._fill()
+
+        if result is not None:
+            data, stamp = result
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_size, stat.st_mtime_ns) == stamp:
+                self.hits += 1
+                return data
+        self.misses += 1
+        return None
+
+    def _discard(self, path: str) -> None:
+        future, size = self.buffers.pop(path)
+        future.cancel()
+        self.used_bytes -= size
+
+    def close(self) -> None:
+        """丢弃尚未取用的内容，等待进行中的读取结束"""
+        with self.lock:
+            self.pending.clear()
+            for path in list(self.buffers):
+                self._discard(path)
+        self.pool.shutdown(wait=True)
+        if self.decompressors is not None:
+            self.decompressors.shutdown(wait=True)
+
+
+_local = threading.local()
+
+
+def take_prefetched(path: str) -> Optional[bytes]:
+    """当前线程正在使用的预读器中该文件的内容，没有时为 None"""
+    prefetcher = getattr(_local, "prefetcher", None)
+    if prefetcher is None:
+        return None
+    return prefetcher.take(path)
+
+
+def prefetch_budget() -> Tuple[int, int]:
+    """环境变量指定的 (字节预算, 线程数)"""
+    budget_mb = float(os.environ.get(PREFETCH_BUDGET_ENV, DEFAULT_PREFETCH_MB))
+    threads = int(os.environ.get(PREFETCH_THREADS_ENV, DEFAULT_PREFETCH_THREADS))
+    return int(budget_mb * 1024 * 1024), threads
+
+
+@contextmanager
+def prefetching(files: List[SessionFile]):
+    """
+    在此范围内按 files 的顺序预读，供当前线程的读取方取用
+
+    会话文件在解析结果缓存中有当前版本的条目时预读该条目，否则预读文件本身。
+    """
+    budget_bytes, threads = prefetch_budget()
+    if budget_bytes <= 0 or not files or getattr(_local, "prefetcher", None) is not None:
+        if budget_bytes <= 0 and any(is_compressed(f.path) for f in files):
+            print("ℹ️ 预读已关闭 (预算为 0)，压缩的会话文件将在主线程中解压，不与解析重叠")
+        yield None
+        return
+
+    from .record_cache import default_record_cache
+    cache = default_record_cache()
+    paths = []
+    for file_info in files:
+        entry = cache.current_entry(file_info.path) if cache and file_info.file_type == "jsonl" else None
+        paths.append(str(entry) if entry else file_info.path)
+
+    prefetcher = Prefetcher(paths, budget_bytes, threads)
+    _local.prefetcher = prefetcher
+    try:
+        yield prefetcher
+    finally:
+        _local.prefetcher = None
+        prefetcher.close()
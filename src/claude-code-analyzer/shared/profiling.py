@@ -0,0 +1,227 @@
+"""
+任务性能剖析
+在 cProfile（可选 tracemalloc）下运行任务，输出排序后的统计、火焰图工具可读的折叠栈和内存分配 Top-N
+
+子进程模式下调度器通过本模块包装任务脚本:
+    python -m shared.profiling --output-dir <dir> [--memory] [--top N] <script> <args...>
+"""
+
+import io
+import sys
+import pstats
+import cProfile
+import runpy
+import argparse
+import threading
+import tracemalloc
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+# 剖析产物文件名，与任务输出保存在同一目录
+PROFILE_STATS_FILE = "profile.pstats"              # 原始统计，可用 snakeviz 等工具打开
+PROFILE_REPORT_FILE = "profile_stats.txt"          # 按累计耗时排序的文本统计
+PROFILE_COLLAPSED_FILE = "profile_collapsed.txt"   # flamegraph.pl / speedscope 可读的折叠栈
+PROFILE_MEMORY_FILE = "profile_tracemalloc.txt"    # 内存分配 Top-N
+
+PROFILE_ARTIFACTS = (PROFILE_STATS_FILE, PROFILE_REPORT_FILE, PROFILE_COLLAPSED_FILE, PROFILE_MEMORY_FILE)
+
+# 默认列出的函数/分配位置数
+DEFAULT_TOP_N = 30
+
+# 折叠栈展开的最大深度与最小耗时（秒），避免调用图过大时组合爆炸
+_MAX_STACK_DEPTH = 64
+_MIN_STACK_SECONDS = 1e-6
+
+# 内存快照采样间隔（秒）
+_MEMORY_SAMPLE_INTERVAL = 0.5
+
+
+class TaskProfiler:
+    """
+    任务剖析上下文管理器
+
+    cProfile 只记录进入上下文的线程；tracemalloc 是进程级的，
+    进程内并行执行时分配统计会包含同时运行的其他任务。
+    任务结束时大部分中间状态已释放，因此内存报告使用运行期间已追踪内存最高时的快照。
+    """
+
+    def __init__(self, output_dir: Path, task_id: str, trace_memory: bool = False, top_n: int = DEFAULT_TOP_N):
+        self.output_dir = Path(output_dir)
+        self.task_id = task_id
+        self.trace_memory = trace_memory
+        self.top_n = top_n
+        self.profiler = cProfile.Profile()
+        self.artifacts: List[Path] = []
+        self._started_tracemalloc = False
+        self._peak_snapshot = None
+        self._peak_current = 0
+        self._stop_sampling = threading.Event()
+        self._sampler = None
+
+    def __enter__(self) -> "TaskProfiler":
+        clear_profile_artifacts(self.output_dir)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.trace_memory:
+            self._sampler = threading.Thread(target=self._sample_memory, daemon=True)
+            self._sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.profiler.disable()
+
+        snapshot = None
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._take_peak_snapshot()
+            snapshot = self._peak_snapshot
+            _, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._write_stats()
+        if snapshot is not None:
+            self._write_memory_report(snapshot, peak)
+
+        # 不吞掉任务自身的异常（包括 SystemExit）
+        return False
+
+    def _sample_memory(self) -> None:
+        """定期检查已追踪内存，创新高时保存快照"""
+        while not self._stop_sampling.wait(_MEMORY_SAMPLE_INTERVAL):
+            self._take_peak_snapshot()
+
+    def _take_peak_snapshot(self) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._peak_current or self._peak_snapshot is None:
+            self._peak_current = current
+            self._peak_snapshot = tracemalloc.take_snapshot()
+
+    def _write_stats(self) -> None:
+        """保存原始统计、排序文本与折叠栈"""
+        stats_file = self.output_dir / PROFILE_STATS_FILE
+        self.profiler.dump_stats(str(stats_file))
+        self.artifacts.append(stats_file)
+
+        buffer = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=buffer)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top_n)
+
+        report_file = self.output_dir / PROFILE_REPORT_FILE
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write(f"# {self.task_id} cProfile 统计 (Top {self.top_n}，先按累计耗时、再按自身耗时排序)\n")
+            f.write(buffer.getvalue())
+        self.artifacts.append(report_file)
+
+        collapsed_file = self.output_dir / PROFILE_COLLAPSED_FILE
+        with open(collapsed_file, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(collapse_stacks(stats).items()):
+                microseconds = int(seconds * 1_000_000)
+                if microseconds > 0:
+                    f.write(f"{stack} {microseconds}\n")
+        self.artifacts.append(collapsed_file)
+
+    def _write_memory_report(self, snapshot: tracemalloc.Snapshot, peak: int) -> None:
+        """保存按代码行聚合的内存分配 Top-N"""
+        memory_file = self.output_dir / PROFILE_MEMORY_FILE
+        top_stats = snapshot.statistics("lineno")
+
+        with open(memory_file, 'w', encoding='utf-8') as f:
+            f.write(f"# {self.task_id} tracemalloc 内存分配 Top {self.top_n}\n")
+            f.write(f"# 峰值已追踪内存: {peak / 1024 / 1024:.1f} MB\n")
+            f.write(f"# 快照时存活 (采样到的最高点): {self._peak_current / 1024 / 1024:.1f} MB\n\n")
+            for rank, stat in enumerate(top_stats[:self.top_n], 1):
+                frame = stat.traceback[0]
+                f.write(f"{rank:3d}. {frame.filename}:{frame.lineno}: "
+                        f"{stat.size / 1024:.1f} KB, {stat.count} 个块\n")
+        self.artifacts.append(memory_file)
+
+
+def clear_profile_artifacts(output_dir: Path) -> None:
+    """删除上次剖析留下的产物，避免与本次结果混淆"""
+    for name in PROFILE_ARTIFACTS:
+        (Path(output_dir) / name).unlink(missing_ok=True)
+
+
+def _frame_label(func: Tuple[str, int, str]) -> str:
+    """函数标识 -> 折叠栈中的帧名"""
+    filename, lineno, name = func
+    if filename == "~":  # 内置函数
+        label = name
+    else:
+        label = f"{Path(filename).name}:{lineno}({name})"
+    return label.replace(";", ":").replace(" ", "_")
+
+
+def collapse_stacks(stats: pstats.Stats) -> Dict[str, float]:
+    """
+    由 cProfile 的调用关系近似还原折叠栈
+
+    cProfile 只记录调用边而非完整调用栈，这里从根函数沿调用边向下展开，
+    按调用边的累计耗时占比分摊每个函数的自身耗时。
+
+    Args:
+        stats: cProfile 统计
+
+    Returns:
+        "帧1;帧2;..." -> 自身耗时（秒）
+    """
+    raw = stats.stats
+    callees: Dict[tuple, Dict[tuple, float]] = defaultdict(dict)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, caller_stats in callers.items():
+            callees[caller][func] = caller_stats[3]  # 经由该调用边的累计耗时
+
+    collapsed: Dict[str, float] = defaultdict(float)
+
+    def walk(func: tuple, stack: List[str], on_stack: set, budget: float) -> None:
+        _, _, self_time, cumulative, _ = raw[func]
+        share = min(budget / cumulative, 1.0) if cumulative > 0 else 0.0
+        collapsed[";".join(stack)] += self_time * share
+
+        if len(stack) >= _MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, {}).items():
+            edge_budget = edge_time * share
+            if callee in on_stack or callee not in raw or edge_budget < _MIN_STACK_SECONDS:
+                continue
+            on_stack.add(callee)
+            stack.append(_frame_label(callee))
+            walk(callee, stack, on_stack, edge_budget)
+            stack.pop()
+            on_stack.discard(callee)
+
+    roots = [func for func, (_, _, _, _, callers) in raw.items() if not callers]
+    for root in roots:
+        walk(root, [_frame_label(root)], {root}, raw[root][3])
+
+    return collapsed
+
+
+def main():
+    """在剖析器下运行任务脚本（供调度器子进程模式使用）"""
+    parser = argparse.ArgumentParser(description="在 cProfile 下运行分析任务脚本")
+    parser.add_argument("--output-dir", required=True, help="剖析产物输出目录")
+    parser.add_argument("--task-id", default="task", help="任务ID，用于报告标题")
+    parser.add_argument("--memory", action="store_true", help="同时使用 tracemalloc 统计内存分配")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="报告中列出的条目数")
+    parser.add_argument("script", help="任务脚本路径")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="传给任务脚本的参数")
+    args = parser.parse_args()
+
+    sys.argv = [args.script] + args.script_args
+    with TaskProfiler(Path(args.output_dir), args.task_id, trace_memory=args.memory, top_n=args.top):
+        runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+任务进度上报
+任务通过独立于 stdout/stderr 的旁路通道向调度器发送结构化进度事件（每行一个JSON），
+调度器据此实时显示吞吐量与预计剩余时间
+
+子进程模式下任务进程退出时还会发送一条 exit 事件，带上本进程自身的内存峰值（/proc/self/status 的 VmHWM）。
+调度器 wait4 得到的 ru_maxrss 在 fork 时继承父进程的峰值，不能反映任务本身的内存占用。
+"""
+
+import os
+import atexit
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable
+
+
+# 子进程模式下调度器通过该环境变量告知进度管道的写端文件描述符
+PROGRESS_FD_ENV = "CLAUDE_ANALYZER_PROGRESS_FD"
+
+ProgressSink = Callable[[Dict[str, Any]], None]
+
+_local = threading.local()
+_fd_sink: Optional[ProgressSink] = None
+_fd_lock = threading.Lock()
+
+
+@contextmanager
+def progress_sink(sink: ProgressSink):
+    """
+    在当前线程内把进度事件直接交给 sink 处理（调度器进程内模式使用）
+
+    Args:
+        sink: 接收进度事件字典的回调
+    """
+    previous = getattr(_local, "sink", None)
+    _local.sink = sink
+    try:
+        yield
+    finally:
+        _local.sink = previous
+
+
+def _open_fd_sink() -> Optional[ProgressSink]:
+    """打开环境变量指定的进度管道，未设置或不可用时返回 None"""
+    global _fd_sink
+
+    fd = os.environ.get(PROGRESS_FD_ENV)
+    if not fd:
+        return None
+
+    with _fd_lock:
+        if _fd_sink is None:
+            try:
+                stream = os.fdopen(int(fd), 'w', buffering=1, encoding='utf-8')
+            except (OSError, ValueError):
+                return None
+
+            def write_event(event: Dict[str, Any]) -> None:
+                try:
+                    stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+                except (OSError, ValueError):
+                    pass  # 调度器已关闭管道时不影响任务本身
+
+            _fd_sink = write_event
+    return _fd_sink
+
+
+def _own_peak_rss_bytes() -> Optional[int]:
+    """本进程自身的内存峰值（exec 后重新计数），平台不支持时返回 None"""
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _report_exit() -> None:
+    """进程退出时向调度器发送本进程的内存峰值"""
+    sink = _open_fd_sink()
+    peak_rss = _own_peak_rss_bytes()
+    if sink is not None and peak_rss is not None:
+        sink({"event": "exit", "peak_rss_bytes": peak_rss})
+
+
+if os.environ.get(PROGRESS_FD_ENV):
+    atexit.register(_report_exit)
+
+
+def _resolve_sink() -> Optional[ProgressSink]:
+    """线程内注册的回调优先，其次是调度器传入的进度管道"""
+    return getattr(_local, "sink", None) or _open_fd_sink()
+
+
+class ProgressReporter:
+    """
+    任务进度上报器
+
+    没有调度器接收时（例如直接运行任务脚本）只做计数，不产生任何输出。
+    """
+
+    def __init__(self, task_id: str, total_records: int = 0, total_bytes: int = 0,
+                 min_interval: float = 0.5):
+        self.task_id = task_id
+        self.total_records = total_records
+        self.total_bytes = total_bytes
+        self.min_interval = min_interval
+        self.records_done = 0
+        self.bytes_done = 0
+        self.current_file: Optional[str] = None
+        self.start_time = time.monotonic()
+        self._last_emit = 0.0
+        self._sink = _resolve_sink()
+        self._emit("start")
+
+    def advance(self, records: int = 0, nbytes: int = 0, current_file: Optional[str] = None) -> None:
+        """
+        累加已处理的记录数与字节数，按最小间隔节流发送进度事件
+
+        Args:
+            records: 新处理的记录数
+            nbytes: 新处理的字节数
+            current_file: 当前处理的文件
+        """
+        self.records_done += records
+        self.bytes_done += nbytes
+        if current_file is not None:
+            self.current_file = current_file
+
+        if self._sink is None:
+            return
+
+        now = time.monotonic()
+        if now - self._last_emit >= self.min_interval:
+            self._emit("progress", now)
+
+    def finish(self) -> None:
+        """发送结束事件"""
+        self._emit("finish")
+
+    def _emit(self, event_type: str, now: Optional[float] = None) -> None:
+        if self._sink is None:
+            return
+
+        now = now or time.monotonic()
+        self._last_emit = now
+        elapsed = now - self.start_time
+
+        self._sink({
+            "event": event_type,
+            "task_id": self.task_id,
+            "records_done": self.records_done,
+            "records_total": self.total_records,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.total_bytes,
+            "current_file": os.path.basename(self.current_file) if self.current_file else None,
+            "elapsed": round(elapsed, 3),
+            "records_per_second": round(self.records_done / elapsed, 1) if elapsed > 0 else 0.0,
+            "bytes_per_second": round(self.bytes_done / elapsed, 1) if elapsed > 0 else 0.0
+        })
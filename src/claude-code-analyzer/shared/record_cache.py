@@ -0,0 +1,358 @@
+"""
+解析结果旁路缓存
+把每个会话文件解析后的记录以 pickle（协议 5）保存在输出目录旁，按 (路径, 大小, 修改时间) 区分版本；
+再次读取未变化的文件时直接反序列化，省去逐行JSON解码。缓存总大小超过磁盘预算时按最近使用时间淘汰
+
+调度器通过以下环境变量启用缓存，子进程与进程内模式的任务读取会话文件时自动使用:
+    CLAUDE_ANALYZER_RECORD_CACHE=<输出目录>/.record_cache
+    CLAUDE_ANALYZER_RECORD_CACHE_MB=1024
+"""
+
+import os
+import gc
+import json
+import pickle
+import hashlib
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from .jsonl import read_jsonl_file
+from .record_filter import RecordFilter
+from .prefetch import take_prefetched
+from .compressed import open_text
+
+
+RECORD_CACHE_ENV = "CLAUDE_ANALYZER_RECORD_CACHE"
+RECORD_CACHE_BUDGET_ENV = "CLAUDE_ANALYZER_RECORD_CACHE_MB"
+
+# 缓存目录相对于任务输出根目录的位置
+RECORD_CACHE_DIRNAME = ".record_cache"
+
+# 默认磁盘预算
+DEFAULT_RECORD_CACHE_MB = 1024
+
+_ENTRY_SUFFIX = ".pkl"
+
+# 超出预算时淘汰到预算的该比例以下，留出余量，避免此后每次写入都重新扫描缓存目录
+_EVICT_LOW_WATER = 0.9
+
+
+@dataclass
+class CachedRecords:
+    """一个会话文件的解析结果"""
+    path: str
+    size: int
+    mtime_ns: int
+    records: List[Any]  # 按行顺序的记录（不含空行与无法解析的行）
+    skipped: int = 0  # 无法解析而跳过的行数
+
+
+class RecordCache:
+    """
+    会话文件解析结果的磁盘缓存
+
+    每个文件版本一个条目，文件名为 <绝对路径的哈希>-<(大小, 修改时间) 的哈希>；写入新版本时删除同一文件的旧条目。
+    命中时更新条目的修改时间，淘汰时删除最久未使用的条目。
+    总大小在第一次写入时扫描一次缓存目录得到，此后在内存中累计，超出预算时才重新扫描并淘汰到预算的 90% 以下。
+    多个进程可以共用同一个缓存目录：条目先写临时文件再原子替换，读取时条目已被删除视为未命中；
+    其他进程写入的条目在下次扫描时计入总大小。
+    """
+
+    def __init__(self, cache_dir: Path, budget_bytes: int = DEFAULT_RECORD_CACHE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.budget_bytes = budget_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, int]]] = None  # 路径哈希 -> {条目文件名: 大小}，首次写入时扫描
+        self._total_bytes = 0
+
+    @staticmethod
+    def _path_key(path: str) -> str:
+        return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, path: str, size: int, mtime_ns: int) -> Path:
+        version = hashlib.sha1(f"{size}\0{mtime_ns}".encode('ascii')).hexdigest()[:16]
+        return self.cache_dir / f"{self._path_key(path)}-{version}{_ENTRY_SUFFIX}"
+
+    def current_entry(self, path: str) -> Optional[Path]:
+        """文件当前版本的条目路径，没有条目时为 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry_path = self._entry_path(path, stat.st_size, stat.st_mtime_ns)
+        return entry_path if entry_path.exists() else None
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[CachedRecords]:
+        """返回与文件当前版本对应的解析结果，未命中时为 None"""
+        entry_path = self._entry_path(path, stat.st_size, stat.st_mtime_ns)
+        try:
+            data = take_prefetched(str(entry_path))
+            if data is None:
+                with open(entry_path, 'rb') as f:
+                    data = f.read()
+            entry = _unpickle(data)
+            os.utime(entry_path)  # 最近使用
+        except Exception:  # 条目不存在、已被淘汰或损坏
+            self.misses += 1
+            return None
+
+        if (entry.path, entry.size, entry.mtime_ns) != (os.path.abspath(path), stat.st_size, stat.st_mtime_ns):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def put(self, path: str, stat: os.stat_result, records: List[Any], skipped: int = 0) -> None:
+        """保存文件当前版本的解析结果并删除该文件的旧条目，总大小超出预算时淘汰最久未使用的条目"""
+        entry = CachedRecords(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, records, skipped)
+        entry_path = self._entry_path(path, stat.st_size, stat.st_mtime_ns)
+        temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=5)
+                entry_bytes = f.tell()
+            os.replace(temp_path, entry_path)
+        except Exception:
+            temp_path.unlink(missing_ok=True)  # 缓存写不进去不影响读取本身
+            return
+
+        with self._lock:
+            if self._entries is None:
+                self._scan()  # 已包含刚写入的条目
+            else:
+                versions = self._entries.setdefault(self._path_key(path), {})
+                self._total_bytes += entry_bytes - versions.get(entry_path.name, 0)
+                versions[entry_path.name] = entry_bytes
+            self._drop_stale_versions(self._path_key(path), entry_path.name)
+            over_budget = self._total_bytes > self.budget_bytes
+
+        if over_budget:
+            self.evict()
+
+    def _drop_stale_versions(self, path_key: str, current: str) -> None:
+        """删除同一文件其他版本的条目（调用方持有锁）"""
+        versions = self._entries.get(path_key, {})
+        for name in [name for name in versions if name != current]:
+            try:
+                os.unlink(self.cache_dir / name)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= versions.pop(name)
+
+    def _scan(self) -> List[Tuple[int, int, str]]:
+        """扫描缓存目录，重建各文件的条目与总大小（调用方持有锁），返回 [(修改时间, 大小, 条目文件名)]"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if not item.name.endswith(_ENTRY_SUFFIX):
+                        continue
+                    if "-" not in item.name:  # 旧命名方式的条目不会再命中
+                        try:
+                            os.unlink(item.path)
+                        except FileNotFoundError:
+                            pass
+                        continue
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, item.name))
+        except FileNotFoundError:
+            pass
+
+        self._entries = {}
+        for _, size, name in entries:
+            self._entries.setdefault(name.split("-", 1)[0], {})[name] = size
+        self._total_bytes = sum(size for _, size, _ in entries)
+        return entries
+
+    def evict(self) -> int:
+        """
+        重新扫描缓存目录，总大小超过预算时淘汰最久未使用的条目，直到不超过预算的 90%
+
+        Returns:
+            淘汰的条目数
+        """
+        with self._lock:
+            entries = self._scan()
+            if self._total_bytes <= self.budget_bytes:
+                return 0
+
+            target = self.budget_bytes * _EVICT_LOW_WATER
+            evicted = 0
+            for _, size, name in sorted(entries):
+                if self._total_bytes <= target:
+                    break
+                try:
+                    os.unlink(self.cache_dir / name)
+                except FileNotFoundError:
+                    pass
+                self._entries.get(name.split("-", 1)[0], {}).pop(name, None)
+                self._total_bytes -= size
+                evicted += 1
+
+        self.evictions += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计与当前占用"""
+        entries = list(self.cache_dir.glob(f"*{_ENTRY_SUFFIX}")) if self.cache_dir.exists() else []
+        return {
+            "dir": str(self.cache_dir),
+            "entries": len(entries),
+            "bytes": sum(p.stat().st_size for p in entries if p.exists()),
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+_default_cache: Optional[RecordCache] = None
+_default_lock = threading.Lock()
+
+
+def default_record_cache() -> Optional[RecordCache]:
+    """环境变量指定的缓存（同一进程内共用一个实例），未启用时返回 None"""
+    global _default_cache
+
+    cache_dir = os.environ.get(RECORD_CACHE_ENV)
+    if not cache_dir:
+        return None
+
+    budget_bytes = int(float(os.environ.get(RECORD_CACHE_BUDGET_ENV, DEFAULT_RECORD_CACHE_MB)) * 1024 * 1024)
+    with _default_lock:
+        if (_default_cache is None or _default_cache.cache_dir != Path(cache_dir)
+                or _default_cache.budget_bytes != budget_bytes):
+            _default_cache = RecordCache(Path(cache_dir), budget_bytes)
+        return _default_cache
+
+
+def read_jsonl_records(path: str, cache: Optional[RecordCache] = None, strict: bool = False,
+                       record_filter: Optional[RecordFilter] = None,
+                       string_prefix: Optional[int] = None) -> Tuple[List[Any], Optional[Exception]]:
+    """
+    读取 jsonl 文件中的全部记录，优先使用解析结果缓存
+
+    空行与无法解析的行跳过；读取出错（例如编码错误）时返回出错前已解析的记录和异常，这种不完整的结果不写入缓存。
+
+    Args:
+        path: 文件路径
+        cache: 解析结果缓存，默认见 default_record_cache()
+        strict: 存在无法解析的行时视为出错
+        record_filter: 只返回满足条件的记录；缓存命中时过滤缓存的记录，否则预筛选后只解码候选行（结果不写入缓存）
+        string_prefix: 只关心结构时给出：缓存未命中时按结构读取，超长字符串值只保留前 string_prefix 个字符
+            （结果不写入缓存）；缓存命中时仍返回完整记录
+
+    Returns:
+        (记录列表, 异常)，正常读取时异常为 None
+    """
+    cache = cache or default_record_cache()
+    stat = None
+    if cache:
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            return [], e
+        entry = cache.get(path, stat)
+        if entry is not None:
+            if strict and entry.skipped:
+                return [], ValueError(f"{entry.skipped} 行不是有效的JSON")
+            if record_filter is not None:
+                return [record for record in entry.records if record_filter.matches(record)], None
+            return entry.records, None
+
+    if record_filter is not None:
+        return _read_filtered(path, record_filter, strict)
+
+    records = []
+    try:
+        skipped, decode_error = read_jsonl_file(path, records, string_prefix=string_prefix)
+    except UnicodeDecodeError:
+        # 含无效的 UTF-8：按文本方式重新读取，保留与逐行文本读取相同的出错前记录
+        records, skipped, decode_error, error = _read_jsonl_text(path)
+        if error is not None:
+            return records, error
+    except Exception as e:
+        return records, e
+
+    # 读取期间文件被修改时不缓存，避免把新内容存到旧版本名下
+    if cache and string_prefix is None and _unchanged(path, stat):
+        cache.put(path, stat, records, skipped)
+
+    if strict and decode_error is not None:
+        return [], decode_error
+    return records, None
+
+
+def _read_filtered(path: str, record_filter: RecordFilter,
+                   strict: bool) -> Tuple[List[Any], Optional[Exception]]:
+    """带过滤条件读取，候选行含无效的 UTF-8 时按文本方式读取全部记录后再过滤"""
+    records = []
+    try:
+        _, decode_error = read_jsonl_file(path, records, record_filter=record_filter)
+    except UnicodeDecodeError:
+        all_records, _, decode_error, error = _read_jsonl_text(path)
+        records = [record for record in all_records if record_filter.matches(record)]
+        if error is not None:
+            return records, error
+    except Exception as e:
+        return records, e
+
+    if strict and decode_error is not None:
+        return [], decode_error
+    return records, None
+
+
+def _read_jsonl_text(path: str) -> Tuple[List[Any], int, Optional[Exception], Optional[Exception]]:
+    """以文本方式逐行读取，返回 (记录列表, 跳过的行数, 第一个解析错误, 读取异常)"""
+    records = []
+    skipped = 0
+    decode_error = None
+    try:
+        with open_text(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    skipped += 1
+                    decode_error = decode_error or e
+    except Exception as e:
+        return records, skipped, decode_error, e
+    return records, skipped, decode_error, None
+
+
+def _unpickle(data: bytes) -> Any:
+    """
+    反序列化缓存条目
+
+    一次读入后整体反序列化（pickle.load 逐段读取文件要慢得多）；期间暂停循环垃圾回收：
+    JSON 记录不含循环引用，而反序列化大量容器对象会反复触发回收，耗时接近翻倍。
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _unchanged(path: str, stat: os.stat_result) -> bool:
+    try:
+        current = os.stat(path)
+    except OSError:
+        return False
+    return (current.st_size, current.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,192 @@
+"""
+记录过滤条件下推
+只关心部分记录的查询（某种 type、带 usage 的消息、某个 sessionId……）先在原始字节行上做子串或正则预筛选，
+只有可能匹配的行才交给JSON解码，解码后再用谓词精确复核，结果与完整解析后过滤相同
+
+预筛选只会多放行、不会漏掉：字段名与值按JSON编码后查找，而同一字符串在JSON中只有一种写法，
+除非使用 \\uXXXX 转义（或把 / 写成 \\/）——含这类转义的行一律放行，交给复核。
+
+用法:
+    record_filter = field_equals("type", "assistant") & has_field("message.usage")
+    read_jsonl_file(path, records, record_filter=record_filter)
+"""
+
+import re
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Pattern, Tuple
+
+from .utils import safe_get
+
+
+# JSON 中空白字符只有这四种
+_WS = rb'[ \t\r\n]*'
+
+# 可以让同一字符串出现另一种写法的转义
+_UNICODE_ESCAPE = b'\\u'
+_SLASH_ESCAPE = b'\\/'
+
+_MISSING = object()
+
+
+@dataclass
+class RecordFilter:
+    """
+    一个过滤条件：原始行上的预筛选 + 解码后的精确复核
+
+    行内包含全部 needles 且匹配全部 patterns 时才可能满足 predicate；
+    needles 和 patterns 都为空时每行都需要解码。
+    """
+    predicate: Callable[[Any], bool]  # 解码后的记录是否满足条件
+    needles: Tuple[bytes, ...] = ()  # 必须出现在行内的字节串
+    patterns: Tuple[Pattern[bytes], ...] = ()  # 必须在行内匹配的编译好的字节正则
+    description: str = ""
+    escapes: Tuple[bytes, ...] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        escapes = [_UNICODE_ESCAPE]
+        if any(b'/' in n for n in self.needles) or any(b'/' in p.pattern for p in self.patterns):
+            escapes.append(_SLASH_ESCAPE)
+        self.escapes = tuple(escapes)
+
+    def __and__(self, other: "RecordFilter") -> "RecordFilter":
+        left, right = self.predicate, other.predicate
+        return RecordFilter(lambda record: left(record) and right(record),
+                            self.needles + other.needles, self.patterns + other.patterns,
+                            f"{self.description} & {other.description}")
+
+    @property
+    def prefiltered(self) -> bool:
+        """是否能在解码前排除行"""
+        return bool(self.needles or self.patterns)
+
+    def anchors(self) -> Tuple[Callable[[Any, int, int], int], ...]:
+        """
+        每行候选都至少命中其一的查找函数 find(buffer, start, end) -> 位置（没有时为 -1）
+
+        第一个 needle（没有时为第一个 pattern）以及各种转义，按行读取时据此整段跳过不可能匹配的行。
+        """
+        if self.needles:
+            needle = self.needles[0]
+            first = lambda buffer, start, end: buffer.find(needle, start, end)
+        else:
+            pattern = self.patterns[0]
+
+            def first(buffer, start, end):
+                match = pattern.search(buffer, start, end)
+                return match.start() if match else -1
+        escapes = tuple((lambda buffer, start, end, e=e: buffer.find(e, start, end)) for e in self.escapes)
+        return (first,) + escapes
+
+    def may_match(self, buffer, start: int, end: int) -> bool:
+        """
+        buffer[start:end]（一行原始字节）是否可能满足条件
+
+        Args:
+            buffer: bytes、mmap 等支持 find 与正则匹配的对象
+        """
+        if (all(buffer.find(n, start, end) >= 0 for n in self.needles)
+                and all(p.search(buffer, start, end) for p in self.patterns)):
+            return True
+        return any(buffer.find(e, start, end) >= 0 for e in self.escapes)
+
+    def matches(self, record: Any) -> bool:
+        """解码后的精确复核，谓词出错视为不匹配"""
+        try:
+            return bool(self.predicate(record))
+        except Exception:
+            return False
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def _key_pattern(path: str, value_pattern: bytes = b'') -> Tuple[Tuple[bytes, ...], Pattern[bytes]]:
+    """点分隔路径：前面各级字段名作为 needles，最后一级字段名（及其值）作为正则"""
+    keys = path.split('.')
+    needles = tuple(_encode(key) for key in keys[:-1])
+    pattern = re.escape(_encode(keys[-1])) + _WS + b':'
+    if value_pattern:
+        pattern += _WS + value_pattern
+    return needles, re.compile(pattern)
+
+
+def field_equals(path: str, *values: Any) -> RecordFilter:
+    """
+    字段等于给定值之一（多个值时为"属于"）
+
+    Args:
+        path: 点分隔的字段路径，如 "message.role"
+        values: 字符串、布尔值或 None 参与预筛选；其他类型的值只按字段名预筛选。
+            比较要求类型一致（1 不等于 True，也不等于 1.0）
+    """
+    if not values:
+        raise ValueError("field_equals 至少需要一个值")
+
+    literal = all(isinstance(v, (str, bool)) or v is None for v in values)
+    value_pattern = b'(?:' + b'|'.join(re.escape(_encode(v)) for v in values) + b')' if literal else b''
+    needles, pattern = _key_pattern(path, value_pattern)
+
+    def predicate(record: Any) -> bool:
+        found = safe_get(record, path, _MISSING)
+        return any(type(found) is type(v) and found == v for v in values)
+
+    shown = values[0] if len(values) == 1 else list(values)
+    return RecordFilter(predicate, needles, (pattern,), f"{path} == {shown!r}")
+
+
+def has_field(path: str) -> RecordFilter:
+    """记录中存在该字段（值可以是 null）"""
+    needles, pattern = _key_pattern(path)
+    return RecordFilter(lambda record: safe_get(record, path, _MISSING) is not _MISSING,
+                        needles, (pattern,), f"has {path}")
+
+
+def contains_text(text: str) -> RecordFilter:
+    """记录中某个字符串值包含 text（字段名不计）"""
+    if not text:
+        raise ValueError("contains_text 需要非空文本")
+
+    def predicate(record: Any) -> bool:
+        stack = [record]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, str):
+                if text in value:
+                    return True
+            elif isinstance(value, dict):
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+        return False
+
+    return RecordFilter(predicate, (_encode(text)[1:-1],), (), f"contains {text!r}")
+
+
+def build_record_filter(where: Optional[dict] = None, has: Tuple[str, ...] = (),
+                        text: Optional[str] = None) -> Optional[RecordFilter]:
+    """
+    由查询参数组合过滤条件（各条件同时满足）
+
+    Args:
+        where: {字段路径: 值或值列表}
+        has: 必须存在的字段路径
+        text: 字符串值中包含的文本
+
+    Returns:
+        组合后的过滤条件，没有任何条件时为 None
+    """
+    filters = []
+    for path, value in (where or {}).items():
+        filters.append(field_equals(path, *value) if isinstance(value, list) else field_equals(path, value))
+    filters.extend(has_field(path) for path in has)
+    if text:
+        filters.append(contains_text(text))
+
+    if not filters:
+        return None
+    combined = filters[0]
+    for record_filter in filters[1:]:
+        combined = combined & record_filter
+    return combined
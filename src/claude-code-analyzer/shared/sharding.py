@@ -0,0 +1,148 @@
+"""
+分片执行
+按 Session ID 的哈希把 T06 扫描清单分成 N 片，各分片可以在不同进程、或共享文件系统的不同机器上
+独立执行，为分片内的每个文件保存可合并的部分聚合；合并时按扫描清单中的文件顺序依次折叠，
+得到与单机执行完全相同的输出
+
+调度器 --shard / --merge-shards 设置以下环境变量，任务据此选择执行方式:
+    CLAUDE_ANALYZER_SHARD=3/8         只处理第 3 片（从 0 开始）并保存部分聚合
+    CLAUDE_ANALYZER_MERGE_SHARDS=8    合并 8 个分片的部分聚合，生成最终输出
+"""
+
+import os
+import json
+import pickle
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Optional, Callable
+
+from .models import SessionFile, ScanResult
+from .manifest import shard_scan_result
+from .utils import MissingDependencyError
+
+
+SHARD_ENV = "CLAUDE_ANALYZER_SHARD"
+MERGE_ENV = "CLAUDE_ANALYZER_MERGE_SHARDS"
+
+# 部分聚合保存在任务输出目录下的该子目录
+SHARD_DIRNAME = "shards"
+
+# 支持分片执行的任务
+SHARDABLE_TASKS = ("T01", "T02", "T04", "T05")
+
+
+def parse_shard_spec(spec: str) -> Tuple[int, int]:
+    """
+    解析分片说明 "序号/总数"
+
+    Raises:
+        ValueError: 格式错误或序号超出范围
+    """
+    try:
+        shard, shard_count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"分片格式应为 序号/总数 (例如 0/8): {spec}") from None
+    if shard_count < 1 or not 0 <= shard < shard_count:
+        raise ValueError(f"分片序号应在 0 ~ {shard_count - 1} 之间: {spec}")
+    return shard, shard_count
+
+
+def requested_shard() -> Optional[Tuple[int, int]]:
+    """本次执行是否只处理一个分片，返回 (序号, 总数)"""
+    spec = os.environ.get(SHARD_ENV)
+    return parse_shard_spec(spec) if spec else None
+
+
+def requested_merge() -> Optional[int]:
+    """本次执行是否合并分片结果，返回分片总数"""
+    count = os.environ.get(MERGE_ENV)
+    return int(count) if count else None
+
+
+def manifest_digest(scan_result: ScanResult) -> str:
+    """扫描清单的摘要，合并时据此确认各分片基于同一份清单"""
+    files = [(f.path, f.size, f.session_id, f.file_type) for f in scan_result.files]
+    return hashlib.sha256(json.dumps(files, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def shard_partial_file(output_dir: Path, shard: int, shard_count: int) -> Path:
+    """分片部分聚合文件的位置"""
+    return Path(output_dir) / SHARD_DIRNAME / f"shard-{shard:03d}-of-{shard_count:03d}.pkl"
+
+
+def run_shard(output_dir: Path, task_id: str, scan_result: ScanResult,
+              build_segments: Callable[[ScanResult], Dict[str, Any]]) -> Path:
+    """
+    处理当前分片并保存部分聚合
+
+    Args:
+        output_dir: 任务输出目录
+        task_id: 任务ID
+        scan_result: 完整扫描结果
+        build_segments: 由分片扫描结果生成 文件路径 -> 部分聚合（与任务无关的文件为 None）
+
+    Returns:
+        部分聚合文件路径
+    """
+    shard, shard_count = requested_shard()
+    shard_result = shard_scan_result(scan_result, shard, shard_count)
+    print(f"🧩 分片 {shard}/{shard_count}: {shard_result.total_files} 个文件 (共 {scan_result.total_files} 个)")
+
+    partial = {
+        "task_id": task_id,
+        "shard": shard,
+        "shard_count": shard_count,
+        "manifest": manifest_digest(scan_result),
+        "created": datetime.now().isoformat(),
+        "segments": build_segments(shard_result)
+    }
+
+    partial_file = shard_partial_file(output_dir, shard, shard_count)
+    partial_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = partial_file.with_suffix(".tmp")
+    with open(temp_file, 'wb') as f:
+        pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, partial_file)
+
+    print(f"💾 部分聚合已保存: {partial_file}")
+    return partial_file
+
+
+def load_shard_segments(output_dir: Path, task_id: str, scan_result: ScanResult) -> List[Tuple[SessionFile, Any]]:
+    """
+    读取全部分片的部分聚合，按扫描清单中的文件顺序返回
+
+    Args:
+        output_dir: 任务输出目录
+        task_id: 任务ID
+        scan_result: 完整扫描结果（必须与各分片执行时相同）
+
+    Returns:
+        [(文件, 部分聚合)]，与任务无关的文件部分聚合为 None
+
+    Raises:
+        MissingDependencyError: 缺少某个分片的结果
+        ValueError: 分片结果属于其他任务或基于不同的扫描清单
+    """
+    shard_count = requested_merge()
+    digest = manifest_digest(scan_result)
+    segments: Dict[str, Any] = {}
+
+    for shard in range(shard_count):
+        partial_file = shard_partial_file(output_dir, shard, shard_count)
+        if not partial_file.exists():
+            raise MissingDependencyError(2, f"缺少分片 {shard}/{shard_count} 的结果", str(partial_file))
+
+        with open(partial_file, 'rb') as f:
+            partial = pickle.load(f)
+        if partial.get("task_id") != task_id or partial.get("manifest") != digest:
+            raise ValueError(f"分片结果与当前扫描清单不一致，请重新执行该分片: {partial_file}")
+        segments.update(partial["segments"])
+
+    missing = [f.path for f in scan_result.files if f.path not in segments]
+    if missing:
+        raise ValueError(f"分片结果缺少 {len(missing)} 个文件，例如 {missing[0]}")
+
+    print(f"🧩 合并 {shard_count} 个分片的部分聚合 ({len(segments)} 个文件)")
+    return [(f, segments[f.path]) for f in scan_result.files]
@@ -0,0 +1,32 @@
+"""
+结构读取
+只关心记录结构与基础类型的分析（T02 结构签名、T03 类型集合）不需要超长字符串值的内容。
+超长行（例如携带整个文件内容或命令输出的 tool_result）解码后立即化简为骨架：字符串值只保留前若干个字符，
+整行的完整解码结果随即释放，不随记录列表保留到整个文件读完。
+
+骨架与完整解码的结果结构相同、基础类型相同，只是长字符串值被截短（保留的字符数比截断显示的长度多一个时，
+截断显示的结果不变）；字段名始终完整保留。解码方式与完整读取相同，出错与跳过的行为也相同。
+"""
+
+from typing import Any
+
+
+# 长度不小于该值的行才化简为骨架，较短的行不值得再遍历一遍
+GIANT_LINE_BYTES = 64 * 1024
+
+
+def skeleton(value: Any, keep_chars: int) -> Any:
+    """
+    返回 value 的骨架：超过 keep_chars 个字符的字符串值只保留前 keep_chars 个字符，其余原样复制
+
+    Args:
+        value: 解码后的 JSON 值
+        keep_chars: 字符串值保留的字符数
+    """
+    if type(value) is str:
+        return value[:keep_chars] if len(value) > keep_chars else value
+    if type(value) is dict:
+        return {key: skeleton(item, keep_chars) for key, item in value.items()}
+    if type(value) is list:
+        return [skeleton(item, keep_chars) for item in value]
+    return value
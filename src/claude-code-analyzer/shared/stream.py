@@ -0,0 +1,167 @@
+"""
+任务间流式数据
+上游任务每处理完一个文件就向只追加的 NDJSON 流发布该文件的部分结果，
+下游任务可以在上游仍在运行时边读边处理
+
+流格式（每行一个JSON）:
+    {"event": "start", "producer": "T02", "pid": 123}
+    {"event": "item", ...}          # 每个文件一条
+    {"event": "end"} / {"event": "abort", "reason": "..."}
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional
+
+
+# T02 发布的每个Session的类型集合
+SESSION_TYPES_STREAM = "session_types.ndjson"
+SESSION_TYPES_STREAM_RELPATH = Path("T02_structure_types") / SESSION_TYPES_STREAM
+
+# 读取方轮询间隔、等待流头出现的时间、以及无新数据时最长等待时间（秒）
+STREAM_POLL_INTERVAL = 0.1
+STREAM_START_TIMEOUT = 30.0
+STREAM_IDLE_TIMEOUT = 600.0
+
+
+def type_digest(signature: str) -> str:
+    """结构签名的摘要，流中以摘要代替可能很长的完整签名"""
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+
+class StreamWriter:
+    """
+    流的写入端
+
+    调度器会在启动上游任务前创建空的流文件（下游可能已在等待），此时追加写入；
+    其余情况（例如单独运行任务脚本）覆盖旧的流。
+    """
+
+    def __init__(self, stream_file: Path, producer: str):
+        self.stream_file = Path(stream_file)
+        self.stream_file.parent.mkdir(parents=True, exist_ok=True)
+
+        prepared = self.stream_file.exists() and self.stream_file.stat().st_size == 0
+        self._stream = open(self.stream_file, 'a' if prepared else 'w', encoding='utf-8')
+        self._write({"event": "start", "producer": producer, "pid": os.getpid()})
+
+    def publish(self, item: Dict[str, Any]) -> None:
+        """发布一条部分结果并立即刷新，使下游可见"""
+        self._write({"event": "item", **item})
+
+    def close(self) -> None:
+        """写入结束标记"""
+        if not self._stream.closed:
+            self._write({"event": "end"})
+            self._stream.close()
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        self._stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._stream.flush()
+
+
+def prepare_stream(stream_file: Path) -> None:
+    """创建（或清空）流文件，表示上游即将开始发布"""
+    stream_file = Path(stream_file)
+    stream_file.parent.mkdir(parents=True, exist_ok=True)
+    stream_file.write_text("", encoding='utf-8')
+
+
+def abort_stream(stream_file: Path, reason: str) -> None:
+    """上游失败时追加中止标记，让等待中的下游立即停止等待"""
+    stream_file = Path(stream_file)
+    if stream_file.exists() and stream_is_complete(stream_file):
+        return
+    with open(stream_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"event": "abort", "reason": reason}, ensure_ascii=False) + "\n")
+
+
+def stream_is_complete(stream_file: Path) -> bool:
+    """流是否已写入结束标记"""
+    try:
+        with open(stream_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 256, 0))
+            last_line = f.read().strip().rsplit(b"\n", 1)[-1]
+        return json.loads(last_line).get("event") == "end"
+    except (OSError, ValueError):
+        return False
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # 无权限等情况视为仍在运行
+    return True
+
+
+def follow_stream(stream_file: Path, start_timeout: float = STREAM_START_TIMEOUT,
+                  idle_timeout: float = STREAM_IDLE_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """
+    跟随读取流，逐条产出 item 事件
+
+    遇到结束/中止标记、写入进程已退出、或超过等待时间时停止；
+    调用方需自行处理流不完整（缺少部分 item）的情况。
+
+    Args:
+        stream_file: 流文件
+        start_timeout: 等待流头（start 事件）出现的最长时间
+        idle_timeout: 没有新数据时的最长等待时间
+    """
+    stream_file = Path(stream_file)
+    if not stream_file.exists():
+        return
+
+    producer_pid = None
+    started = False
+    producer_gone = False
+    last_data = time.monotonic()
+
+    with open(stream_file, 'r', encoding='utf-8') as f:
+        buffer = ""
+        while True:
+            chunk = f.readline()
+            if chunk:
+                buffer += chunk
+                if not buffer.endswith("\n"):
+                    continue  # 写入方尚未写完这一行
+                line, buffer = buffer.strip(), ""
+                last_data = time.monotonic()
+                if not line:
+                    continue
+
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+                kind = event.get("event")
+                if kind == "start":
+                    started = True
+                    producer_pid = event.get("pid")
+                elif kind == "item":
+                    yield event
+                elif kind in ("end", "abort"):
+                    return
+                continue
+
+            # 暂无新数据
+            waited = time.monotonic() - last_data
+            if not started and waited > start_timeout:
+                return
+            if started and waited > idle_timeout:
+                return
+            if started and not _pid_alive(producer_pid):
+                if producer_gone:
+                    return
+                producer_gone = True  # 再读一轮，取走进程退出前写入的数据
+                continue
+            time.sleep(STREAM_POLL_INTERVAL)
@@ -12,6 +12,10 @@ from pathlib import Path
 from datetime import datetime
 
 
+class MissingDependencyError(FileNotFoundError):
+    """上游任务的输出不存在（需要先执行依赖任务）"""
+
+
 def normalize_array_indices(path: str) -> str:
     """
     规范化数组索引: [0], [1], [2] → [*]
@@ -314,4 +318,57 @@ def setup_logging(name: str, level: int = logging.INFO) -> logging.Logger:
     # 添加处理器到日志记录器
     logger.addHandler(console_handler)
     
-    return logger
\ No newline at end of file
+    return logger
+
+
+def save_json_outputs(outputs: Dict[str, Any], output_dir: Path) -> List[Path]:
+    """
+    将任务输出逐个保存为JSON文件
+    
+    Args:
+        outputs: 文件名 -> 输出数据
+        output_dir: 输出目录
+        
+    Returns:
+        已保存的文件路径列表
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    saved = []
+    for filename, data in outputs.items():
+        output_file = output_dir / filename
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        saved.append(output_file)
+    
+    return saved
+
+
+def resolve_upstream_output(output_dir: Path, context: Optional[Dict[str, Any]],
+                            task_id: str, upstream_dir: str, filename: str) -> Any:
+    """
+    获取上游任务的输出：优先使用进程内上下文中的对象，否则读取上游输出文件
+    
+    Args:
+        output_dir: 当前任务的输出目录
+        context: 调度器在进程内模式下共享的任务上下文
+        task_id: 上游任务ID，如 "T01"
+        upstream_dir: 上游任务的输出目录名
+        filename: 上游输出文件名
+        
+    Returns:
+        上游输出数据
+        
+    Raises:
+        MissingDependencyError: 上下文和磁盘上都没有该输出
+    """
+    if context and filename in context.get(task_id, {}):
+        return context[task_id][filename]
+    
+    upstream_file = Path(output_dir).parent / upstream_dir / filename
+    if not upstream_file.exists():
+        raise MissingDependencyError(2, "依赖文件不存在", str(upstream_file))
+    
+    with open(upstream_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
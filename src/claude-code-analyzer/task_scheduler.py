@@ -8,13 +8,43 @@ import sys
 import os
 import json
 import time
+import hashlib
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
 import argparse
+import importlib
 import subprocess
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import resource
+except ImportError:  # 非 POSIX 平台不采集资源使用
+    resource = None
+
+from shared.utils import calculate_file_hash, format_bytes
+from shared.progress import PROGRESS_FD_ENV, ProgressReporter, progress_sink
+from shared.history import (TaskHistory, HISTORY_FILENAME, HISTORY_WINDOW, DEFAULT_REGRESSION_THRESHOLD,
+                            MIN_BASELINE_RUNS, MIN_COMPARE_DURATION)
+from shared.manifest import SCAN_RESULT_RELPATH, load_scan_result, resolve_scan_result
+from shared.corpus import CorpusReader, CORPUS_PASS_KEY
+from shared.checkpoint import CHECKPOINT_FILENAME, RESUME_ENV
+from shared.record_cache import (RECORD_CACHE_ENV, RECORD_CACHE_BUDGET_ENV, RECORD_CACHE_DIRNAME,
+                                 DEFAULT_RECORD_CACHE_MB)
+from shared.profiling import TaskProfiler, PROFILE_ARTIFACTS, DEFAULT_TOP_N
+from shared.daemon import default_socket_path, send_request, DaemonUnavailableError
+from shared.incremental import INCREMENTAL_ENV
+from shared.prefetch import PREFETCH_BUDGET_ENV, DEFAULT_PREFETCH_MB
+from shared.parallel import WORKERS_ENV, RANGE_MB_ENV, DEFAULT_RANGE_MB
+from shared.json_backend import JSON_BACKEND_ENV, JSON_BACKENDS, get_backend
+from shared.sharding import SHARD_ENV, MERGE_ENV, SHARDABLE_TASKS, parse_shard_spec, shard_partial_file
+from shared.stream import (SESSION_TYPES_STREAM, STREAM_POLL_INTERVAL, prepare_stream, abort_stream,
+                           stream_is_complete)
 
 
 class TaskStatus(Enum):
@@ -24,6 +54,23 @@ class TaskStatus(Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     SKIPPED = "skipped"
+    CACHED = "cached"
+
+
+# 可满足下游依赖的任务状态
+SUCCESS_STATUSES = (TaskStatus.COMPLETED, TaskStatus.CACHED)
+
+# 输入指纹文件名，与任务输出保存在同一目录
+FINGERPRINT_FILE = ".fingerprint.json"
+
+# 子进程 stdout/stderr 各自只保留最后若干行，用于失败时的错误信息
+LOG_TAIL_LINES = 200
+
+# 同一任务两次进度输出之间的最小间隔（秒）
+PROGRESS_PRINT_INTERVAL = 2.0
+
+# 没有任何历史数据时假定的任务耗时（秒）
+DEFAULT_TASK_ESTIMATE = 1.0
 
 
 @dataclass
@@ -37,22 +84,117 @@ class TaskResult:
     output_files: List[str] = None
     error_message: Optional[str] = None
     metrics: Dict[str, Any] = None
+    profile_files: List[str] = None
 
     def __post_init__(self):
         if self.output_files is None:
             self.output_files = []
         if self.metrics is None:
             self.metrics = {}
+        if self.profile_files is None:
+            self.profile_files = []
+
+
+def _read_proc_io(io_path: str) -> Dict[str, int]:
+    """读取 /proc/<pid>/io 的 I/O 计数，不可用时（非 Linux）返回空字典"""
+    try:
+        with open(io_path, 'r') as f:
+            return {key.strip(): int(value) for key, value in (line.split(":", 1) for line in f if ":" in line)}
+    except (OSError, ValueError):
+        return {}
+
+
+def _usage_counters(usage, io: Dict[str, int]) -> Dict[str, float]:
+    """将 rusage 与 /proc io 计数整理为可做差的累计指标"""
+    counters = {
+        "cpu_user_seconds": usage.ru_utime,
+        "cpu_system_seconds": usage.ru_stime,
+        "voluntary_context_switches": usage.ru_nvcsw,
+        "involuntary_context_switches": usage.ru_nivcsw
+    }
+    if io:
+        counters.update({
+            "read_bytes": io.get("rchar", 0),          # 经由 read 类系统调用读取的字节
+            "write_bytes": io.get("wchar", 0),
+            "disk_read_bytes": io.get("read_bytes", 0),  # 实际落到块设备的 I/O
+            "disk_write_bytes": io.get("write_bytes", 0)
+        })
+    return counters
+
+
+def _peak_rss_bytes(usage) -> int:
+    """ru_maxrss 在 macOS 上单位为字节，其余平台为 KB"""
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
 
 
 class TaskScheduler:
     """Claude CLI 分析任务调度器"""
     
-    def __init__(self, base_dir: str = None):
+    def __init__(self, base_dir: str = None, jobs: int = 1, use_cache: bool = True,
+                 mode: str = "subprocess", resume: bool = False, profile: bool = False,
+                 profile_memory: bool = False, profile_top: int = DEFAULT_TOP_N, pipeline: bool = False,
+                 shard: Optional[tuple] = None, merge_shards: Optional[int] = None,
+                 single_pass: bool = False, record_cache_mb: float = DEFAULT_RECORD_CACHE_MB,
+                 incremental: bool = False, json_backend: Optional[str] = None,
+                 prefetch_mb: float = DEFAULT_PREFETCH_MB, workers: int = 1,
+                 range_mb: float = DEFAULT_RANGE_MB):
         self.base_dir = Path(base_dir) if base_dir else Path(__file__).parent
+        self.jobs = max(1, jobs)  # 并行执行的最大任务数，1 表示串行
+        self.workers = max(1, workers or os.cpu_count() or 1)  # 任务内部处理语料的工作进程数
+        self.range_mb = range_mb
+        self.use_cache = use_cache  # 输入指纹未变化时跳过任务
+        self.mode = mode  # subprocess: 每个任务独立子进程; inprocess: 当前进程内直接调用分析器
+        self.resume = resume  # 支持检查点的分析器从上次中断处继续
+        self.profile = profile or profile_memory  # 在 cProfile 下执行任务
+        self.profile_memory = profile_memory  # 同时用 tracemalloc 统计内存分配
+        self.profile_top = profile_top
+        if self.profile:
+            self.use_cache = False  # 缓存命中的任务不会执行，也就无从剖析
+        self.pipeline = pipeline  # 流式下游任务在上游开始发布后即可启动
+        if pipeline:
+            self.jobs = max(self.jobs, 2)  # 上下游需要同时运行
+        
+        self.shard = shard  # (序号, 总数)：只处理一个分片，保存部分聚合
+        self.merge_shards = merge_shards  # 合并分片结果的分片总数
+        if shard:
+            self.use_cache = False  # 分片只产生部分聚合，不对应任何输入指纹
+        
+        # 增量读取：T01/T02/T04 只读取会话文件新增的完整行（分片/合并时各任务另有数据来源）
+        self.incremental = incremental and not (shard or merge_shards)
+        
+        # 读取语料的任务共享一次读取（访问者需要在同一进程内，分片/合并或增量读取时各任务另有数据来源）
+        self.single_pass = single_pass and not (shard or merge_shards or self.incremental)
+        if self.single_pass:
+            self.mode = "inprocess"
+        
+        # 子进程继承环境变量，进程内模式的任务直接读取
+        if resume:
+            os.environ[RESUME_ENV] = "1"
+        if shard:
+            os.environ[SHARD_ENV] = f"{shard[0]}/{shard[1]}"
+        if merge_shards:
+            os.environ[MERGE_ENV] = str(merge_shards)
+        if self.incremental:
+            os.environ[INCREMENTAL_ENV] = "1"
+        else:
+            os.environ.pop(INCREMENTAL_ENV, None)
+        if json_backend:
+            os.environ[JSON_BACKEND_ENV] = json_backend
+        os.environ[PREFETCH_BUDGET_ENV] = str(prefetch_mb)  # 0 表示不预读
+        # 各任务内部处理语料的工作进程数（分片/合并、增量读取与单次遍历时各任务另有数据来源）
+        os.environ[WORKERS_ENV] = str(self.workers)
+        os.environ[RANGE_MB_ENV] = str(range_mb)  # 0 表示大文件不分段
         self.tasks_dir = self.base_dir / "tasks"
         self.outputs_dir = self.base_dir / "outputs"
         self.shared_dir = self.base_dir / "shared"
+        self.claude_dir = Path(os.path.expanduser("~/.claude"))  # T06 扫描的数据源
+        
+        # 会话文件解析结果缓存（磁盘预算为 0 时不使用）
+        if record_cache_mb > 0:
+            os.environ[RECORD_CACHE_ENV] = str(self.outputs_dir / RECORD_CACHE_DIRNAME)
+            os.environ[RECORD_CACHE_BUDGET_ENV] = str(record_cache_mb)
+        else:
+            os.environ.pop(RECORD_CACHE_ENV, None)
         
         # 确保目录存在
         self.outputs_dir.mkdir(exist_ok=True)
@@ -61,6 +203,28 @@ class TaskScheduler:
         self.tasks = self._define_tasks()
         self.task_results: Dict[str, TaskResult] = {}
         
+        # 进程内模式下任务间共享的结果对象 (task_id -> execute() 的返回值)
+        self.context: Dict[str, Any] = {}
+        
+        # 单次遍历模式：本次执行计划中的任务，以及共享读取是否已完成
+        self._planned_tasks: List[str] = []
+        self._corpus_pass_done = False
+        self._corpus_lock = threading.Lock()
+        
+        # 每个任务上次输出进度的时间，用于节流
+        self._last_progress_print: Dict[str, float] = {}
+        
+        # 任务的输出流已准备好（或任务已结束），流式下游可以开始读取
+        self._streams_ready: Dict[str, threading.Event] = {task_id: threading.Event() for task_id in self.tasks}
+        # 上游仍在运行时启动的流式下游，其输入指纹需等上游结束后再保存 (task_id -> (output_dir, task_script))
+        self._deferred_fingerprints: Dict[str, tuple] = {}
+        
+        # 历次执行的任务耗时与资源使用
+        self.history = TaskHistory(self.outputs_dir / HISTORY_FILENAME)
+        
+        # 分片/合并时各机器共用同一份扫描清单，T06 视为外部输入，不在本次执行
+        self.external_tasks = {"T06"} if (shard or merge_shards) else set()
+        
     def _define_tasks(self) -> Dict[str, Dict[str, Any]]:
         """定义所有分析任务"""
         return {
@@ -71,7 +235,8 @@ class TaskScheduler:
                 "script": "field_extractor.py",
                 "dependencies": ["T06"],  # 依赖数据源扫描
                 "output_dir": "T01_field_extraction",
-                "expected_outputs": ["deduplicated_fields.json", "field_examples.json"],
+                "expected_outputs": ["deduplicated_fields.json", "field_analysis_detailed.json"],
+                "corpus_visitor": True,  # 单次遍历模式下由共享的语料读取驱动
                 "timeout": 300  # 5分钟
             },
             
@@ -83,6 +248,8 @@ class TaskScheduler:
                 "dependencies": ["T06"],
                 "output_dir": "T02_structure_types",
                 "expected_outputs": ["object_types_detail.json", "object_types_compact.json", "object_types_summary.json"],
+                "streams": [SESSION_TYPES_STREAM],  # 每处理完一个Session发布其类型集合
+                "corpus_visitor": True,
                 "timeout": 600  # 10分钟
             },
             
@@ -92,6 +259,7 @@ class TaskScheduler:
                 "module": "T03_minimal_set_cover", 
                 "script": "set_cover_analyzer.py",
                 "dependencies": ["T02"],  # 依赖类型分析结果
+                "stream_dependencies": ["T02"],  # 流水线模式下读取T02的类型流，无需等待T02结束
                 "output_dir": "T03_set_cover",
                 "expected_outputs": ["coverage_analysis.json", "selected_sessions/"],
                 "timeout": 300
@@ -105,6 +273,7 @@ class TaskScheduler:
                 "dependencies": ["T06"],
                 "output_dir": "T04_inheritance",
                 "expected_outputs": ["session_inheritance_analysis.json"],
+                "corpus_visitor": True,
                 "timeout": 180
             },
             
@@ -192,10 +361,18 @@ class TaskScheduler:
         
         result = TaskResult(task_id, TaskStatus.RUNNING, start_time=datetime.now())
         
+        # 流水线模式下仍在运行的流式上游：不要求已完成，任务从其输出流读取
+        running_streams = [
+            dep_id for dep_id in task_info.get("stream_dependencies", [])
+            if self.pipeline and dep_id not in self.task_results
+        ]
+        
         try:
             # 检查依赖
             for dep_id in task_info.get("dependencies", []):
-                if dep_id not in self.task_results or self.task_results[dep_id].status != TaskStatus.COMPLETED:
+                if dep_id in running_streams or dep_id in self.external_tasks:
+                    continue
+                if dep_id not in self.task_results or self.task_results[dep_id].status not in SUCCESS_STATUSES:
                     result.status = TaskStatus.FAILED
                     result.error_message = f"Dependency {dep_id} not completed"
                     return result
@@ -212,26 +389,52 @@ class TaskScheduler:
                 result.error_message = f"Task script not found: {task_script}"
                 return result
             
-            # 执行任务
-            cmd = [sys.executable, str(task_script), str(output_dir)]
+            # 输入指纹未变化时直接复用上次的输出
+            fingerprint = self._compute_fingerprint(task_id, task_script) if self.use_cache else None
+            if fingerprint and not running_streams and self._is_cache_valid(output_dir, fingerprint):
+                result.status = TaskStatus.CACHED
+                result.end_time = datetime.now()
+                result.duration = 0.0
+                result.output_files = self._verify_outputs(output_dir, task_info.get("expected_outputs", []))
+                print("   ♻️ 输入未变化，跳过执行 (缓存命中)")
+                return result
             
-            print(f"   执行命令: {' '.join(cmd)}")
+            # 旧指纹对应的输出即将被覆盖，先使其失效
+            (output_dir / FINGERPRINT_FILE).unlink(missing_ok=True)
             
-            process = subprocess.run(
-                cmd,
-                cwd=str(self.base_dir),
-                timeout=task_info.get("timeout", 300),
-                capture_output=True,
-                text=True
-            )
+            # 先清空输出流再通知下游，下游不会读到上次执行留下的流
+            for stream_name in self._task_streams(task_id):
+                prepare_stream(output_dir / stream_name)
+            self._streams_ready[task_id].set()
+            
+            # 执行任务
+            if self.mode == "inprocess":
+                error_message = self._execute_inprocess(task_id, task_info, output_dir, result)
+            else:
+                error_message = self._execute_subprocess(task_info, task_script, output_dir, result)
+            
+            if self.profile:
+                result.profile_files = [
+                    str(output_dir / name) for name in PROFILE_ARTIFACTS if (output_dir / name).exists()
+                ]
             
-            if process.returncode == 0:
+            if error_message is None:
                 result.status = TaskStatus.COMPLETED
                 result.end_time = datetime.now()
                 result.duration = (result.end_time - result.start_time).total_seconds()
                 
-                # 验证输出文件
-                result.output_files = self._verify_outputs(output_dir, task_info.get("expected_outputs", []))
+                # 验证输出文件（分片模式下为部分聚合文件）
+                if self.shard:
+                    partial_file = shard_partial_file(output_dir, *self.shard)
+                    result.output_files = [str(partial_file)] if partial_file.exists() else []
+                else:
+                    result.output_files = self._verify_outputs(output_dir, task_info.get("expected_outputs", []))
+                
+                if fingerprint and running_streams:
+                    # 上游输出尚未最终确定，等上游结束后再保存指纹
+                    self._deferred_fingerprints[task_id] = (output_dir, task_script)
+                elif fingerprint:
+                    self._save_fingerprint(output_dir, fingerprint, result.output_files)
                 
                 print(f"   ✅ 任务完成 ({result.duration:.1f}s)")
                 for output_file in result.output_files:
@@ -239,21 +442,430 @@ class TaskScheduler:
                 
             else:
                 result.status = TaskStatus.FAILED
-                result.error_message = f"Process failed with code {process.returncode}\nSTDOUT:\n{process.stdout}\nSTDERR:\n{process.stderr}"
-                print(f"   ❌ 任务失败: {process.stderr}")
+                result.error_message = error_message
         
         except subprocess.TimeoutExpired:
             result.status = TaskStatus.FAILED
             result.error_message = f"Task timeout after {task_info.get('timeout', 300)} seconds"
-            print(f"   ⏱️ 任务超时")
+            print("   ⏱️ 任务超时")
             
         except Exception as e:
             result.status = TaskStatus.FAILED
             result.error_message = str(e)
             print(f"   💥 任务异常: {e}")
         
+        finally:
+            self._close_streams(task_id, result)
+        
+        if result.status == TaskStatus.FAILED:
+            checkpoint_file = self.outputs_dir / task_info["output_dir"] / CHECKPOINT_FILENAME
+            if checkpoint_file.exists():
+                print("   💾 已保存检查点，可使用 --resume 从中断处继续")
+        
         return result
     
+    def _close_streams(self, task_id: str, result: TaskResult) -> None:
+        """任务结束后确保输出流有终止标记（失败或缓存命中但流不完整时写入中止），并通知下游"""
+        task_info = self.tasks[task_id]
+        for stream_name in self._task_streams(task_id):
+            stream_file = self.outputs_dir / task_info["output_dir"] / stream_name
+            if not stream_is_complete(stream_file):
+                abort_stream(stream_file, f"{task_id} {result.status.value}")
+        self._streams_ready[task_id].set()
+    
+    def _task_streams(self, task_id: str) -> List[str]:
+        """任务发布的输出流（分片只产生部分聚合，不发布；合并时才按文件顺序写出完整的流）"""
+        return [] if self.shard else self.tasks[task_id].get("streams", [])
+    
+    def _save_deferred_fingerprints(self) -> None:
+        """流式上游全部成功结束后，为提前启动的下游保存输入指纹"""
+        for task_id, (output_dir, task_script) in list(self._deferred_fingerprints.items()):
+            dependencies = self.tasks[task_id].get("stream_dependencies", [])
+            if not all(dep_id in self.task_results for dep_id in dependencies):
+                continue
+            
+            del self._deferred_fingerprints[task_id]
+            if all(self.task_results[dep_id].status in SUCCESS_STATUSES for dep_id in dependencies):
+                self._save_fingerprint(output_dir, self._compute_fingerprint(task_id, task_script),
+                                       self.task_results[task_id].output_files)
+    
+    def _execute_subprocess(self, task_info: Dict[str, Any], task_script: Path, output_dir: Path,
+                            result: TaskResult) -> Optional[str]:
+        """在独立子进程中执行任务脚本，成功返回 None，失败返回错误信息"""
+        cmd = [sys.executable, str(task_script), str(output_dir)]
+        if self.profile:
+            # 由 shared.profiling 包装脚本，在子进程内完成剖析并写出产物
+            profile_args = ["-m", "shared.profiling", "--output-dir", str(output_dir),
+                            "--task-id", result.task_id, "--top", str(self.profile_top)]
+            if self.profile_memory:
+                profile_args.append("--memory")
+            cmd = [sys.executable] + profile_args + cmd[1:]
+        
+        print(f"   执行命令: {' '.join(cmd)}")
+        
+        # 进度事件走独立管道，子进程通过环境变量得知写端文件描述符
+        env = dict(os.environ)
+        pass_fds = ()
+        progress_read = None
+        if os.name == "posix":
+            progress_read, progress_write = os.pipe()
+            env[PROGRESS_FD_ENV] = str(progress_write)
+            pass_fds = (progress_write,)
+        
+        try:
+            process = subprocess.Popen(
+                cmd,
+                cwd=str(self.base_dir),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=env,
+                pass_fds=pass_fds
+            )
+        finally:
+            for fd in pass_fds:
+                os.close(fd)
+        
+        # 后台线程持续读取输出，只保留有限的尾部，避免大语料下日志无限增长
+        tails = {"stdout": deque(maxlen=LOG_TAIL_LINES), "stderr": deque(maxlen=LOG_TAIL_LINES)}
+        line_counts = {"stdout": 0, "stderr": 0}
+        
+        def read_log(name, stream):
+            for line in stream:
+                tails[name].append(line)
+                line_counts[name] += 1
+        
+        readers = [
+            threading.Thread(target=read_log, args=(name, stream), daemon=True)
+            for name, stream in (("stdout", process.stdout), ("stderr", process.stderr))
+        ]
+        if progress_read is not None:
+            readers.append(threading.Thread(target=self._read_progress, args=(progress_read, result), daemon=True))
+        for reader in readers:
+            reader.start()
+        
+        try:
+            self._wait_with_rusage(process, task_info.get("timeout", 300), result)
+        finally:
+            for reader in readers:
+                reader.join(timeout=5)
+        
+        if process.returncode != 0:
+            stdout, stderr = (self._format_log_tail(tails[name], line_counts[name]) for name in ("stdout", "stderr"))
+            print(f"   ❌ 任务失败: {stderr}")
+            return f"Process failed with code {process.returncode}\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
+        return None
+    
+    def _format_log_tail(self, tail: deque, total_lines: int) -> str:
+        """拼接保留的日志尾部，被截断时注明省略的行数"""
+        text = "".join(tail)
+        if total_lines > len(tail):
+            text = f"... (省略前 {total_lines - len(tail)} 行)\n" + text
+        return text
+    
+    def _read_progress(self, read_fd: int, result: TaskResult) -> None:
+        """逐行读取子进程的进度事件，直到子进程关闭管道"""
+        with os.fdopen(read_fd, 'r', encoding='utf-8') as stream:
+            for line in stream:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._on_progress(result, event)
+    
+    def _on_progress(self, result: TaskResult, event: Dict[str, Any]) -> None:
+        """处理一条进度事件：记录已处理量，并按间隔输出实时吞吐量与预计剩余时间"""
+        if event.get("event") == "exit":
+            # 子进程退出时上报的自身内存峰值
+            if event.get("peak_rss_bytes") is not None:
+                result.metrics["peak_rss_bytes"] = event["peak_rss_bytes"]
+            return
+        
+        result.metrics["records_processed"] = event.get("records_done", 0)
+        result.metrics["bytes_processed"] = event.get("bytes_done", 0)
+        
+        if event.get("event") != "progress":
+            return
+        
+        now = time.monotonic()
+        if now - self._last_progress_print.get(result.task_id, 0) < PROGRESS_PRINT_INTERVAL:
+            return
+        self._last_progress_print[result.task_id] = now
+        
+        print(f"   📈 {result.task_id}: {self._format_progress(event)}")
+    
+    def _format_progress(self, event: Dict[str, Any]) -> str:
+        """格式化进度事件：完成比例、记录与字节吞吐量、ETA、当前文件"""
+        records_done, records_total = event.get("records_done", 0), event.get("records_total", 0)
+        bytes_done, bytes_total = event.get("bytes_done", 0), event.get("bytes_total", 0)
+        
+        # 优先按字节估算完成比例，记录数作为后备
+        fraction = None
+        if bytes_total:
+            fraction = min(bytes_done / bytes_total, 1.0)
+        elif records_total:
+            fraction = min(records_done / records_total, 1.0)
+        
+        parts = []
+        if fraction is not None:
+            parts.append(f"{fraction:.1%}")
+        parts.append(f"{records_done:,} 条记录 ({event.get('records_per_second', 0):,.0f}/s)")
+        parts.append(f"{format_bytes(bytes_done)} ({format_bytes(event.get('bytes_per_second', 0))}/s)")
+        if fraction:
+            eta = event.get("elapsed", 0) * (1 - fraction) / fraction
+            parts.append(f"ETA {eta:.0f}s")
+        if event.get("current_file"):
+            parts.append(event["current_file"])
+        return " | ".join(parts)
+    
+    def _wait_with_rusage(self, process: subprocess.Popen, timeout: float, result: TaskResult) -> None:
+        """等待子进程结束并将其资源使用写入 result.metrics，超时则终止进程并抛出 TimeoutExpired
+        
+        通过 wait4 取得该子进程自身的 rusage（并行执行时互不干扰），
+        在回收前读取 /proc/<pid>/io 得到最终的 I/O 计数。
+        """
+        if resource is None or not hasattr(os, "wait4"):
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise
+            return
+        
+        deadline = time.monotonic() + timeout
+        io_path = f"/proc/{process.pid}/io"
+        io = {}
+        timed_out = False
+        
+        while True:
+            if hasattr(os, "waitid"):
+                # WNOWAIT: 只检测退出而不回收，僵尸进程的 /proc/<pid>/io 仍可读取
+                if os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT | os.WNOHANG) is not None:
+                    io = _read_proc_io(io_path) or io
+                    _, status, usage = os.wait4(process.pid, 0)
+                    break
+                io = _read_proc_io(io_path) or io
+            else:
+                io = _read_proc_io(io_path) or io
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+            
+            if not timed_out and time.monotonic() > deadline:
+                process.kill()
+                timed_out = True
+            time.sleep(0.05)
+        
+        process.returncode = os.waitstatus_to_exitcode(status)
+        result.metrics.update(_usage_counters(usage, io))
+        # ru_maxrss 在 fork 时继承调度器的峰值，只是任务峰值的上限；任务自身的峰值由退出时的 exit 事件上报
+        result.metrics["maxrss_with_scheduler_bytes"] = _peak_rss_bytes(usage)
+        result.metrics["resource_scope"] = "process"
+        
+        if timed_out:
+            raise subprocess.TimeoutExpired(process.args, timeout)
+    
+    def _execute_inprocess(self, task_id: str, task_info: Dict[str, Any], output_dir: Path,
+                           result: TaskResult) -> Optional[str]:
+        """在当前进程中直接调用任务模块的 execute()，结果对象保存到共享上下文供下游任务使用"""
+        print(f"   进程内执行: {self._module_name(task_id)}.execute")
+        
+        def execute() -> Any:
+            if self.single_pass and task_info.get("corpus_visitor"):
+                self._run_corpus_pass(task_id)
+            return module.execute(output_dir, self.context)
+        
+        before = self._current_thread_usage()
+        try:
+            module = self._import_task_module(task_id)
+            with progress_sink(lambda event: self._on_progress(result, event)):
+                if self.profile:
+                    with TaskProfiler(output_dir, task_id, self.profile_memory, self.profile_top):
+                        self.context[task_id] = execute()
+                else:
+                    self.context[task_id] = execute()
+        except (Exception, SystemExit):
+            error_message = traceback.format_exc()
+            print(f"   💥 任务异常: {error_message.strip().splitlines()[-1]}")
+            return error_message
+        finally:
+            after = self._current_thread_usage()
+            if before and after:
+                counters_before, _, scope = before
+                counters_after, peak_rss, _ = after
+                result.metrics.update({
+                    key: round(value - counters_before.get(key, 0), 6)
+                    for key, value in counters_after.items()
+                })
+                result.metrics["peak_rss_bytes"] = peak_rss  # 进程级峰值，非本任务增量
+                result.metrics["resource_scope"] = scope
+        return None
+    
+    def _module_name(self, task_id: str) -> str:
+        """任务模块的导入路径"""
+        task_info = self.tasks[task_id]
+        return f"tasks.{task_info['module']}.{Path(task_info['script']).stem}"
+    
+    def _import_task_module(self, task_id: str) -> Any:
+        """导入任务模块（进程内执行与单次遍历共用）"""
+        if str(self.base_dir) not in sys.path:
+            sys.path.insert(0, str(self.base_dir))
+        return importlib.import_module(self._module_name(task_id))
+    
+    def _run_corpus_pass(self, task_id: str) -> None:
+        """
+        单次遍历模式：本次执行中第一个读取语料的任务开始时，为计划中所有尚未执行、未命中缓存的
+        此类任务一次性读取语料，每条记录只解析一次并分发给各任务的访问者；
+        各任务随后从共享上下文取出已完成读取的访问者生成输出
+        """
+        with self._corpus_lock:
+            if self._corpus_pass_done:
+                return
+            self._corpus_pass_done = True
+            
+            participants = [
+                t for t in self._planned_tasks
+                if self.tasks[t].get("corpus_visitor")
+                and (t == task_id or (t not in self.task_results and self._will_execute(t)))
+            ]
+            visitors = {
+                t: self._import_task_module(t).create_corpus_visitor(self.outputs_dir / self.tasks[t]["output_dir"])
+                for t in participants
+            }
+            
+            scan_result = resolve_scan_result(self.outputs_dir / self.tasks[task_id]["output_dir"], self.context)
+            print(f"   📖 单次遍历语料: {', '.join(participants)} 共享同一次读取")
+            reader = CorpusReader(list(visitors.values()))
+            reader.read(scan_result, ProgressReporter(task_id, scan_result.total_records, scan_result.total_size))
+            print(f"   📖 读取 {reader.files_read} 个文件, {reader.records_parsed:,} 条记录")
+            
+            self.context[CORPUS_PASS_KEY] = visitors
+    
+    def _will_execute(self, task_id: str) -> bool:
+        """依赖已满足且输入指纹未命中缓存（即稍后会真正执行）的任务"""
+        for dep_id in self.tasks[task_id].get("dependencies", []):
+            if dep_id in self.external_tasks:
+                continue
+            if dep_id not in self.task_results or self.task_results[dep_id].status not in SUCCESS_STATUSES:
+                return False
+        
+        if not self.use_cache:
+            return True
+        task_info = self.tasks[task_id]
+        task_script = self.tasks_dir / task_info["module"] / task_info["script"]
+        fingerprint = self._compute_fingerprint(task_id, task_script)
+        return not self._is_cache_valid(self.outputs_dir / task_info["output_dir"], fingerprint)
+    
+    def _current_thread_usage(self) -> Optional[tuple]:
+        """当前线程（平台不支持时退化为整个进程）的累计资源使用"""
+        if resource is None:
+            return None
+        
+        if hasattr(resource, "RUSAGE_THREAD"):
+            usage, scope = resource.getrusage(resource.RUSAGE_THREAD), "thread"
+            io = _read_proc_io("/proc/thread-self/io")
+        else:
+            usage, scope = resource.getrusage(resource.RUSAGE_SELF), "process"
+            io = _read_proc_io("/proc/self/io")
+        
+        peak_rss = _peak_rss_bytes(resource.getrusage(resource.RUSAGE_SELF))
+        return _usage_counters(usage, io), peak_rss, scope
+    
+    def _format_metrics(self, metrics: Dict[str, Any]) -> str:
+        """格式化资源使用指标用于控制台输出"""
+        parts = []
+        if "cpu_user_seconds" in metrics:
+            parts.append(f"CPU 用户 {metrics['cpu_user_seconds']:.2f}s / 系统 {metrics['cpu_system_seconds']:.2f}s")
+        if "peak_rss_bytes" in metrics:
+            parts.append(f"峰值内存 {format_bytes(metrics['peak_rss_bytes'])}")
+        elif "maxrss_with_scheduler_bytes" in metrics:
+            parts.append(f"峰值内存 ≤{format_bytes(metrics['maxrss_with_scheduler_bytes'])} (含调度器)")
+        if "read_bytes" in metrics:
+            parts.append(f"读 {format_bytes(metrics['read_bytes'])} / 写 {format_bytes(metrics['write_bytes'])}")
+        if "voluntary_context_switches" in metrics:
+            parts.append(f"上下文切换 {metrics['voluntary_context_switches']}/{metrics['involuntary_context_switches']}")
+        return " | ".join(parts)
+    
+    def _compute_fingerprint(self, task_id: str, task_script: Path) -> Dict[str, Any]:
+        """计算任务输入指纹: 任务脚本版本 + T06清单内容 + 上游输出哈希"""
+        inputs = {
+            "script": calculate_file_hash(str(task_script)),
+            "shared": self._hash_paths(sorted(self.shared_dir.glob("*.py")))
+        }
+        
+        if task_id == "T06":
+            # T06 的输入是 ~/.claude 数据源本身
+            inputs["source"] = self._source_fingerprint()
+        else:
+            inputs["manifest"] = self._manifest_fingerprint()
+            for dep_id in self.tasks[task_id].get("dependencies", []):
+                if dep_id == "T06":
+                    continue  # 已由清单指纹覆盖
+                dep_info = self.tasks[dep_id]
+                dep_outputs = self._verify_outputs(self.outputs_dir / dep_info["output_dir"],
+                                                   dep_info.get("expected_outputs", []))
+                inputs[f"upstream_{dep_id}"] = self._hash_paths([Path(p) for p in dep_outputs])
+        
+        digest = hashlib.md5(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+        return {"task_id": task_id, "fingerprint": digest, "inputs": inputs}
+    
+    def _manifest_fingerprint(self) -> str:
+        """T06 扫描清单的内容指纹（只取文件明细，忽略每次都会变化的执行时间）"""
+        manifest_file = self.outputs_dir / self.tasks["T06"]["output_dir"] / "scan_results.json"
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                file_details = json.load(f).get("file_details", [])
+        except (OSError, json.JSONDecodeError):
+            return ""
+        return hashlib.md5(json.dumps(file_details, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    def _source_fingerprint(self) -> str:
+        """数据源目录指纹: projects 与 todos 下所有文件的 (路径, 大小, 修改时间)"""
+        entries = []
+        for sub_dir in ("projects", "todos"):
+            root = self.claude_dir / sub_dir
+            if not root.is_dir():
+                continue
+            for path in root.rglob("*"):
+                if path.is_file():
+                    stat = path.stat()
+                    entries.append([str(path.relative_to(self.claude_dir)), stat.st_size, stat.st_mtime_ns])
+        entries.sort()
+        return hashlib.md5(json.dumps(entries).encode("utf-8")).hexdigest()
+    
+    def _hash_paths(self, paths: List[Path]) -> Dict[str, str]:
+        """计算文件（目录则递归其中文件）的内容哈希"""
+        hashes = {}
+        for path in paths:
+            files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+            for file_path in files:
+                hashes[str(file_path.relative_to(self.base_dir))] = calculate_file_hash(str(file_path))
+        return hashes
+    
+    def _is_cache_valid(self, output_dir: Path, fingerprint: Dict[str, Any]) -> bool:
+        """指纹一致且上次记录的输出文件仍然存在"""
+        try:
+            with open(output_dir / FINGERPRINT_FILE, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        
+        if saved.get("fingerprint") != fingerprint["fingerprint"]:
+            return False
+        outputs = saved.get("output_files", [])
+        return bool(outputs) and all((self.base_dir / p).exists() for p in outputs)
+    
+    def _save_fingerprint(self, output_dir: Path, fingerprint: Dict[str, Any], output_files: List[str]):
+        """任务成功后记录输入指纹"""
+        record = {
+            **fingerprint,
+            "created": datetime.now().isoformat(),
+            "output_files": [str(Path(p).relative_to(self.base_dir)) for p in output_files]
+        }
+        with open(output_dir / FINGERPRINT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+    
     def _verify_outputs(self, output_dir: Path, expected_outputs: List[str]) -> List[str]:
         """验证输出文件是否存在"""
         actual_outputs = []
@@ -273,24 +885,54 @@ class TaskScheduler:
         print("🎯 Claude CLI 数据分析任务调度器")
         print("=" * 60)
         
+        # 重置上一次执行的状态（守护进程会复用同一个调度器）
+        self.task_results = {}
+        self._deferred_fingerprints.clear()
+        self.context.pop(CORPUS_PASS_KEY, None)
+        self._corpus_pass_done = False
+        for event in self._streams_ready.values():
+            event.clear()
+        
         # 确定要执行的任务
         if task_filter:
             tasks_to_run = [t for t in self.get_task_dependency_order() if t in task_filter]
         else:
-            tasks_to_run = self.get_task_dependency_order()
+            tasks_to_run = [t for t in self.get_task_dependency_order() if t not in self.external_tasks]
+        
+        if self.shard:
+            skipped = [t for t in tasks_to_run if t not in SHARDABLE_TASKS]
+            tasks_to_run = [t for t in tasks_to_run if t in SHARDABLE_TASKS]
+            print(f"🧩 分片模式: 分片 {self.shard[0]}/{self.shard[1]}" +
+                  (f"，跳过不支持分片的任务 {', '.join(skipped)}" if skipped else ""))
+        elif self.merge_shards:
+            print(f"🧩 合并模式: 合并 {self.merge_shards} 个分片的部分聚合")
         
         print(f"📋 计划执行 {len(tasks_to_run)} 个任务: {', '.join(tasks_to_run)}")
+        self._planned_tasks = tasks_to_run
+        print(f"🧮 JSON解码后端: {get_backend().name}")
+        if self.single_pass:
+            print("📖 单次遍历模式: 读取语料的任务共享同一次读取")
+        if self.jobs > 1:
+            print(f"⚡ 并行模式: 最多同时执行 {self.jobs} 个任务")
+        
+        # 根据历史耗时计算关键路径并预测总耗时
+        estimates, known = self._estimate_durations(tasks_to_run)
+        ranks = self._critical_path_lengths(tasks_to_run, estimates)
+        self._print_runtime_prediction(tasks_to_run, estimates, ranks, known)
         
         # 执行任务
         start_time = datetime.now()
         
-        for task_id in tasks_to_run:
-            result = self.run_task(task_id)
-            self.task_results[task_id] = result
-            
-            if result.status == TaskStatus.FAILED:
-                print(f"❌ 任务 {task_id} 失败，停止执行后续任务")
-                break
+        if self.jobs > 1:
+            self._run_tasks_parallel(tasks_to_run, ranks)
+        else:
+            for task_id in tasks_to_run:
+                result = self.run_task(task_id)
+                self.task_results[task_id] = result
+                
+                if result.status == TaskStatus.FAILED:
+                    print(f"❌ 任务 {task_id} 失败，停止执行后续任务")
+                    break
         
         end_time = datetime.now()
         total_duration = (end_time - start_time).total_seconds()
@@ -298,36 +940,284 @@ class TaskScheduler:
         # 生成执行报告
         self._generate_execution_report(total_duration)
         
+        # 分片只处理部分文件，其耗时不用于估算整体执行
+        if not self.shard:
+            self.history.append_run(start_time.isoformat(), {
+                task_id: {"status": result.status.value, "duration": result.duration, "metrics": result.metrics}
+                for task_id, result in self.task_results.items()
+            }, self._corpus_size(), self.execution_mode())
+            self.print_throughput_comparison(regressions_only=True, only_tasks=[
+                task_id for task_id, result in self.task_results.items() if result.status == TaskStatus.COMPLETED
+            ])
+        
         return self.task_results
     
+    def execution_mode(self) -> Dict[str, Any]:
+        """本次的执行方式：执行历史只在相同方式的执行之间估算耗时、比较吞吐量"""
+        return {
+            "mode": self.mode,
+            "jobs": self.jobs,
+            "workers": self.workers,
+            "range_mb": self.range_mb if self.workers > 1 else None,
+            "incremental": self.incremental,
+            "single_pass": self.single_pass,
+            "pipeline": self.pipeline,
+            "shard": list(self.shard) if self.shard else None,
+            "merge_shards": self.merge_shards,
+            "profile": self.profile
+        }
+    
+    def _corpus_size(self) -> Optional[Dict[str, int]]:
+        """本次数据源规模（来自 T06 扫描清单），用于比较不同时期的吞吐量"""
+        scan_result = (self.context.get("T06") or {}).get("scan_result")
+        if scan_result is None:
+            scan_result_file = self.outputs_dir / SCAN_RESULT_RELPATH
+            if not scan_result_file.exists():
+                return None
+            try:
+                scan_result = load_scan_result(str(scan_result_file))
+            except (OSError, ValueError, KeyError):
+                return None
+        return {"files": scan_result.total_files, "records": scan_result.total_records, "bytes": scan_result.total_size}
+    
+    def print_throughput_comparison(self, threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+                                    window: int = HISTORY_WINDOW, only_tasks: Optional[List[str]] = None,
+                                    regressions_only: bool = False) -> int:
+        """
+        比较各任务最近一次执行与滚动基线的吞吐量并打印，返回回退的任务数
+        
+        Args:
+            threshold: 吞吐量下降超过该比例视为回退
+            window: 基线参考的执行次数
+            only_tasks: 只比较这些任务
+            regressions_only: 只打印回退的任务（每次执行结束后使用）
+        """
+        comparisons = [
+            c for c in self.history.compare_latest(threshold, window)
+            if only_tasks is None or c.task_id in only_tasks
+        ]
+        regressions = [c for c in comparisons if c.regressed]
+        
+        if not regressions_only:
+            print(f"📉 吞吐量对比 (基线: 此前最多 {max(window, MIN_BASELINE_RUNS)} 次执行的中位数, 回退阈值: {threshold:.0%})")
+            print("=" * 60)
+            if not comparisons:
+                print(f"   没有可比较的执行历史（上报处理量、耗时不短于 {MIN_COMPARE_DURATION:g}s 的执行，"
+                      f"每个任务至少需要 {MIN_BASELINE_RUNS + 1} 次）")
+        
+        for c in (regressions if regressions_only else comparisons):
+            emoji = "⚠️" if c.regressed else "✅"
+            print(f"  {emoji} {c.task_id}: {format_bytes(c.current)}/s, 基线 {format_bytes(c.baseline)}/s "
+                  f"({c.change:+.1%}, {c.baseline_runs} 次)")
+        
+        if regressions:
+            print(f"⚠️ {len(regressions)} 个任务吞吐量较基线下降超过 {threshold:.0%}: "
+                  f"{', '.join(c.task_id for c in regressions)}")
+        return len(regressions)
+    
+    def run_sharded(self, task_filter: List[str], shard_count: int) -> Dict[str, TaskResult]:
+        """
+        在本机以多个进程分片执行：先扫描数据源，再并行执行各分片，最后合并
+        
+        各分片的调度器输出写入 outputs/shards/ 下的日志文件。
+        """
+        scan_results = self.run_all_tasks(["T06"])
+        if scan_results["T06"].status not in SUCCESS_STATUSES:
+            return scan_results
+        
+        shard_tasks = [t for t in (task_filter or SHARDABLE_TASKS) if t in SHARDABLE_TASKS]
+        log_dir = self.outputs_dir / "shards"
+        log_dir.mkdir(exist_ok=True)
+        
+        print(f"\n🧩 启动 {shard_count} 个分片进程: {', '.join(shard_tasks)}")
+        start = time.monotonic()
+        processes = []
+        for shard in range(shard_count):
+            log_file = log_dir / f"shard-{shard:03d}-of-{shard_count:03d}.log"
+            command = [sys.executable, str(Path(__file__).resolve()), "--shard", f"{shard}/{shard_count}",
+                       "--base-dir", str(self.base_dir), "--mode", self.mode, "--tasks", *shard_tasks]
+            with open(log_file, 'w', encoding='utf-8') as log:
+                processes.append((shard, log_file, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)))
+        
+        failed = []
+        for shard, log_file, process in processes:
+            if process.wait() != 0:
+                failed.append(shard)
+                print(f"   ❌ 分片 {shard} 失败，日志: {log_file}")
+        print(f"   分片执行耗时: {time.monotonic() - start:.1f}s")
+        
+        if failed:
+            for task_id in shard_tasks:
+                self.task_results[task_id] = TaskResult(task_id, TaskStatus.FAILED,
+                                                        error_message=f"分片 {', '.join(map(str, failed))} 执行失败")
+            return self.task_results
+        
+        # 合并分片结果并执行下游任务
+        self.merge_shards = shard_count
+        self.external_tasks = {"T06"}
+        os.environ[MERGE_ENV] = str(shard_count)
+        merge_filter = [t for t in task_filter if t != "T06"] if task_filter else None
+        return self.run_all_tasks(merge_filter)
+    
+    def _estimate_durations(self, tasks_to_run: List[str]) -> tuple:
+        """
+        按以相同方式执行的历史估算各任务耗时，没有历史的任务取已知估算的中位数
+        
+        Returns:
+            (task_id -> 估算耗时, 有历史数据的任务数)
+        """
+        history_estimates = self.history.estimate_durations(tasks_to_run, self.execution_mode())
+        known = sorted(v for v in history_estimates.values() if v is not None)
+        fallback = known[len(known) // 2] if known else DEFAULT_TASK_ESTIMATE
+        
+        estimates = {
+            task_id: estimate if estimate is not None else fallback
+            for task_id, estimate in history_estimates.items()
+        }
+        return estimates, len(known)
+    
+    def _critical_path_lengths(self, tasks_to_run: List[str], estimates: Dict[str, float]) -> Dict[str, float]:
+        """每个任务到计划终点的最长路径耗时（含自身），越大越应优先启动"""
+        ranks = {}
+        # tasks_to_run 已按依赖排序，逆序遍历保证下游任务先算出
+        for task_id in reversed(tasks_to_run):
+            downstream = [
+                ranks[other] for other in tasks_to_run
+                if other in ranks and task_id in self.tasks[other].get("dependencies", [])
+            ]
+            ranks[task_id] = estimates[task_id] + max(downstream, default=0.0)
+        return ranks
+    
+    def _predict_runtime(self, tasks_to_run: List[str], estimates: Dict[str, float],
+                         ranks: Dict[str, float]) -> float:
+        """按与实际调度相同的优先级模拟 self.jobs 个并发槽位的执行，返回预计总耗时"""
+        pending = list(tasks_to_run)
+        running = []  # (预计结束时间, task_id)
+        finished = set()
+        clock = 0.0
+        
+        while pending or running:
+            ready = [
+                task_id for task_id in pending
+                if all(dep in finished or dep not in tasks_to_run
+                       for dep in self.tasks[task_id].get("dependencies", []))
+            ]
+            ready.sort(key=lambda task_id: ranks[task_id], reverse=True)
+            for task_id in ready[:max(self.jobs - len(running), 0)]:
+                pending.remove(task_id)
+                running.append((clock + estimates[task_id], task_id))
+            
+            if not running:
+                break
+            
+            running.sort()
+            clock, task_id = running.pop(0)
+            finished.add(task_id)
+        
+        return clock
+    
+    def _print_runtime_prediction(self, tasks_to_run: List[str], estimates: Dict[str, float],
+                                  ranks: Dict[str, float], known: int) -> None:
+        """输出预计总耗时与关键路径"""
+        if not tasks_to_run:
+            return
+        
+        # 从最长路径的起点沿耗时最长的下游任务展开关键路径
+        path = [max(tasks_to_run, key=lambda task_id: ranks[task_id])]
+        while True:
+            downstream = [
+                other for other in tasks_to_run
+                if path[-1] in self.tasks[other].get("dependencies", [])
+            ]
+            if not downstream:
+                break
+            path.append(max(downstream, key=lambda task_id: ranks[task_id]))
+        
+        predicted = self._predict_runtime(tasks_to_run, estimates, ranks)
+        print(f"⏱️ 预计总耗时: {predicted:.1f}s (关键路径 {' → '.join(path)}: {ranks[path[0]]:.1f}s, "
+              f"{known}/{len(tasks_to_run)} 个任务有历史数据)")
+    
+    def _run_tasks_parallel(self, tasks_to_run: List[str], ranks: Dict[str, float]) -> None:
+        """按依赖关系并行执行任务，依赖全部完成的任务中关键路径最长的优先启动，最多同时运行 self.jobs 个"""
+        pending = sorted(tasks_to_run, key=lambda task_id: ranks[task_id], reverse=True)
+        running = {}  # future -> task_id
+        failed = False
+        
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while pending or running:
+                # 出现失败后不再启动新任务，只等待运行中的任务结束
+                if not failed:
+                    for task_id in list(pending):
+                        if len(running) >= self.jobs:
+                            break
+                        if self._dependencies_finished(task_id, tasks_to_run):
+                            pending.remove(task_id)
+                            running[executor.submit(self.run_task, task_id)] = task_id
+                
+                if not running:
+                    break
+                
+                # 流水线模式下还需定期检查上游的输出流是否已就绪
+                done, _ = wait(running, timeout=STREAM_POLL_INTERVAL if self.pipeline else None,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    result = future.result()
+                    self.task_results[task_id] = result
+                    self._save_deferred_fingerprints()
+                    
+                    if result.status == TaskStatus.FAILED and not failed:
+                        failed = True
+                        print(f"❌ 任务 {task_id} 失败，停止启动后续任务")
+                        if running:
+                            print(f"   等待运行中的任务结束: {', '.join(running.values())}")
+    
+    def _dependencies_finished(self, task_id: str, tasks_to_run: List[str]) -> bool:
+        """本次计划内的依赖是否都已执行结束（计划外的依赖交由 run_task 检查）
+        
+        流水线模式下，流式依赖只需输出流已就绪
+        """
+        stream_dependencies = self.tasks[task_id].get("stream_dependencies", []) if self.pipeline else []
+        return all(
+            dep_id in self.task_results or (dep_id in stream_dependencies and self._streams_ready[dep_id].is_set())
+            for dep_id in self.tasks[task_id].get("dependencies", [])
+            if dep_id in tasks_to_run
+        )
+    
     def _generate_execution_report(self, total_duration: float):
         """生成执行报告"""
-        print(f"\n📊 执行报告")
+        print("\n📊 执行报告")
         print("=" * 60)
         
-        completed = sum(1 for r in self.task_results.values() if r.status == TaskStatus.COMPLETED)
+        completed = sum(1 for r in self.task_results.values() if r.status in SUCCESS_STATUSES)
+        cached = sum(1 for r in self.task_results.values() if r.status == TaskStatus.CACHED)
         failed = sum(1 for r in self.task_results.values() if r.status == TaskStatus.FAILED)
         
         print(f"总执行时间: {total_duration:.1f} 秒")
-        print(f"任务完成: {completed}")
+        print(f"任务完成: {completed}" + (f" (其中缓存命中 {cached})" if cached else ""))
         print(f"任务失败: {failed}")
         print(f"成功率: {completed/(completed+failed)*100:.1f}%" if (completed+failed) > 0 else "成功率: 0%")
         
-        print(f"\n📋 任务详情:")
+        print("\n📋 任务详情:")
         for task_id, result in self.task_results.items():
             task_info = self.tasks[task_id]
-            status_emoji = {"completed": "✅", "failed": "❌", "running": "🔄", "pending": "⏳"}
+            status_emoji = {"completed": "✅", "failed": "❌", "running": "🔄", "pending": "⏳", "cached": "♻️"}
             
             print(f"  {status_emoji.get(result.status.value, '❓')} {task_id}: {task_info['name']}")
             if result.duration:
                 print(f"     执行时间: {result.duration:.1f}s")
             if result.output_files:
                 print(f"     输出文件: {len(result.output_files)}个")
+            if result.metrics:
+                print(f"     资源: {self._format_metrics(result.metrics)}")
+            if result.profile_files:
+                print(f"     剖析文件: {', '.join(Path(f).name for f in result.profile_files)}")
             if result.error_message:
                 print(f"     错误: {result.error_message[:100]}...")
         
-        # 保存报告到文件
-        report_file = self.outputs_dir / "execution_report.json"
+        # 保存报告到文件（各分片分别保存，避免共享输出目录时互相覆盖）
+        report_name = f"execution_report.shard-{self.shard[0]:03d}-of-{self.shard[1]:03d}.json" if self.shard else "execution_report.json"
+        report_file = self.outputs_dir / report_name
         report_data = {
             "execution_time": datetime.now().isoformat(),
             "total_duration": total_duration,
@@ -338,6 +1228,7 @@ class TaskScheduler:
                     "end_time": result.end_time.isoformat() if result.end_time else None,
                     "duration": result.duration,
                     "output_files": result.output_files,
+                    "profile_files": result.profile_files,
                     "error_message": result.error_message,
                     "metrics": result.metrics
                 }
@@ -351,6 +1242,34 @@ class TaskScheduler:
         print(f"\n💾 执行报告已保存: {report_file}")
 
 
+def run_via_daemon(args: argparse.Namespace) -> int:
+    """通过守护进程执行任务并打印摘要，返回失败任务数"""
+    request = {"command": "run", "tasks": args.tasks, "force": args.force, "jobs": args.jobs}
+    try:
+        response = send_request(request, args.daemon)
+    except DaemonUnavailableError as e:
+        print(f"❌ {e}")
+        print("   请先启动: python analyzer_daemon.py")
+        return 1
+    
+    if not response.get("ok"):
+        print(f"❌ 守护进程执行失败: {response.get('error')}")
+        return 1
+    
+    result = response["result"]
+    status_emoji = {"completed": "✅", "cached": "♻️", "failed": "❌", "skipped": "⏭️"}
+    print(f"🛰️ 守护进程执行完成，总耗时: {result['total_duration']:.2f}秒")
+    failed_count = 0
+    for task_id, task_result in result["task_results"].items():
+        emoji = status_emoji.get(task_result["status"], "❓")
+        print(f"  {emoji} {task_id}: {task_result['name']} ({task_result['duration']:.2f}秒)")
+        if task_result["error_message"]:
+            print(f"      错误: {task_result['error_message']}")
+        if task_result["status"] == TaskStatus.FAILED.value:
+            failed_count += 1
+    return failed_count
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="Claude CLI 数据分析任务调度器")
@@ -359,10 +1278,82 @@ def main():
                        help="指定要执行的任务ID")
     parser.add_argument("--list", "-l", action="store_true", help="列出所有可用任务")
     parser.add_argument("--base-dir", "-b", help="指定基础目录")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                       help="并行执行的最大任务数 (默认: 1, 串行执行)")
+    parser.add_argument("--force", "-f", action="store_true",
+                       help="忽略输入指纹缓存，强制重新执行所有任务")
+    parser.add_argument("--mode", "-m", choices=["subprocess", "inprocess"], default="subprocess",
+                       help="任务执行方式: subprocess 每个任务独立子进程 (默认); "
+                            "inprocess 在当前进程内直接调用分析器并共享已加载的扫描结果 (不强制超时)")
+    parser.add_argument("--profile", "-p", action="store_true",
+                       help="在 cProfile 下执行任务，向各任务输出目录写入排序统计与折叠栈 (忽略缓存)")
+    parser.add_argument("--profile-memory", action="store_true",
+                       help="剖析时同时使用 tracemalloc 输出内存分配 Top-N (隐含 --profile)")
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_TOP_N,
+                       help=f"剖析报告中列出的条目数 (默认: {DEFAULT_TOP_N})")
+    parser.add_argument("--pipeline", action="store_true",
+                       help="流水线模式: T03 在 T02 开始发布类型流后即启动，边读边处理 (至少并行2个任务)")
+    parser.add_argument("--single-pass", action="store_true",
+                       help="单次遍历模式: T01/T02/T04 共享同一次语料读取，每条记录只解析一次 (隐含 --mode inprocess)")
+    parser.add_argument("--record-cache-mb", type=float, default=DEFAULT_RECORD_CACHE_MB,
+                       help=f"会话文件解析结果缓存 (outputs/{RECORD_CACHE_DIRNAME}) 的磁盘预算，"
+                            f"超出时淘汰最久未使用的文件，0 表示不使用 (默认: {DEFAULT_RECORD_CACHE_MB})")
+    parser.add_argument("--prefetch-mb", type=float, default=DEFAULT_PREFETCH_MB,
+                       help="预读: 解析当前文件的同时由读取线程提前读入后续文件，已读入未处理的内容不超过该大小，"
+                            f"0 表示不预读 (默认: {DEFAULT_PREFETCH_MB})")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                       help="T01/T02/T04 内部处理语料的工作进程数，文件按大小从大到小分发 (结果与串行相同)，"
+                            "0 表示CPU核数 (默认: 1)")
+    parser.add_argument("--range-mb", type=float, default=DEFAULT_RANGE_MB,
+                       help="多进程时超过该大小的会话文件按换行符分段，由多个工作进程同时处理 (T02/T04)，"
+                            f"0 表示不分段 (默认: {DEFAULT_RANGE_MB})")
+    parser.add_argument("--incremental", action="store_true",
+                       help="增量读取: 会话文件只读取上次执行后追加的完整行，与各文件保存的可续算状态合并 "
+                            "(T06/T01/T02/T04，结果与完整读取相同)")
+    parser.add_argument("--json-backend", choices=["auto", *JSON_BACKENDS],
+                       help="会话文件的JSON解码后端 (默认: auto，按 orjson、msgspec、simdjson、标准库的顺序选择已安装的；"
+                            "各后端的吞吐量见 json_benchmark.py)")
+    parser.add_argument("--resume", "-r", action="store_true",
+                       help="支持检查点的任务 (T01、T02) 从上次超时或崩溃时保存的检查点继续")
+    parser.add_argument("--shard", metavar="I/N",
+                       help="只处理扫描清单的第 I 个分片 (共 N 片，从 0 开始)，为 T01/T02/T04/T05 保存部分聚合；"
+                            "各分片可在共享输出目录的不同机器上执行")
+    parser.add_argument("--merge-shards", type=int, metavar="N",
+                       help="合并 N 个分片的部分聚合生成最终输出，并执行下游任务 (结果与单机执行相同)")
+    parser.add_argument("--shards", type=int, metavar="N",
+                       help="在本机以 N 个进程分片执行后自动合并")
+    parser.add_argument("--compare", action="store_true",
+                       help="将各任务最近一次执行的吞吐量与执行历史中的滚动基线比较，回退的任务数作为退出码")
+    parser.add_argument("--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                       help=f"吞吐量比基线下降超过该比例视为回退 (默认: {DEFAULT_REGRESSION_THRESHOLD})")
+    parser.add_argument("--baseline-runs", type=int, default=HISTORY_WINDOW,
+                       help=f"基线参考的最近执行次数 (默认: {HISTORY_WINDOW})")
+    parser.add_argument("--daemon", "-d", nargs="?", const=default_socket_path(), metavar="SOCKET",
+                       help="交给已启动的分析守护进程执行 (见 analyzer_daemon.py)，"
+                            f"可指定套接字路径 (默认: {default_socket_path()})")
     
     args = parser.parse_args()
     
-    scheduler = TaskScheduler(args.base_dir)
+    if args.daemon and not args.list:
+        sys.exit(run_via_daemon(args))
+    
+    try:
+        shard = parse_shard_spec(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        get_backend(args.json_backend)
+    except ImportError:
+        parser.error(f"JSON解码后端 {args.json_backend} 未安装")
+    
+    scheduler = TaskScheduler(args.base_dir, jobs=args.jobs, use_cache=not args.force, mode=args.mode,
+                              resume=args.resume, profile=args.profile,
+                              profile_memory=args.profile_memory, profile_top=args.profile_top,
+                              pipeline=args.pipeline, shard=shard, merge_shards=args.merge_shards,
+                              single_pass=args.single_pass, record_cache_mb=args.record_cache_mb,
+                              incremental=args.incremental, json_backend=args.json_backend,
+                              prefetch_mb=args.prefetch_mb, workers=args.workers,
+                              range_mb=args.range_mb)
     
     if args.list:
         print("📋 可用任务列表:")
@@ -374,8 +1365,14 @@ def main():
             print()
         return
     
+    if args.compare:
+        sys.exit(scheduler.print_throughput_comparison(args.regression_threshold, args.baseline_runs, args.tasks))
+    
     # 执行任务
-    results = scheduler.run_all_tasks(args.tasks)
+    if args.shards:
+        results = scheduler.run_sharded(args.tasks, args.shards)
+    else:
+        results = scheduler.run_all_tasks(args.tasks)
     
     # 返回执行状态码
     failed_count = sum(1 for r in results.values() if r.status == TaskStatus.FAILED)
@@ -6,20 +6,48 @@ T01: 深度字段提取分析任务
 
 import sys
 import os
-import json
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Set, Any
+from typing import Dict, List, Set, Any, Optional, Union, Tuple
 from collections import defaultdict, Counter
+from dataclasses import dataclass
 
 # 添加项目根目录到路径
 current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.models import FieldInfo, AnalysisResult
-from shared.utils import setup_logging
+from shared.models import FieldInfo, AnalysisResult, ScanResult, SessionFile
+from shared.base_analyzer import FileBasedAnalyzer
+from shared.corpus import CorpusReader, take_corpus_visitor
+from shared.manifest import load_scan_result, resolve_scan_result
+from shared.progress import ProgressReporter
+from shared.checkpoint import Checkpointer
+from shared.record_cache import read_jsonl_records
+from shared.json_backend import read_json_file
+from shared.prefetch import prefetching
+from shared.sharding import requested_shard, requested_merge, run_shard, load_shard_segments
+from shared.parallel import requested_workers, parallel_segments
+from shared.incremental import IncrementalFold, requested_incremental, update_incremental
+from shared.utils import setup_logging, save_json_outputs, MissingDependencyError
+
+
+# 每个字段最多收集的唯一值数（用于枚举判定）
+MAX_UNIQUE_VALUES = 50
+
+
+@dataclass
+class FieldPartial:
+    """
+    单个文件中某字段的部分聚合（分片执行时保存，合并时按文件顺序折叠）
+    
+    枚举判定依赖处理顺序，因此除字段信息外还保存判定轨迹：文件内每当已出现的不同值数或
+    数据类型变化就开始一个新区间，区间内计数只增不减，判定结果只需看区间末尾。
+    """
+    info: FieldInfo  # 仅由该文件得到的字段信息
+    values: List[Any]  # 按首次出现顺序的不同基本类型值（最多 2 * MAX_UNIQUE_VALUES 个）
+    steps: List[Tuple[int, int, str]]  # 各区间末尾的 (计数, 已出现的不同值数, 数据类型)
 
 
 class FieldExtractor:
@@ -101,15 +129,20 @@ class FieldExtractor:
                 field.examples.append(truncated)
                 
         # 收集唯一值（仅基本类型）
-        if isinstance(value, (str, int, float, bool)) and len(field.unique_values) < 50:
+        if isinstance(value, (str, int, float, bool)) and len(field.unique_values) < MAX_UNIQUE_VALUES:
             field.unique_values.add(value)
             
         # 检查是否为枚举
-        if (field.count >= 5 and 
-            len(field.unique_values) <= min(50, field.count * 0.8) and
-            field.data_type in ["string", "integer", "boolean"]):
+        if self._is_enum_candidate(field.count, len(field.unique_values), field.data_type):
             field.is_enum = True
             field.enum_values = sorted(list(field.unique_values))
+    
+    @staticmethod
+    def _is_enum_candidate(count: int, unique_count: int, data_type: str) -> bool:
+        """出现次数足够多、取值足够集中的字符串/整数/布尔字段视为枚举"""
+        return (count >= 5 and
+                unique_count <= min(MAX_UNIQUE_VALUES, count * 0.8) and
+                data_type in ["string", "integer", "boolean"])
             
     def _get_type(self, value: Any) -> str:
         """获取数据类型"""
@@ -224,29 +257,90 @@ class FieldExtractor:
             
         self.logger.info(f"合并了 {merged_count} 个重复字段")
         
-    def process_scan_result(self, scan_result_file: str) -> int:
-        """基于T06扫描结果处理文件"""
-        self.logger.info(f"加载扫描结果: {scan_result_file}")
+    def merge_partial(self, segment: Dict[str, Any]) -> None:
+        """
+        按文件顺序折叠一个文件的部分聚合，结果与依次处理这些文件完全相同
         
-        with open(scan_result_file, 'r', encoding='utf-8') as f:
-            scan_data = json.load(f)
+        计数相加；数据类型按 _merge_types 合并；示例值与唯一值在已有值之后按首次出现顺序补足；
+        枚举判定按该文件的判定轨迹，在已有状态之上重放。
+        """
+        self.total_records += segment["records"]
+        self.total_files += 1
         
-        processed = 0
-        file_details = scan_data.get("file_details", [])
+        for path, partial in segment["fields"].items():
+            other = partial.info
+            field = self.fields.get(path)
+            if field is None:
+                field = self.fields[path] = FieldInfo(path=path, data_type="null", examples=[], unique_values=set())
+            
+            # 前 k 个不同值中，有多少个是此前未出现过的
+            new_before = [0]
+            for value in partial.values:
+                new_before.append(new_before[-1] + (value not in field.unique_values))
+            
+            enum_seen = None
+            for count, seen, data_type in partial.steps:
+                unique_count = min(MAX_UNIQUE_VALUES, len(field.unique_values) + new_before[seen])
+                if self._is_enum_candidate(field.count + count, unique_count,
+                                           self._merge_types(field.data_type, data_type)):
+                    enum_seen = seen
+            
+            if enum_seen is not None:
+                enum_values = set(field.unique_values)
+                for value in partial.values[:enum_seen]:
+                    if len(enum_values) < MAX_UNIQUE_VALUES:
+                        enum_values.add(value)
+                field.is_enum = True
+                field.enum_values = sorted(list(enum_values))
+            
+            field.count += other.count
+            field.null_count += other.null_count
+            field.data_type = self._merge_types(field.data_type, other.data_type)
+            
+            for example in other.examples:
+                if len(field.examples) >= self.max_examples:
+                    break
+                if example not in field.examples:
+                    field.examples.append(example)
+            
+            for value in partial.values:
+                if len(field.unique_values) >= MAX_UNIQUE_VALUES:
+                    break
+                field.unique_values.add(value)
+    
+    def process_scan_result(self, scan_result: Union[str, ScanResult],
+                            checkpoint: Optional[Checkpointer] = None) -> int:
+        """基于T06扫描结果处理文件（可传入扫描清单路径或已加载的ScanResult），可选按检查点续跑"""
+        if isinstance(scan_result, str):
+            self.logger.info(f"加载扫描结果: {scan_result}")
+            scan_result = load_scan_result(scan_result)
+        
+        file_details = scan_result.files
+        done_files = dict(checkpoint.restore(self, file_details)) if checkpoint else {}
+        processed = sum(info["records"] for info in done_files.values())
         
         self.logger.info(f"开始处理 {len(file_details)} 个文件...")
+        progress = ProgressReporter("T01", scan_result.total_records, scan_result.total_size)
         
-        for file_info in file_details:
-            file_path = file_info["path"]
-            file_type = file_info["file_type"]
-            
-            count = self._process_file(file_path, file_type)
-            processed += count
-            self.total_files += 1
-            
-            if self.total_files % 50 == 0:
-                self.logger.info(f"已处理 {self.total_files} 个文件, {processed:,} 条记录")
+        with prefetching([f for f in file_details if f.path not in done_files]):
+            for file_info in file_details:
+                if file_info.path in done_files:  # 检查点中已处理
+                    progress.advance(done_files[file_info.path]["records"], file_info.size, file_info.path)
+                    continue
+                
+                count = self._process_file(file_info.path, file_info.file_type)
+                processed += count
+                self.total_files += 1
+                progress.advance(count, file_info.size, file_info.path)
+                if checkpoint:
+                    checkpoint.file_done(self, file_info, count)
+                
+                if self.total_files % 50 == 0:
+                    self.logger.info(f"已处理 {self.total_files} 个文件, {processed:,} 条记录")
         
+        progress.finish()
+        if checkpoint:
+            checkpoint.save(self)
         return processed
         
     def _process_file(self, file_path: str, file_type: str) -> int:
@@ -255,24 +349,16 @@ class FieldExtractor:
         
         try:
             if file_type == "jsonl":
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line_no, line in enumerate(f, 1):
-                        line = line.strip()
-                        if not line:
-                            continue
-                            
-                        try:
-                            record = json.loads(line)
-                            self.extract_from_record(record)
-                            processed += 1
-                        except json.JSONDecodeError:
-                            continue
-                            
+                records, error = read_jsonl_records(file_path)
+                for record in records:
+                    self.extract_from_record(record)
+                    processed += 1
+                if error is not None:
+                    raise error
+                    
             else:  # json
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.extract_from_record(data)
-                    processed = 1
+                self.extract_from_record(read_json_file(file_path))
+                processed = 1
                     
         except Exception as e:
             self.logger.warning(f"文件处理错误 {file_path}: {e}")
@@ -296,8 +382,108 @@ class FieldExtractor:
         )
 
 
-def generate_field_outputs(result: AnalysisResult, output_dir: Path):
-    """生成字段分析输出"""
+class PartialFieldExtractor(FieldExtractor):
+    """在 FieldExtractor 的基础上记录合并所需的唯一值顺序与枚举判定轨迹（分片执行时逐文件使用）"""
+    
+    def __init__(self):
+        super().__init__()
+        self.values: Dict[str, Dict[Any, None]] = {}
+        self.steps: Dict[str, List[Tuple[int, int, str]]] = {}
+        
+    def _add_field(self, path: str, value: Any) -> None:
+        super()._add_field(path, value)
+        if value is None:
+            return
+        
+        values = self.values.setdefault(path, {})
+        if (isinstance(value, (str, int, float, bool)) and len(values) < 2 * MAX_UNIQUE_VALUES
+                and value not in values):
+            values[value] = None
+        
+        field = self.fields[path]
+        steps = self.steps.setdefault(path, [])
+        if steps and steps[-1][1:] == (len(values), field.data_type):
+            steps[-1] = (field.count, len(values), field.data_type)
+        else:
+            steps.append((field.count, len(values), field.data_type))
+            
+    def get_partial(self) -> Dict[str, Any]:
+        """当前文件的部分聚合"""
+        return {
+            "records": self.total_records,
+            "fields": {
+                path: FieldPartial(info=field, values=list(self.values.get(path, {})),
+                                   steps=self.steps.get(path, []))
+                for path, field in self.fields.items()
+            }
+        }
+
+
+def extract_field_partials(scan_result: ScanResult) -> Dict[str, Any]:
+    """逐文件提取字段的部分聚合 (文件路径 -> 部分聚合)"""
+    progress = ProgressReporter("T01", scan_result.total_records, scan_result.total_size)
+    segments = {}
+    with prefetching(scan_result.files):
+        for file_info in scan_result.files:
+            extractor = PartialFieldExtractor()
+            count = extractor._process_file(file_info.path, file_info.file_type)
+            segments[file_info.path] = extractor.get_partial()
+            progress.advance(count, file_info.size, file_info.path)
+    progress.finish()
+    return segments
+
+
+class FieldFold(IncrementalFold):
+    """增量模式下的T01折叠方式：每个会话文件保存一个 PartialFieldExtractor"""
+    
+    def new_state(self, file_info: SessionFile) -> PartialFieldExtractor:
+        return PartialFieldExtractor()
+        
+    def fold(self, state: PartialFieldExtractor, records: List[Any]) -> None:
+        for record in records:
+            state.extract_from_record(record)
+            
+    def segment(self, state: PartialFieldExtractor, file_info: SessionFile) -> Dict[str, Any]:
+        return state.get_partial()
+        
+    def full_segment(self, file_info: SessionFile) -> Dict[str, Any]:
+        extractor = PartialFieldExtractor()
+        extractor._process_file(file_info.path, file_info.file_type)
+        return extractor.get_partial()
+
+
+class FieldExtractionVisitor(FileBasedAnalyzer):
+    """单次遍历语料时的T01访问者：把共享读取的记录交给 FieldExtractor"""
+    
+    def __init__(self, output_dir: Union[str, Path] = "outputs"):
+        super().__init__("T01 深度字段提取", output_dir=str(output_dir))
+        self.extractor = FieldExtractor()
+        
+    def process_record(self, record: Dict[str, Any]) -> None:
+        self.extractor.extract_from_record(record)
+        
+    def end_file(self, file_info: SessionFile, error: Optional[Exception] = None) -> None:
+        if error is not None:
+            self.extractor.logger.warning(f"文件处理错误 {file_info.path}: {error}")
+        self.extractor.total_files += 1
+        
+    def analyze(self, scan_result: ScanResult) -> Dict[str, Any]:
+        """单独读取一遍语料，返回字段分析输出（文件名 -> 内容）"""
+        CorpusReader([self]).read(scan_result, ProgressReporter("T01", scan_result.total_records, scan_result.total_size))
+        return build_field_outputs(self.extractor.get_result())
+        
+    def get_output_paths(self) -> Dict[str, str]:
+        return {name: str(self.output_dir / name)
+                for name in ("deduplicated_fields.json", "field_analysis_detailed.json")}
+
+
+def create_corpus_visitor(output_dir: Path) -> FieldExtractionVisitor:
+    """调度器单次遍历模式使用的访问者"""
+    return FieldExtractionVisitor(output_dir)
+
+
+def build_field_outputs(result: AnalysisResult) -> Dict[str, Any]:
+    """构建字段分析输出（文件名 -> 内容）"""
     
     # 1. 生成去重字段清单
     merged_count = sum(1 for field in result.fields.values() if '[*]' in field.path)
@@ -336,11 +522,6 @@ def generate_field_outputs(result: AnalysisResult, output_dir: Path):
             
         deduplicated_output["字段清单"][field_path] = example_value
         
-    # 保存去重字段清单
-    dedupe_file = output_dir / "deduplicated_fields.json"
-    with open(dedupe_file, 'w', encoding='utf-8') as f:
-        json.dump(deduplicated_output, f, indent=2, ensure_ascii=False)
-    
     # 2. 生成详细字段分析
     detailed_output = {
         "生成时间": datetime.now().isoformat(),
@@ -366,42 +547,59 @@ def generate_field_outputs(result: AnalysisResult, output_dir: Path):
         }
         detailed_output["字段详情"].append(field_detail)
     
-    # 保存详细分析
-    detailed_file = output_dir / "field_analysis_detailed.json"
-    with open(detailed_file, 'w', encoding='utf-8') as f:
-        json.dump(detailed_output, f, indent=2, ensure_ascii=False)
-    
-    return [dedupe_file, detailed_file]
+    return {
+        "deduplicated_fields.json": deduplicated_output,
+        "field_analysis_detailed.json": detailed_output
+    }
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python field_extractor.py <output_dir>")
-        sys.exit(1)
-    
-    output_dir = Path(sys.argv[1])
+def generate_field_outputs(result: AnalysisResult, output_dir: Path):
+    """生成字段分析输出"""
+    return save_json_outputs(build_field_outputs(result), output_dir)
+
+
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行字段提取任务，返回供下游任务在进程内复用的输出"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     print("🔍 T01: 深度字段提取分析任务")
     print("=" * 50)
     
-    # 查找T06的扫描结果
-    scan_result_file = output_dir.parent / "T06_data_scan" / "scan_results.json"
-    if not scan_result_file.exists():
-        print(f"❌ 依赖文件不存在: {scan_result_file}")
-        print("   请先执行 T06 数据源扫描任务")
-        sys.exit(1)
+    # 获取T06的扫描结果
+    scan_result = resolve_scan_result(output_dir, context)
     
-    # 执行字段提取
+    # 分片模式：只处理本分片的文件并保存部分聚合
+    if requested_shard():
+        run_shard(output_dir, "T01", scan_result, extract_field_partials)
+        return {}
+    
+    # 执行字段提取（合并模式下折叠各分片的部分聚合；增量模式下折叠各文件接续上次状态的部分聚合；
+    # 单次遍历模式下调度器已读取全部语料；多进程时折叠各工作进程生成的部分聚合）
     extractor = FieldExtractor()
-    processed_records = extractor.process_scan_result(str(scan_result_file))
+    checkpoint = Checkpointer(output_dir, "T01", ("fields", "total_records", "total_files"))
+    visitor = take_corpus_visitor(context, "T01")
+    if requested_merge():
+        for _, segment in load_shard_segments(output_dir, "T01", scan_result):
+            extractor.merge_partial(segment)
+    elif requested_incremental():
+        for _, segment in update_incremental(output_dir, scan_result, FieldFold()):
+            extractor.merge_partial(segment)
+    elif visitor is not None:
+        extractor = visitor.extractor
+    elif requested_workers() > 1:
+        for _, segment in parallel_segments(scan_result, FieldFold(), "T01"):
+            extractor.merge_partial(segment)
+    else:
+        extractor.process_scan_result(scan_result, checkpoint)
     
     # 获取分析结果
     result = extractor.get_result()
     
     # 生成输出文件
-    output_files = generate_field_outputs(result, output_dir)
+    outputs = build_field_outputs(result)
+    output_files = save_json_outputs(outputs, output_dir)
+    checkpoint.clear()
     
     print(f"\\n✅ T01 任务完成")
     print(f"📊 提取结果:")
@@ -413,6 +611,22 @@ def main():
     print(f"\\n📁 输出文件:")
     for output_file in output_files:
         print(f"   {output_file}")
+    
+    return outputs
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python field_extractor.py <output_dir>")
+        sys.exit(1)
+    
+    try:
+        execute(Path(sys.argv[1]))
+    except MissingDependencyError as e:
+        print(f"❌ 依赖文件不存在: {e.filename}")
+        print("   请先执行 T06 数据源扫描任务")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -6,10 +6,9 @@ T02: 消息结构类型分析任务
 
 import sys
 import os
-import json
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Set, Any, Tuple, Union
+from typing import Dict, List, Set, Any, Tuple, Union, Optional
 from collections import defaultdict, Counter
 from dataclasses import dataclass, field
 
@@ -18,7 +17,24 @@ current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.utils import setup_logging
+from shared.models import ScanResult, SessionFile
+from shared.base_analyzer import FileBasedAnalyzer
+from shared.corpus import CorpusReader, take_corpus_visitor
+from shared.manifest import load_scan_result, resolve_scan_result
+from shared.progress import ProgressReporter
+from shared.checkpoint import Checkpointer
+from shared.stream import StreamWriter, SESSION_TYPES_STREAM, type_digest
+from shared.record_cache import read_jsonl_records
+from shared.json_backend import read_json_file
+from shared.prefetch import prefetching
+from shared.sharding import requested_shard, requested_merge, run_shard, load_shard_segments
+from shared.parallel import requested_workers, parallel_segments
+from shared.incremental import IncrementalFold, requested_incremental, update_incremental
+from shared.utils import setup_logging, save_json_outputs, MissingDependencyError
+
+
+# 示例对象中字符串值的截断长度；按结构读取会话文件时超长字符串值只需保留比这多一个字符
+EXAMPLE_VALUE_LENGTH = 100
 
 
 @dataclass
@@ -43,9 +59,10 @@ class ObjectTypeAnalyzer:
         self.object_types: Dict[str, ObjectType] = {}
         self.total_objects = 0
         self.total_files = 0
+        self.file_types: Optional[Set[str]] = None  # 当前文件出现的类型，仅在发布流时收集
         self.logger = setup_logging("T02_TypeAnalyzer")
         
-    def truncate_value(self, value: Any, max_length: int = 100) -> Any:
+    def truncate_value(self, value: Any, max_length: int = EXAMPLE_VALUE_LENGTH) -> Any:
         """递归截断最深层的值，保持嵌套结构完整"""
         if isinstance(value, str) and len(value) > max_length:
             return value[:max_length] + "..."
@@ -59,7 +76,7 @@ class ObjectTypeAnalyzer:
             # 其他类型（int, float, bool, None等）直接返回
             return value
     
-    def truncate_example_object(self, obj: Dict[str, Any], max_length: int = 100) -> Dict[str, Any]:
+    def truncate_example_object(self, obj: Dict[str, Any], max_length: int = EXAMPLE_VALUE_LENGTH) -> Dict[str, Any]:
         """截断示例对象中的长值"""
         return {k: self.truncate_value(v, max_length) for k, v in obj.items()}
 
@@ -120,6 +137,9 @@ class ObjectTypeAnalyzer:
         # 添加到对应类型
         self.object_types[structure_signature].add_example(obj, self.max_examples)
         
+        if self.file_types is not None:
+            self.file_types.add(structure_signature)
+        
     def analyze_record(self, record: Dict[str, Any]) -> None:
         """递归分析记录中的所有对象"""
         self._analyze_recursive(record)
@@ -142,29 +162,72 @@ class ObjectTypeAnalyzer:
             for item in value:
                 self._analyze_recursive(item, depth - 1)
                 
-    def process_scan_result(self, scan_result_file: str) -> int:
-        """基于T06扫描结果处理文件"""
-        self.logger.info(f"加载扫描结果: {scan_result_file}")
+    def merge_partial(self, segment: Dict[str, Any]) -> None:
+        """
+        按文件顺序折叠一个文件的部分聚合，结果与依次处理这些文件完全相同
         
-        with open(scan_result_file, 'r', encoding='utf-8') as f:
-            scan_data = json.load(f)
+        类型按首次出现的顺序加入；出现次数相加；示例在已有示例之后补足到 max_examples 个。
+        """
+        self.total_objects += segment["objects"]
+        self.total_files += 1
         
-        processed = 0
-        file_details = scan_data.get("file_details", [])
+        for signature, other in segment["object_types"].items():
+            obj_type = self.object_types.get(signature)
+            if obj_type is None:
+                obj_type = self.object_types[signature] = ObjectType(structure_signature=signature)
+            obj_type.count += other.count
+            obj_type.examples.extend(other.examples[:self.max_examples - len(obj_type.examples)])
+    
+    def process_scan_result(self, scan_result: Union[str, ScanResult],
+                            checkpoint: Optional[Checkpointer] = None,
+                            stream: Optional[StreamWriter] = None) -> int:
+        """
+        基于T06扫描结果处理文件（可传入扫描清单路径或已加载的ScanResult）
+        
+        可选按检查点续跑；传入 stream 时每处理完一个Session文件就发布其类型集合，供T03边读边处理
+        """
+        if isinstance(scan_result, str):
+            self.logger.info(f"加载扫描结果: {scan_result}")
+            scan_result = load_scan_result(scan_result)
+        
+        file_details = scan_result.files
+        done_files = dict(checkpoint.restore(self, file_details)) if checkpoint else {}
+        processed = sum(info["records"] for info in done_files.values())
         
         self.logger.info(f"开始分析 {len(file_details)} 个文件...")
+        progress = ProgressReporter("T02", scan_result.total_records, scan_result.total_size)
         
-        for file_info in file_details:
-            file_path = file_info["path"]
-            file_type = file_info["file_type"]
+        with prefetching([f for f in file_details if f.path not in done_files]):
+            for file_info in file_details:
+                if file_info.path in done_files:  # 检查点中已处理
+                    progress.advance(done_files[file_info.path]["records"], file_info.size, file_info.path)
+                    continue
             
-            count = self._process_file(file_path, file_type)
-            processed += count
-            self.total_files += 1
+                if stream and file_info.file_type == "jsonl":
+                    self.file_types = set()
             
-            if self.total_files % 50 == 0:
-                self.logger.info(f"已分析 {self.total_files} 个文件, {processed:,} 条记录")
+                count = self._process_file(file_info.path, file_info.file_type)
+                processed += count
+                self.total_files += 1
+                progress.advance(count, file_info.size, file_info.path)
+            
+                if stream and self.file_types is not None:
+                    stream.publish({
+                        "session_id": file_info.session_id,
+                        "path": file_info.path,
+                        "size": file_info.size,
+                        "types": sorted(type_digest(signature) for signature in self.file_types)
+                    })
+                self.file_types = None
+                if checkpoint:
+                    checkpoint.file_done(self, file_info, count)
+            
+                if self.total_files % 50 == 0:
+                    self.logger.info(f"已分析 {self.total_files} 个文件, {processed:,} 条记录")
         
+        progress.finish()
+        if checkpoint:
+            checkpoint.save(self)
         return processed
         
     def _process_file(self, file_path: str, file_type: str) -> int:
@@ -173,31 +236,23 @@ class ObjectTypeAnalyzer:
         
         try:
             if file_type == "jsonl":
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line_no, line in enumerate(f, 1):
-                        line = line.strip()
-                        if not line:
-                            continue
-                            
-                        try:
-                            record = json.loads(line)
-                            self.analyze_record(record)
-                            processed += 1
-                            
-                            if processed % 1000 == 0:
-                                self.logger.info(f"    已分析 {processed} 条记录...")
-                                
-                        except json.JSONDecodeError:
-                            continue
-                            
+                records, error = read_jsonl_records(file_path, string_prefix=EXAMPLE_VALUE_LENGTH + 1)
+                for record in records:
+                    self.analyze_record(record)
+                    processed += 1
+                    
+                    if processed % 1000 == 0:
+                        self.logger.info(f"    已分析 {processed} 条记录...")
+                if error is not None:
+                    raise error
+                    
             else:  # json
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.analyze_record(data)
-                    processed = 1
+                self.analyze_record(read_json_file(file_path))
+                processed = 1
                     
         except Exception as e:
             self.logger.warning(f"文件处理错误 {file_path}: {e}")
+            self.file_types = None  # 与T03一致：读取出错的文件不发布类型
             
         return processed
         
@@ -356,28 +411,166 @@ class ObjectTypeAnalyzer:
         return summary
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python type_analyzer.py <output_dir>")
-        sys.exit(1)
+def analyze_type_partials(scan_result: ScanResult) -> Dict[str, Any]:
+    """
+    逐文件分析类型的部分聚合 (文件路径 -> 部分聚合)
+    
+    会话文件同时记录其类型摘要集合（读取出错时为 None），合并时据此发布供T03使用的类型流。
+    """
+    progress = ProgressReporter("T02", scan_result.total_records, scan_result.total_size)
+    segments = {}
+    with prefetching(scan_result.files):
+        for file_info in scan_result.files:
+            analyzer = ObjectTypeAnalyzer()
+            if file_info.file_type == "jsonl":
+                analyzer.file_types = set()
+            count = analyzer._process_file(file_info.path, file_info.file_type)
+            segments[file_info.path] = _type_segment(analyzer, count)
+            progress.advance(count, file_info.size, file_info.path)
+    progress.finish()
+    return segments
+
+
+def _type_segment(analyzer: ObjectTypeAnalyzer, count: int) -> Dict[str, Any]:
+    """单个文件的部分聚合"""
+    return {
+        "records": count,
+        "objects": analyzer.total_objects,
+        "object_types": analyzer.object_types,
+        "types": sorted(type_digest(signature) for signature in analyzer.file_types)
+                 if analyzer.file_types is not None else None
+    }
+
+
+class TypeFold(IncrementalFold):
+    """增量模式与多进程时的T02折叠方式：每个会话文件（或其中一段）保存一个收集类型集合的 ObjectTypeAnalyzer 与已处理记录数"""
+    
+    splittable = True
+    
+    def new_state(self, file_info: SessionFile) -> Dict[str, Any]:
+        analyzer = ObjectTypeAnalyzer()
+        analyzer.file_types = set()
+        return {"analyzer": analyzer, "records": 0}
+        
+    def fold(self, state: Dict[str, Any], records: List[Any]) -> None:
+        for record in records:
+            state["analyzer"].analyze_record(record)
+            state["records"] += 1
+            
+    def merge_states(self, state: Dict[str, Any], later: Dict[str, Any]) -> Dict[str, Any]:
+        analyzer, other = state["analyzer"], later["analyzer"]
+        analyzer.merge_partial(_type_segment(other, later["records"]))
+        analyzer.file_types |= other.file_types
+        state["records"] += later["records"]
+        return state
+        
+    def segment(self, state: Dict[str, Any], file_info: SessionFile) -> Dict[str, Any]:
+        return _type_segment(state["analyzer"], state["records"])
+        
+    def full_segment(self, file_info: SessionFile) -> Dict[str, Any]:
+        analyzer = ObjectTypeAnalyzer()
+        if file_info.file_type == "jsonl":
+            analyzer.file_types = set()
+        count = analyzer._process_file(file_info.path, file_info.file_type)
+        return _type_segment(analyzer, count)
+
+
+class TypeAnalysisVisitor(FileBasedAnalyzer):
+    """
+    单次遍历语料时的T02访问者：把共享读取的记录交给 ObjectTypeAnalyzer，
+    并按文件顺序收集各Session文件的类型摘要集合，T02 执行时写入类型流
+    """
     
-    output_dir = Path(sys.argv[1])
+    def __init__(self, output_dir: Union[str, Path] = "outputs"):
+        super().__init__("T02 消息结构类型分析", output_dir=str(output_dir))
+        self.analyzer = ObjectTypeAnalyzer()
+        self.published: List[Dict[str, Any]] = []
+        
+    def begin_file(self, file_info: SessionFile) -> None:
+        if file_info.file_type == "jsonl":
+            self.analyzer.file_types = set()
+        
+    def process_record(self, record: Dict[str, Any]) -> None:
+        self.analyzer.analyze_record(record)
+        
+    def end_file(self, file_info: SessionFile, error: Optional[Exception] = None) -> None:
+        if error is not None:
+            self.analyzer.logger.warning(f"文件处理错误 {file_info.path}: {error}")
+            self.analyzer.file_types = None  # 与T03一致：读取出错的文件不发布类型
+        self.analyzer.total_files += 1
+        
+        if self.analyzer.file_types is not None:
+            self.published.append({
+                "session_id": file_info.session_id,
+                "path": file_info.path,
+                "size": file_info.size,
+                "types": sorted(type_digest(signature) for signature in self.analyzer.file_types)
+            })
+        self.analyzer.file_types = None
+        
+    def analyze(self, scan_result: ScanResult) -> Dict[str, Any]:
+        """单独读取一遍语料，返回类型摘要"""
+        CorpusReader([self]).read(scan_result, ProgressReporter("T02", scan_result.total_records, scan_result.total_size))
+        return self.analyzer.get_type_summary()
+        
+    def get_output_paths(self) -> Dict[str, str]:
+        return {name: str(self.output_dir / name)
+                for name in ("object_types_detail.json", "object_types_compact.json", "object_types_summary.json")}
+
+
+def create_corpus_visitor(output_dir: Path) -> TypeAnalysisVisitor:
+    """调度器单次遍历模式使用的访问者"""
+    return TypeAnalysisVisitor(output_dir)
+
+
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行类型分析任务，返回供下游任务在进程内复用的输出"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     print("🏗️ T02: 消息结构类型分析任务")
     print("=" * 50)
     
-    # 查找T06的扫描结果
-    scan_result_file = output_dir.parent / "T06_data_scan" / "scan_results.json"
-    if not scan_result_file.exists():
-        print(f"❌ 依赖文件不存在: {scan_result_file}")
-        print("   请先执行 T06 数据源扫描任务")
-        sys.exit(1)
+    # 获取T06的扫描结果
+    scan_result = resolve_scan_result(output_dir, context)
     
-    # 执行类型分析
+    # 分片模式：只处理本分片的文件并保存部分聚合
+    if requested_shard():
+        run_shard(output_dir, "T02", scan_result, analyze_type_partials)
+        return {}
+    
+    # 执行类型分析（合并模式、增量模式与多进程时折叠各文件的部分聚合，并按文件顺序发布类型流；
+    # 单次遍历模式下调度器已读取全部语料）
     analyzer = ObjectTypeAnalyzer()
-    processed_records = analyzer.process_scan_result(str(scan_result_file))
+    checkpoint = Checkpointer(output_dir, "T02", ("object_types", "total_objects", "total_files"))
+    stream = StreamWriter(output_dir / SESSION_TYPES_STREAM, "T02")
+    visitor = take_corpus_visitor(context, "T02")
+    if requested_merge() or requested_incremental() or (visitor is None and requested_workers() > 1):
+        if requested_merge():
+            segments = load_shard_segments(output_dir, "T02", scan_result)
+        elif requested_incremental():
+            segments = update_incremental(output_dir, scan_result, TypeFold())
+        else:
+            segments = parallel_segments(scan_result, TypeFold(), "T02")
+        processed_records = 0
+        for file_info, segment in segments:
+            analyzer.merge_partial(segment)
+            processed_records += segment["records"]
+            if segment["types"] is not None:
+                stream.publish({
+                    "session_id": file_info.session_id,
+                    "path": file_info.path,
+                    "size": file_info.size,
+                    "types": segment["types"]
+                })
+    elif visitor is not None:
+        analyzer = visitor.analyzer
+        processed_records = visitor.processed_records
+        for item in visitor.published:
+            stream.publish(item)
+    else:
+        processed_records = analyzer.process_scan_result(scan_result, checkpoint, stream)
+    stream.close()  # 类型集合已全部发布，T03 无需等待下面的结果文件写完
     
     print(f"\\n✅ 类型分析完成！")
     print(f"   处理文件: {analyzer.total_files}")
@@ -389,28 +582,23 @@ def main():
     print(f"\\n📋 生成详细类型分析（值已截断）...")
     results = analyzer.get_results()
     
-    detail_file = output_dir / "object_types_detail.json"
-    with open(detail_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    detail_file = save_json_outputs({"object_types_detail.json": results}, output_dir)[0]
     print(f"   详细结果: {detail_file}")
     
     # 生成紧凑结果（每种类型只保留一个示例）
     print(f"\\n📋 生成紧凑版类型分析...")
     compact_results = analyzer.get_compact_results()
     
-    compact_file = output_dir / "object_types_compact.json"
-    with open(compact_file, 'w', encoding='utf-8') as f:
-        json.dump(compact_results, f, ensure_ascii=False, indent=2)
+    compact_file = save_json_outputs({"object_types_compact.json": compact_results}, output_dir)[0]
     print(f"   紧凑结果: {compact_file}")
     
     # 生成摘要结果
     print(f"\\n📊 生成类型摘要...")
     summary = analyzer.get_type_summary()
     
-    summary_file = output_dir / "object_types_summary.json"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+    summary_file = save_json_outputs({"object_types_summary.json": summary}, output_dir)[0]
     print(f"   摘要结果: {summary_file}")
+    checkpoint.clear()
     
     # 显示热门类型
     print(f"\\n🔥 热门对象类型 (Top 10):")
@@ -428,6 +616,26 @@ def main():
         print(f"   复杂度{complexity:2d}: {type_count:4d}种类型")
     
     print(f"\\n🎉 T02任务完成！结果文件保存在 {output_dir} 目录")
+    
+    return {
+        "object_types_detail.json": results,
+        "object_types_compact.json": compact_results,
+        "object_types_summary.json": summary
+    }
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python type_analyzer.py <output_dir>")
+        sys.exit(1)
+    
+    try:
+        execute(Path(sys.argv[1]))
+    except MissingDependencyError as e:
+        print(f"❌ 依赖文件不存在: {e.filename}")
+        print("   请先执行 T06 数据源扫描任务")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -6,19 +6,26 @@ T03: 最小集合覆盖分析任务
 
 import sys
 import os
-import json
 import shutil
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict, Counter
-from typing import Dict, Set, List, Tuple
+from typing import Dict, Set, List, Tuple, Any, Optional, Union
 
 # 添加项目根目录到路径
 current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.utils import setup_logging
+from shared.models import ScanResult
+from shared.manifest import load_scan_result, resolve_scan_result
+from shared.progress import ProgressReporter
+from shared.record_cache import read_jsonl_records
+from shared.prefetch import prefetching
+from shared.compressed import is_compressed, open_binary
+from shared.compaction import is_compact, expand_session
+from shared.stream import follow_stream, type_digest, SESSION_TYPES_STREAM_RELPATH
+from shared.utils import setup_logging, save_json_outputs, MissingDependencyError
 
 
 class MinimalSessionCoverAnalyzer:
@@ -31,54 +38,73 @@ class MinimalSessionCoverAnalyzer:
         self.session_info: Dict[str, dict] = {}
         self.logger = setup_logging("T03_SetCover")
         
-    def analyze_session_types(self, scan_result_file: str, max_sessions: int = None) -> None:
-        """分析每个session包含的数据类型"""
+    def analyze_session_types(self, scan_result: Union[str, ScanResult], max_sessions: int = None,
+                              type_stream: Optional[Path] = None) -> None:
+        """
+        分析每个session包含的数据类型（可传入扫描清单路径或已加载的ScanResult）
+        
+        传入 type_stream 时优先使用T02发布的类型流（T02仍在运行时边读边等），
+        流中缺失或文件大小已变化的Session再自行解析
+        """
         
         self.logger.info("开始分析每个Session的数据类型...")
         
         # 加载扫描结果
-        with open(scan_result_file, 'r', encoding='utf-8') as f:
-            scan_data = json.load(f)
+        if isinstance(scan_result, str):
+            scan_result = load_scan_result(scan_result)
         
         # 只分析JSONL文件（项目会话）
-        session_files = [f for f in scan_data["file_details"] if f["file_type"] == "jsonl"]
+        session_files = [f for f in scan_result.files if f.file_type == "jsonl"]
         
         if max_sessions:
             session_files = session_files[:max_sessions]
             self.logger.info(f"限制分析前 {max_sessions} 个Session")
         
         self.logger.info(f"找到 {len(session_files)} 个Session文件")
+        progress = ProgressReporter("T03", sum(f.records for f in session_files), sum(f.size for f in session_files))
+        
+        published = self._collect_published_types(type_stream, session_files, progress) if type_stream else {}
         
         processed = 0
-        for i, session_file in enumerate(session_files, 1):
-            if i % 10 == 0:
-                self.logger.info(f"进度: {i}/{len(session_files)} ({processed} 个已处理)")
-            
-            session_id = session_file["session_id"]
-            
-            # 为每个session创建独立的类型分析器
-            session_type_set = self._analyze_session_file(session_file["path"])
-            
-            if session_type_set:  # 只记录有类型的session
-                self.session_types[session_id] = session_type_set
-                self.all_types.update(session_type_set)
+        reused = 0
+        with prefetching([f for f in session_files if f.path not in published]):
+            for i, session_file in enumerate(session_files, 1):
+                if i % 10 == 0:
+                    self.logger.info(f"进度: {i}/{len(session_files)} ({processed} 个已处理)")
                 
-                # 更新反向索引
-                for type_sig in session_type_set:
-                    self.type_sessions[type_sig].add(session_id)
+                session_id = session_file.session_id
                 
-                # 记录session基本信息
-                self.session_info[session_id] = {
-                    'file_path': session_file["path"],
-                    'project': session_file["project"],
-                    'records': session_file["records"],
-                    'size': session_file["size"],
-                    'modified': session_file["modified"],
-                    'type_count': len(session_type_set)
-                }
-                processed += 1
+                if session_file.path in published:
+                    session_type_set = published[session_file.path]
+                    reused += 1
+                else:
+                    # 为每个session创建独立的类型分析器
+                    session_type_set = self._analyze_session_file(session_file.path)
+                    progress.advance(session_file.records, session_file.size, session_file.path)
+                
+                if session_type_set:  # 只记录有类型的session
+                    self.session_types[session_id] = session_type_set
+                    self.all_types.update(session_type_set)
+                    
+                    # 更新反向索引
+                    for type_sig in session_type_set:
+                        self.type_sessions[type_sig].add(session_id)
+                    
+                    # 记录session基本信息
+                    self.session_info[session_id] = {
+                        'file_path': session_file.path,
+                        'project': session_file.project,
+                        'records': session_file.records,
+                        'size': session_file.size,
+                        'modified': session_file.modified.isoformat(),
+                        'type_count': len(session_type_set)
+                    }
+                    processed += 1
         
+        progress.finish()
         self.logger.info(f"分析完成!")
+        if type_stream:
+            self.logger.info(f"复用T02类型流: {reused} 个Session, 自行解析: {len(session_files) - reused} 个")
         self.logger.info(f"有效Session: {len(self.session_types)}")
         self.logger.info(f"发现类型总数: {len(self.all_types)}")
         self.logger.info(f"平均每Session类型数: {sum(len(types) for types in self.session_types.values()) / len(self.session_types):.1f}")
@@ -90,22 +116,32 @@ class MinimalSessionCoverAnalyzer:
         analyzer = ObjectTypeAnalyzer()
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        record = json.loads(line)
-                        analyzer.analyze_record(record)
-                    except json.JSONDecodeError:
-                        continue
+            records, error = read_jsonl_records(file_path, string_prefix=0)  # 只需结构签名
+            if error is not None:
+                raise error
+            for record in records:
+                analyzer.analyze_record(record)
         except Exception as e:
             self.logger.warning(f"分析文件错误 {file_path}: {e}")
             return set()
         
-        return set(analyzer.object_types.keys())
+        return {type_digest(signature) for signature in analyzer.object_types.keys()}
+    
+    def _collect_published_types(self, type_stream: Path, session_files: list,
+                                 progress: ProgressReporter) -> Dict[str, Set[str]]:
+        """跟随读取T02的类型流，返回 文件路径 -> 类型摘要集合（只保留大小与当前清单一致的文件）"""
+        self.logger.info(f"读取T02类型流: {type_stream}")
+        
+        expected = {f.path: f for f in session_files}
+        published = {}
+        for item in follow_stream(type_stream):
+            session_file = expected.get(item.get("path"))
+            if session_file is None or session_file.size != item.get("size"):
+                continue
+            published[session_file.path] = set(item.get("types", []))
+            progress.advance(session_file.records, session_file.size, session_file.path)
+        
+        return published
     
     def greedy_set_cover(self) -> List[str]:
         """贪心算法求解最小集合覆盖"""
@@ -235,8 +271,16 @@ class MinimalSessionCoverAnalyzer:
             target_name = f"session_{i:02d}_{session_id}.jsonl"
             target_path = session_dir / target_name
             
-            # 复制文件
-            shutil.copy2(source_path, target_path)
+            # 复制文件（压缩的会话文件解压、紧凑归档还原后保存）
+            if is_compressed(source_path):
+                with open_binary(source_path) as src, open(target_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                shutil.copystat(source_path, target_path)
+            elif is_compact(source_path):
+                expand_session(str(source_path), str(target_path))
+                shutil.copystat(source_path, target_path)
+            else:
+                shutil.copy2(source_path, target_path)
             
             self.logger.info(f"  项目: {session_info['project']}")
             self.logger.info(f"  类型数: {session_info['type_count']}")
@@ -246,37 +290,27 @@ class MinimalSessionCoverAnalyzer:
         self.logger.info(f"所有Session已提取到: {session_dir}")
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python set_cover_analyzer.py <output_dir> [max_sessions]")
-        sys.exit(1)
-    
-    output_dir = Path(sys.argv[1])
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None,
+            max_sessions: Optional[int] = None) -> Dict[str, Any]:
+    """执行集合覆盖任务，返回供下游任务在进程内复用的输出"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    max_sessions = None
-    if len(sys.argv) > 2 and sys.argv[2].isdigit():
-        max_sessions = int(sys.argv[2])
-    
     print("🧮 T03: 最小集合覆盖分析任务")
     print("=" * 50)
     
     if max_sessions:
         print(f"限制分析Session数: {max_sessions}")
     
-    # 查找T06的扫描结果
-    scan_result_file = output_dir.parent / "T06_data_scan" / "scan_results.json"
-    if not scan_result_file.exists():
-        print(f"❌ 依赖文件不存在: {scan_result_file}")
-        print("   请先执行 T06 数据源扫描任务")
-        sys.exit(1)
+    # 获取T06的扫描结果
+    scan_result = resolve_scan_result(output_dir, context)
     
     # 创建覆盖算法实例
     cover_algo = MinimalSessionCoverAnalyzer()
     
     # 分析每个session的类型
-    cover_algo.analyze_session_types(str(scan_result_file), max_sessions)
+    type_stream = output_dir.parent / SESSION_TYPES_STREAM_RELPATH
+    cover_algo.analyze_session_types(scan_result, max_sessions, type_stream if type_stream.exists() else None)
     
     # 执行贪心算法
     selected_sessions = cover_algo.greedy_set_cover()
@@ -285,9 +319,7 @@ def main():
     analysis = cover_algo.analyze_coverage_efficiency(selected_sessions)
     
     # 保存分析结果
-    analysis_file = output_dir / "coverage_analysis.json"
-    with open(analysis_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, ensure_ascii=False, indent=2)
+    analysis_file = save_json_outputs({"coverage_analysis.json": analysis}, output_dir)[0]
     
     # 打印摘要
     print(f"\\n📊 覆盖效率分析:")
@@ -309,6 +341,26 @@ def main():
     cover_algo.extract_selected_sessions(selected_sessions, output_dir)
     
     print(f"\\n🎉 T03任务完成! 分析报告已保存到: {analysis_file}")
+    
+    return {"coverage_analysis.json": analysis}
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python set_cover_analyzer.py <output_dir> [max_sessions]")
+        sys.exit(1)
+    
+    max_sessions = None
+    if len(sys.argv) > 2 and sys.argv[2].isdigit():
+        max_sessions = int(sys.argv[2])
+    
+    try:
+        execute(Path(sys.argv[1]), max_sessions=max_sessions)
+    except MissingDependencyError as e:
+        print(f"❌ 依赖文件不存在: {e.filename}")
+        print("   请先执行 T06 数据源扫描任务")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
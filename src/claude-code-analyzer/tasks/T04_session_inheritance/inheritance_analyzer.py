@@ -6,19 +6,43 @@ T04: Session ID继承机制分析任务
 
 import sys
 import os
-import json
 import re
 from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Dict, List, Set, Tuple, Optional, Any, Union
 
 # 添加项目根目录到路径
 current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.utils import setup_logging
+from shared.models import ScanResult, SessionFile
+from shared.base_analyzer import FileBasedAnalyzer
+from shared.corpus import CorpusReader, take_corpus_visitor
+from shared.manifest import load_scan_result, resolve_scan_result
+from shared.progress import ProgressReporter
+from shared.record_cache import read_jsonl_records
+from shared.prefetch import prefetching
+from shared.sharding import requested_shard, requested_merge, run_shard, load_shard_segments
+from shared.parallel import requested_workers, parallel_segments
+from shared.incremental import IncrementalFold, requested_incremental, update_incremental
+from shared.utils import setup_logging, save_json_outputs, MissingDependencyError
+
+
+def parse_record_timestamp(record: Any) -> Optional[datetime]:
+    """
+    记录的时间戳（统一处理为naive datetime），没有 timestamp 字段时为 None
+
+    Raises:
+        ValueError: 时间戳格式错误（该记录不计入session）
+    """
+    if 'timestamp' not in record:
+        return None
+    timestamp_str = record['timestamp'].replace('Z', '').replace('+00:00', '')
+    if '.' not in timestamp_str:
+        timestamp_str += '.000000'
+    return datetime.fromisoformat(timestamp_str)
 
 
 class SessionInheritanceAnalyzer:
@@ -26,81 +50,109 @@ class SessionInheritanceAnalyzer:
     
     def __init__(self):
         self.session_files: Dict[str, dict] = {}  # session_id -> file info
-        self.session_records: Dict[str, List[dict]] = defaultdict(list)  # session_id -> records
+        self.session_record_counts: Dict[str, int] = {}  # session_id -> 记录数
         self.session_temporal_data: List[dict] = []  # 时间序列数据
         self.logger = setup_logging("T04_Inheritance")
         
-    def analyze_session_inheritance(self, scan_result_file: str) -> Dict:
-        """分析Session ID继承机制"""
+    def analyze_session_inheritance(self, scan_result: Union[str, ScanResult]) -> Dict:
+        """分析Session ID继承机制（可传入扫描清单路径或已加载的ScanResult）"""
         
         self.logger.info("开始分析Session ID继承和更新机制...")
         
         # 加载扫描结果
-        with open(scan_result_file, 'r', encoding='utf-8') as f:
-            scan_data = json.load(f)
+        if isinstance(scan_result, str):
+            scan_result = load_scan_result(scan_result)
         
         # 收集session文件信息
-        session_files = [f for f in scan_data["file_details"] if f["file_type"] == "jsonl"]
+        session_files = [f for f in scan_result.files if f.file_type == "jsonl"]
         
         self.logger.info(f"发现 {len(session_files)} 个Session文件")
+        progress = ProgressReporter("T04", sum(f.records for f in session_files), sum(f.size for f in session_files))
         
-        # 分析每个session文件
-        for session_file in session_files:
-            session_id = session_file["session_id"]
-            self.session_files[session_id] = {
-                'path': session_file["path"],
-                'size': session_file["size"],
-                'records': session_file["records"],
-                'modified': datetime.fromisoformat(session_file["modified"]),
-                'project': session_file["project"]
-            }
-            
-            # 读取session记录来分析时间模式
-            self._load_session_records(session_file)
+        # 分析每个session文件（读取session记录来分析时间模式）
+        with prefetching(session_files):
+            for session_file in session_files:
+                self._add_session_file(session_file, *self._read_session_file(session_file))
+                progress.advance(session_file.records, session_file.size, session_file.path)
+        
+        progress.finish()
         
         # 生成分析报告
         return self._generate_inheritance_analysis()
     
-    def _load_session_records(self, session_file) -> None:
-        """加载session记录"""
+    def merge_partials(self, segments: List[Tuple[SessionFile, Optional[dict]]]) -> Dict:
+        """按文件顺序折叠各session文件的部分聚合（时间线按文件顺序拼接）并生成分析报告"""
+        for session_file, segment in segments:
+            if segment is not None:
+                self._add_session_file(session_file, segment["record_count"], segment["temporal"])
+        return self._generate_inheritance_analysis()
+    
+    def _add_session_file(self, session_file: SessionFile, record_count: Optional[int],
+                          temporal: Optional[dict]) -> None:
+        """记录一个session文件的信息、记录数与时间数据"""
+        self.session_files[session_file.session_id] = {
+            'path': session_file.path,
+            'size': session_file.size,
+            'records': session_file.records,
+            'modified': session_file.modified,
+            'project': session_file.project
+        }
+        if record_count is not None:
+            self.session_record_counts[session_file.session_id] = record_count
+        if temporal is not None:
+            self.session_temporal_data.append(temporal)
+    
+    def _read_session_file(self, session_file: SessionFile) -> Tuple[Optional[int], Optional[dict]]:
+        """读取session记录，返回 (记录数, 时间数据)，读取失败的部分为 None"""
+        record_count = None
         try:
-            with open(session_file["path"], 'r', encoding='utf-8') as f:
-                records = []
-                for line_num, line in enumerate(f, 1):
-                    if line.strip():
-                        try:
-                            record = json.loads(line)
-                            # 添加记录时间信息
-                            if 'timestamp' in record:
-                                # 统一处理为naive datetime
-                                timestamp_str = record['timestamp'].replace('Z', '').replace('+00:00', '')
-                                if '.' not in timestamp_str:
-                                    timestamp_str += '.000000'
-                                record['_parsed_timestamp'] = datetime.fromisoformat(timestamp_str)
-                            records.append(record)
-                        except (json.JSONDecodeError, ValueError):
-                            continue
-                
-                self.session_records[session_file["session_id"]] = records
+            records, error = read_jsonl_records(session_file.path)
+            if error is not None:
+                raise error
+            
+            count = 0
+            first = last = None  # (记录, 时间戳)
+            for record in records:
+                try:
+                    entry = (record, parse_record_timestamp(record))
+                except ValueError:
+                    continue
+                count += 1
+                first = first or entry
+                last = entry
+            
+            record_count = count
+            if count:
+                return record_count, self._session_temporal(session_file, count, first, last)
                 
-                # 分析文件创建时间 vs 首条记录时间
-                if records:
-                    first_record_time = records[0].get('_parsed_timestamp')
-                    last_record_time = records[-1].get('_parsed_timestamp') if len(records) > 1 else first_record_time
-                    
-                    self.session_temporal_data.append({
-                        'session_id': session_file["session_id"],
-                        'project': session_file["project"],
-                        'file_modified': datetime.fromisoformat(session_file["modified"]),
-                        'first_record_time': first_record_time,
-                        'last_record_time': last_record_time,
-                        'record_count': len(records),
-                        'file_size': session_file["size"],
-                        'time_span_hours': (last_record_time - first_record_time).total_seconds() / 3600 if first_record_time and last_record_time else 0
-                    })
-                    
         except Exception as e:
-            self.logger.warning(f"无法读取session文件 {session_file['path']}: {e}")
+            self.logger.warning(f"无法读取session文件 {session_file.path}: {e}")
+        
+        return record_count, None
+    
+    def _session_temporal(self, session_file: SessionFile, record_count: int,
+                          first: Tuple[Any, Optional[datetime]], last: Tuple[Any, Optional[datetime]]) -> dict:
+        """
+        由首末条记录生成session的时间数据（分析文件创建时间 vs 首条记录时间）
+        
+        Raises:
+            AttributeError: 首条或末条记录不是JSON对象
+        """
+        first_record, first_record_time = first
+        last_record, last_record_time = last if record_count > 1 else first
+        if not isinstance(first_record, dict) or not isinstance(last_record, dict):
+            raise AttributeError("首条或末条记录不是JSON对象")
+        
+        return {
+            'session_id': session_file.session_id,
+            'project': session_file.project,
+            'file_modified': session_file.modified,
+            'first_record_time': first_record_time,
+            'last_record_time': last_record_time,
+            'record_count': record_count,
+            'file_size': session_file.size,
+            'time_span_hours': (last_record_time - first_record_time).total_seconds() / 3600 if first_record_time and last_record_time else 0
+        }
     
     def _generate_inheritance_analysis(self) -> Dict:
         """生成继承机制分析报告"""
@@ -114,7 +166,7 @@ class SessionInheritanceAnalyzer:
             "summary": {
                 "total_sessions": len(self.session_files),
                 "sessions_with_records": len([s for s in self.session_temporal_data if s['record_count'] > 0]),
-                "total_records": sum(len(records) for records in self.session_records.values())
+                "total_records": sum(self.session_record_counts.values())
             },
             "file_creation_patterns": self._analyze_file_creation_patterns(),
             "session_timing_analysis": self._analyze_session_timing(),
@@ -341,35 +393,155 @@ class SessionInheritanceAnalyzer:
         return min(score, 1.0)
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python inheritance_analyzer.py <output_dir>")
-        sys.exit(1)
+class SessionTimingVisitor(FileBasedAnalyzer):
+    """单次遍历语料时的T04访问者：只保留每个session文件的记录数与首末条记录，不修改共享的记录"""
+    
+    file_types = ("jsonl",)
+    
+    def __init__(self, output_dir: Union[str, Path] = "outputs"):
+        super().__init__("T04 Session ID继承机制分析", output_dir=str(output_dir))
+        self.analyzer = SessionInheritanceAnalyzer()
+        self.record_count = 0
+        self.first = self.last = None  # (记录, 时间戳)
+        
+    def begin_file(self, file_info: SessionFile) -> None:
+        self.record_count = 0
+        self.first = self.last = None
+        
+    def process_record(self, record: Dict[str, Any]) -> None:
+        try:
+            entry = (record, parse_record_timestamp(record))
+        except ValueError:
+            return
+        self.record_count += 1
+        self.first = self.first or entry
+        self.last = entry
+        
+    def end_file(self, file_info: SessionFile, error: Optional[Exception] = None) -> None:
+        record_count, temporal = None, None
+        try:
+            if error is not None:
+                raise error
+            record_count = self.record_count
+            if record_count:
+                temporal = self.analyzer._session_temporal(file_info, record_count, self.first, self.last)
+        except Exception as e:
+            self.analyzer.logger.warning(f"无法读取session文件 {file_info.path}: {e}")
+        
+        self.analyzer._add_session_file(file_info, record_count, temporal)
+        self.first = self.last = None
+        
+    def analyze(self, scan_result: ScanResult) -> Dict:
+        """单独读取一遍语料，返回继承机制分析报告"""
+        session_files = [f for f in scan_result.files if f.file_type == "jsonl"]
+        CorpusReader([self]).read(scan_result, ProgressReporter("T04", sum(f.records for f in session_files),
+                                                                 sum(f.size for f in session_files)))
+        return self.analyzer._generate_inheritance_analysis()
+        
+    def get_output_paths(self) -> Dict[str, str]:
+        return {"session_inheritance_analysis.json": str(self.output_dir / "session_inheritance_analysis.json")}
+
+
+def create_corpus_visitor(output_dir: Path) -> SessionTimingVisitor:
+    """调度器单次遍历模式使用的访问者"""
+    return SessionTimingVisitor(output_dir)
+
+
+def read_session_partials(scan_result: ScanResult) -> Dict[str, Any]:
+    """逐个session文件读取记录数与时间数据 (文件路径 -> 部分聚合，todos 文件为 None)"""
+    analyzer = SessionInheritanceAnalyzer()
+    session_files = [f for f in scan_result.files if f.file_type == "jsonl"]
+    progress = ProgressReporter("T04", sum(f.records for f in session_files), sum(f.size for f in session_files))
+    
+    segments = {f.path: None for f in scan_result.files}
+    with prefetching(session_files):
+        for session_file in session_files:
+            record_count, temporal = analyzer._read_session_file(session_file)
+            segments[session_file.path] = {"record_count": record_count, "temporal": temporal}
+            progress.advance(session_file.records, session_file.size, session_file.path)
     
-    output_dir = Path(sys.argv[1])
+    progress.finish()
+    return segments
+
+
+class SessionTimingFold(IncrementalFold):
+    """增量模式与多进程时的T04折叠方式：每个session文件（或其中一段）只保存记录数与首末条记录"""
+    
+    file_types = ("jsonl",)
+    splittable = True
+    
+    def __init__(self):
+        self.analyzer = SessionInheritanceAnalyzer()
+        
+    def new_state(self, file_info: SessionFile) -> Dict[str, Any]:
+        return {"count": 0, "first": None, "last": None}  # 首末条为 (记录, 时间戳)
+        
+    def fold(self, state: Dict[str, Any], records: List[Any]) -> None:
+        for record in records:
+            try:
+                entry = (record, parse_record_timestamp(record))
+            except ValueError:
+                continue
+            state["count"] += 1
+            state["first"] = state["first"] or entry
+            state["last"] = entry
+            
+    def merge_states(self, state: Dict[str, Any], later: Dict[str, Any]) -> Dict[str, Any]:
+        # 首条取前一段的（前一段没有有效记录时取后一段的），末条取后一段的
+        return {
+            "count": state["count"] + later["count"],
+            "first": state["first"] or later["first"],
+            "last": later["last"] or state["last"]
+        }
+        
+    def segment(self, state: Dict[str, Any], file_info: SessionFile) -> Dict[str, Any]:
+        temporal = None
+        if state["count"]:
+            try:
+                temporal = self.analyzer._session_temporal(file_info, state["count"], state["first"], state["last"])
+            except Exception as e:
+                self.analyzer.logger.warning(f"无法读取session文件 {file_info.path}: {e}")
+        return {"record_count": state["count"], "temporal": temporal}
+        
+    def full_segment(self, file_info: SessionFile) -> Dict[str, Any]:
+        record_count, temporal = self.analyzer._read_session_file(file_info)
+        return {"record_count": record_count, "temporal": temporal}
+
+
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行继承机制分析任务，返回供下游任务在进程内复用的输出"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     print("🆔 T04: Session ID继承机制分析任务")
     print("=" * 50)
     
-    # 查找T06的扫描结果
-    scan_result_file = output_dir.parent / "T06_data_scan" / "scan_results.json"
-    if not scan_result_file.exists():
-        print(f"❌ 依赖文件不存在: {scan_result_file}")
-        print("   请先执行 T06 数据源扫描任务")
-        sys.exit(1)
+    # 获取T06的扫描结果
+    scan_result = resolve_scan_result(output_dir, context)
+    
+    # 分片模式：只处理本分片的文件并保存部分聚合
+    if requested_shard():
+        run_shard(output_dir, "T04", scan_result, read_session_partials)
+        return {}
     
     # 创建分析器
     analyzer = SessionInheritanceAnalyzer()
     
-    # 执行分析
-    analysis = analyzer.analyze_session_inheritance(str(scan_result_file))
+    # 执行分析（合并模式、增量模式与多进程时折叠各文件的部分聚合；单次遍历模式下调度器已读取全部语料）
+    visitor = take_corpus_visitor(context, "T04")
+    if requested_merge():
+        analysis = analyzer.merge_partials(load_shard_segments(output_dir, "T04", scan_result))
+    elif requested_incremental():
+        analysis = analyzer.merge_partials(update_incremental(output_dir, scan_result, SessionTimingFold()))
+    elif visitor is not None:
+        analysis = visitor.analyzer._generate_inheritance_analysis()
+    elif requested_workers() > 1:
+        analysis = analyzer.merge_partials(parallel_segments(scan_result, SessionTimingFold(), "T04"))
+    else:
+        analysis = analyzer.analyze_session_inheritance(scan_result)
     
     # 保存分析报告
-    analysis_file = output_dir / "session_inheritance_analysis.json"
-    with open(analysis_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, ensure_ascii=False, indent=2)
+    analysis_file = save_json_outputs({"session_inheritance_analysis.json": analysis}, output_dir)[0]
     
     # 打印摘要
     summary = analysis["summary"]
@@ -398,6 +570,22 @@ def main():
     print(f"   文件继续写入: {storage['file_continuation']}个")
     
     print(f"\\n🎉 T04任务完成! 详细报告已保存到: {analysis_file}")
+    
+    return {"session_inheritance_analysis.json": analysis}
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python inheritance_analyzer.py <output_dir>")
+        sys.exit(1)
+    
+    try:
+        execute(Path(sys.argv[1]))
+    except MissingDependencyError as e:
+        print(f"❌ 依赖文件不存在: {e.filename}")
+        print("   请先执行 T06 数据源扫描任务")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -11,14 +11,17 @@ import re
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict, Counter
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Set, Tuple, Any, Optional, Union
 
 # 添加项目根目录到路径
 current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.utils import setup_logging
+from shared.models import ScanResult, SessionFile
+from shared.manifest import load_scan_result, resolve_scan_result
+from shared.sharding import requested_shard, requested_merge, run_shard, load_shard_segments
+from shared.utils import setup_logging, save_json_outputs, MissingDependencyError
 
 
 class SessionTodosRelationshipAnalyzer:
@@ -28,24 +31,29 @@ class SessionTodosRelationshipAnalyzer:
         self.session_todos_map: Dict[str, List[dict]] = defaultdict(list)  # session_id -> todos files
         self.agent_session_map: Dict[str, Set[str]] = defaultdict(set)     # agent_id -> session_ids
         self.todos_pattern = re.compile(r'([a-f0-9-]+)-agent-([a-f0-9-]+)\.json$')
-        self.session_files: Dict[str, dict] = {}  # session_id -> session file info
-        self.todos_files: List[dict] = []
+        self.session_files: Dict[str, SessionFile] = {}  # session_id -> session file info
+        self.todos_files: List[SessionFile] = []
         self.logger = setup_logging("T05_Relationship")
         
-    def analyze_relationship_patterns(self, scan_result_file: str) -> Dict:
-        """分析Session-Todos关系模式"""
+    def analyze_relationship_patterns(self, scan_result: Union[str, ScanResult],
+                                      todos_links: Optional[Dict[str, Optional[Tuple[str, str]]]] = None) -> Dict:
+        """
+        分析Session-Todos关系模式（可传入扫描清单路径或已加载的ScanResult）
+        
+        合并分片结果时传入各分片已解析的 todos 文件名 (文件路径 -> (session_id, agent_id))
+        """
         
         self.logger.info("开始分析Session-Todos复杂关系...")
         
         # 加载扫描结果
-        with open(scan_result_file, 'r', encoding='utf-8') as f:
-            scan_data = json.load(f)
+        if isinstance(scan_result, str):
+            scan_result = load_scan_result(scan_result)
         
-        file_details = scan_data.get("file_details", [])
+        file_details = scan_result.files
         
         # 分离Session和Todos文件
-        session_files = [f for f in file_details if f["file_type"] == "jsonl"]
-        self.todos_files = [f for f in file_details if f["file_type"] == "json"]
+        session_files = [f for f in file_details if f.file_type == "jsonl"]
+        self.todos_files = [f for f in file_details if f.file_type == "json"]
         
         self.logger.info(f"文件统计:")
         self.logger.info(f"Session文件 (.jsonl): {len(session_files)}")
@@ -53,24 +61,22 @@ class SessionTodosRelationshipAnalyzer:
         
         # 构建Session文件索引
         for session_file in session_files:
-            session_id = session_file["session_id"]
-            self.session_files[session_id] = session_file
+            self.session_files[session_file.session_id] = session_file
         
         # 分析Todos文件命名模式
         self.logger.info("分析Todos文件命名模式...")
         
         for todos_file in self.todos_files:
-            filename = Path(todos_file["path"]).name
-            match = self.todos_pattern.match(filename)
-            if match:
-                session_id, agent_id = match.groups()
+            link = todos_links[todos_file.path] if todos_links is not None else self.parse_todos_filename(todos_file)
+            if link:
+                session_id, agent_id = link
                 
                 # 建立Session-Todos映射
                 self.session_todos_map[session_id].append({
-                    'file_path': todos_file["path"],
+                    'file_path': todos_file.path,
                     'agent_id': agent_id,
-                    'modified': todos_file["modified"],
-                    'size': todos_file["size"]
+                    'modified': todos_file.modified.isoformat(),
+                    'size': todos_file.size
                 })
                 
                 # 建立Agent-Session映射
@@ -79,6 +85,11 @@ class SessionTodosRelationshipAnalyzer:
         # 生成分析报告
         return self._generate_relationship_analysis()
     
+    def parse_todos_filename(self, todos_file: SessionFile) -> Optional[Tuple[str, str]]:
+        """从 todos 文件名解析 (session_id, agent_id)，不符合命名模式时返回 None"""
+        match = self.todos_pattern.match(Path(todos_file.path).name)
+        return match.groups() if match else None
+    
     def _generate_relationship_analysis(self) -> Dict:
         """生成关系分析报告"""
         
@@ -109,11 +120,11 @@ class SessionTodosRelationshipAnalyzer:
                 
                 session_detail = {
                     "session_id": session_id,
-                    "project": session_info["project"],
+                    "project": session_info.project,
                     "todos_count": len(todos_list),
                     "unique_agents": len(set(agent_ids)),
                     "has_self_agent": session_id in agent_ids,
-                    "session_records": session_info["records"],
+                    "session_records": session_info.records,
                     "time_span_hours": time_span,
                     "agent_pattern": self._analyze_agent_pattern(agent_ids)
                 }
@@ -187,11 +198,11 @@ class SessionTodosRelationshipAnalyzer:
                     
                     complex_sessions.append({
                         'session_id': session_id,
-                        'project': session_info["project"],
+                        'project': session_info.project,
                         'todos_count': len(todos_list),
                         'unique_agents': len(set(agent_ids)),
                         'has_self_agent': session_id in agent_ids,
-                        'session_records': session_info["records"],
+                        'session_records': session_info.records,
                         'time_span_hours': time_span,
                         'agent_pattern': self._analyze_agent_pattern(agent_ids)
                     })
@@ -220,35 +231,42 @@ class SessionTodosRelationshipAnalyzer:
             return "mixed_agents"
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python relationship_analyzer.py <output_dir>")
-        sys.exit(1)
-    
-    output_dir = Path(sys.argv[1])
+def parse_todos_partials(scan_result: ScanResult) -> Dict[str, Any]:
+    """逐个 todos 文件解析文件名 (文件路径 -> (session_id, agent_id)，会话文件为 None)"""
+    analyzer = SessionTodosRelationshipAnalyzer()
+    return {
+        f.path: analyzer.parse_todos_filename(f) if f.file_type == "json" else None
+        for f in scan_result.files
+    }
+
+
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行Session-Todos关系分析任务，返回供下游任务在进程内复用的输出"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     print("🕸️ T05: Session-Todos关系分析任务")
     print("=" * 50)
     
-    # 查找T06的扫描结果
-    scan_result_file = output_dir.parent / "T06_data_scan" / "scan_results.json"
-    if not scan_result_file.exists():
-        print(f"❌ 依赖文件不存在: {scan_result_file}")
-        print("   请先执行 T06 数据源扫描任务")
-        sys.exit(1)
+    # 获取T06的扫描结果
+    scan_result = resolve_scan_result(output_dir, context)
+    
+    # 分片模式：只处理本分片的文件并保存部分聚合
+    if requested_shard():
+        run_shard(output_dir, "T05", scan_result, parse_todos_partials)
+        return {}
     
     # 创建分析器
     analyzer = SessionTodosRelationshipAnalyzer()
     
-    # 执行分析
-    analysis = analyzer.analyze_relationship_patterns(str(scan_result_file))
+    # 执行分析（合并模式下使用各分片解析的 todos 文件名）
+    todos_links = None
+    if requested_merge():
+        todos_links = {f.path: link for f, link in load_shard_segments(output_dir, "T05", scan_result)}
+    analysis = analyzer.analyze_relationship_patterns(scan_result, todos_links)
     
     # 保存分析报告
-    analysis_file = output_dir / "session_todos_relationship_analysis.json"
-    with open(analysis_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, ensure_ascii=False, indent=2)
+    analysis_file = save_json_outputs({"session_todos_relationship_analysis.json": analysis}, output_dir)[0]
     
     # 打印摘要
     summary = analysis["summary"]
@@ -283,6 +301,22 @@ def main():
             print(f"      时间跨度: {rel['time_span_hours']}小时")
     
     print(f"\\n🎉 T05任务完成! 详细报告已保存到: {analysis_file}")
+    
+    return {"session_todos_relationship_analysis.json": analysis}
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python relationship_analyzer.py <output_dir>")
+        sys.exit(1)
+    
+    try:
+        execute(Path(sys.argv[1]))
+    except MissingDependencyError as e:
+        print(f"❌ 依赖文件不存在: {e.filename}")
+        print("   请先执行 T06 数据源扫描任务")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
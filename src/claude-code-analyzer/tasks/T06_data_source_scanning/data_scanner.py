@@ -9,6 +9,7 @@ import os
 import json
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, Any, Optional
 
 # 添加项目根目录到路径
 current_dir = Path(__file__).parent
@@ -16,17 +17,26 @@ project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
 from shared.models import SessionFile, ScanResult
-from shared.utils import setup_logging
+from shared.manifest import build_scan_report
+from shared.json_backend import read_json_file
+from shared.compressed import session_stem, is_compressed, is_archive, open_text, DECOMPRESS_ERRORS
+from shared.compaction import BLOB_DIRNAME
+from shared.incremental import requested_incremental, complete_line_offset, file_anchor, count_lines
+from shared.progress import ProgressReporter
+from shared.utils import setup_logging, save_json_outputs
 
 
 class DataSourceScanner:
     """数据源扫描器"""
     
-    def __init__(self, base_dir: str = None):
+    def __init__(self, base_dir: str = None, previous: Optional[Dict[str, Any]] = None):
         self.base_dir = base_dir or os.path.expanduser("~/.claude")
+        # 上次扫描的文件明细（路径 -> 明细），增量模式下会话文件只统计新增部分的行数
+        self.previous = previous or {}
         self.projects_dir = os.path.join(self.base_dir, "projects")
         self.todos_dir = os.path.join(self.base_dir, "todos")
         self.logger = setup_logging("T06_DataScanner")
+        self.progress: Optional[ProgressReporter] = None
     
     def scan_all(self) -> ScanResult:
         """扫描所有会话文件"""
@@ -35,6 +45,7 @@ class DataSourceScanner:
         result = ScanResult()
         projects = set()
         dates = []
+        self.progress = ProgressReporter("T06")  # 扫描前总量未知，只上报已处理量
         
         # 扫描projects目录
         if os.path.exists(self.projects_dir):
@@ -50,6 +61,8 @@ class DataSourceScanner:
             result.files.extend(todo_files)
             self.logger.info(f"找到 {len(todo_files)} 个todo文件")
         
+        self.progress.finish()
+        
         # 统计结果
         for file in result.files:
             projects.add(file.project)
@@ -75,14 +88,14 @@ class DataSourceScanner:
         return result
     
     def _scan_projects(self):
-        """扫描projects目录"""
+        """扫描projects目录（含归档为 .jsonl.gz / .jsonl.xz / .cjsonl 的会话文件）"""
         for project in os.listdir(self.projects_dir):
             project_path = os.path.join(self.projects_dir, project)
-            if not os.path.isdir(project_path):
+            if project == BLOB_DIRNAME or not os.path.isdir(project_path):
                 continue
                 
             for filename in os.listdir(project_path):
-                if filename.endswith('.jsonl'):
+                if session_stem(filename) is not None:
                     file_path = os.path.join(project_path, filename)
                     yield self._create_file_info(file_path, project, "jsonl")
     
@@ -98,16 +111,27 @@ class DataSourceScanner:
     def _create_file_info(self, file_path: str, project: str, file_type: str) -> SessionFile:
         """创建文件信息"""
         stat = os.stat(file_path)
-        session_id = os.path.splitext(os.path.basename(file_path))[0]
+        filename = os.path.basename(file_path)
+        session_id = session_stem(filename) if file_type == "jsonl" else os.path.splitext(filename)[0]
         
         # 提取会话ID（去除agent部分）
         if '-agent-' in session_id:
             session_id = session_id.split('-agent-')[0]
         
-        # 计算记录数
-        records = self._count_records(file_path, file_type)
+        # 计算记录数（未归档的会话文件同时记录增量读取用的偏移与锚点）
+        if file_type == "jsonl" and not is_archive(file_path):
+            offsets = self._scan_offsets(file_path, stat.st_size)
+            records = offsets[2] if offsets else self._count_records(file_path, file_type)
+        elif file_type == "jsonl":
+            offsets = None
+            records = self._archived_records(file_path, stat)
+        else:
+            offsets = None
+            records = self._count_records(file_path, file_type)
+        if self.progress:
+            self.progress.advance(records, stat.st_size, file_path)
         
-        return SessionFile(
+        file_info = SessionFile(
             path=file_path,
             size=stat.st_size,
             session_id=session_id,
@@ -116,80 +140,101 @@ class DataSourceScanner:
             records=records,
             file_type=file_type
         )
+        if offsets:
+            file_info.complete_bytes, file_info.complete_records = offsets[0], offsets[1]
+            file_info.anchor = offsets[3]
+        return file_info
+    
+    def _scan_offsets(self, file_path: str, size: int):
+        """
+        统计会话文件的记录数，同时得到最后一个完整行之后的偏移与锚点
+        
+        Returns:
+            (完整行偏移, 之前的记录数, 记录总数, 锚点)，内容不是有效的 UTF-8 或文件已消失时为 None
+        """
+        try:
+            offset = complete_line_offset(file_path, size)
+            previous = self._resumable(file_path, offset)
+            if previous is not None:
+                # 文件只在末尾追加：上次完整行之前的记录数加上此后的行数
+                previous_offset, previous_records = previous
+                complete_records = previous_records + count_lines(file_path, previous_offset, offset)
+            else:
+                complete_records = count_lines(file_path, 0, offset)
+            records = complete_records + count_lines(file_path, offset, size)
+            return offset, complete_records, records, file_anchor(file_path, offset)
+        except (UnicodeDecodeError, FileNotFoundError):
+            return None
     
     def _count_records(self, file_path: str, file_type: str) -> int:
         """计算记录数"""
         try:
             if file_type == "jsonl":
-                with open(file_path, 'r', encoding='utf-8') as f:
+                with open_text(file_path) as f:
                     return sum(1 for line in f if line.strip())
             else:  # json
                 return 1
         except (UnicodeDecodeError, FileNotFoundError):
             return 0
+        except DECOMPRESS_ERRORS as e:
+            if not is_compressed(file_path):
+                raise
+            self.logger.warning(f"无法解压 {file_path}: {e}")
+            return 0
+    
+    def _archived_records(self, file_path: str, stat: os.stat_result) -> int:
+        """归档会话文件的记录数：大小与修改时间和上次扫描相同时直接复用，否则（解压后）统计"""
+        detail = self.previous.get(file_path)
+        if (detail and detail.get("size") == stat.st_size
+                and detail.get("modified") == datetime.fromtimestamp(stat.st_mtime).isoformat()):
+            return detail.get("records", 0)
+        return self._count_records(file_path, "jsonl")
+    
+    def _resumable(self, file_path: str, offset: int):
+        """上次扫描的 (完整行偏移, 之前的记录数)，文件在该偏移之前有变化时为 None"""
+        detail = self.previous.get(file_path)
+        if not detail or detail.get("complete_records") is None or not detail.get("anchor"):
+            return None
+        previous_offset = detail["complete_bytes"]
+        if previous_offset > offset or file_anchor(file_path, previous_offset) != detail["anchor"]:
+            return None
+        return previous_offset, detail["complete_records"]
     
     def _is_valid_json(self, file_path: str) -> bool:
         """检查JSON文件是否有效"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json.load(f)
+            read_json_file(file_path)
             return True
         except (json.JSONDecodeError, UnicodeDecodeError):
             return False
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python data_scanner.py <output_dir>")
-        sys.exit(1)
-    
-    output_dir = Path(sys.argv[1])
+def _load_previous_details(output_dir: Path) -> Dict[str, Any]:
+    """上次扫描报告中的文件明细（路径 -> 明细）"""
+    try:
+        with open(output_dir / "scan_results.json", 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {detail["path"]: detail for detail in report.get("file_details", []) if "path" in detail}
+
+
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行扫描任务，返回供下游任务在进程内复用的结果"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     print("🔍 T06: 数据源扫描分析任务")
     print("=" * 50)
     
-    # 执行扫描
-    scanner = DataSourceScanner()
+    # 执行扫描（增量模式下复用上次扫描的行数）
+    previous = _load_previous_details(output_dir) if requested_incremental() else None
+    scanner = DataSourceScanner(previous=previous)
     scan_result = scanner.scan_all()
     
-    # 生成扫描报告
-    report = {
-        "task_id": "T06",
-        "task_name": "数据源扫描分析",
-        "execution_time": datetime.now().isoformat(),
-        "scan_summary": {
-            "total_files": scan_result.total_files,
-            "total_records": scan_result.total_records,
-            "total_size_mb": round(scan_result.total_size / 1024 / 1024, 2),
-            "projects_count": len(scan_result.projects),
-            "session_files": len([f for f in scan_result.files if f.file_type == "jsonl"]),
-            "todos_files": len([f for f in scan_result.files if f.file_type == "json"])
-        },
-        "projects": scan_result.projects,
-        "date_range": {
-            "start": scan_result.date_range[0].isoformat() if scan_result.date_range else None,
-            "end": scan_result.date_range[1].isoformat() if scan_result.date_range else None
-        },
-        "file_details": [
-            {
-                "path": f.path,
-                "session_id": f.session_id,
-                "project": f.project,
-                "size": f.size,
-                "records": f.records,
-                "file_type": f.file_type,
-                "modified": f.modified.isoformat()
-            }
-            for f in scan_result.files
-        ]
-    }
-    
-    # 保存扫描结果
-    scan_file = output_dir / "scan_results.json"
-    with open(scan_file, 'w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    # 生成并保存扫描报告
+    report = build_scan_report(scan_result)
+    scan_file = save_json_outputs({"scan_results.json": report}, output_dir)[0]
     
     print(f"✅ T06 任务完成")
     print(f"📊 扫描结果:")
@@ -198,6 +243,17 @@ def main():
     print(f"   数据大小: {scan_result.total_size / 1024 / 1024:.2f} MB")
     print(f"   项目数量: {len(scan_result.projects)}")
     print(f"💾 结果已保存: {scan_file}")
+    
+    return {"scan_result": scan_result, "scan_results.json": report}
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python data_scanner.py <output_dir>")
+        sys.exit(1)
+    
+    execute(Path(sys.argv[1]))
 
 
 if __name__ == "__main__":
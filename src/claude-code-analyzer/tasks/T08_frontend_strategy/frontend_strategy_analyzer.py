@@ -9,14 +9,14 @@ import os
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Union
 
 # 添加项目根目录到路径
 current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent
 sys.path.insert(0, str(project_root))
 
-from shared.utils import setup_logging
+from shared.utils import setup_logging, save_json_outputs, resolve_upstream_output, MissingDependencyError
 
 
 class FrontendStrategyAnalyzer:
@@ -25,20 +25,16 @@ class FrontendStrategyAnalyzer:
     def __init__(self):
         self.logger = setup_logging("T08_Frontend")
     
-    def analyze_frontend_strategy(self, field_result_file: str, type_result_file: str, cover_result_file: str) -> Dict:
-        """分析前端展示策略"""
+    def analyze_frontend_strategy(self, field_result: Union[str, Dict], type_result: Union[str, Dict],
+                                  cover_result: Union[str, Dict]) -> Dict:
+        """分析前端展示策略（依赖结果可传入文件路径或已加载的数据）"""
         
         self.logger.info("开始分析前端展示策略...")
         
         # 加载依赖分析结果
-        with open(field_result_file, 'r', encoding='utf-8') as f:
-            field_data = json.load(f)
-        
-        with open(type_result_file, 'r', encoding='utf-8') as f:
-            type_data = json.load(f)
-        
-        with open(cover_result_file, 'r', encoding='utf-8') as f:
-            cover_data = json.load(f)
+        field_data = self._load_result(field_result)
+        type_data = self._load_result(type_result)
+        cover_data = self._load_result(cover_result)
         
         # 生成前端策略分析
         analysis = {
@@ -56,6 +52,13 @@ class FrontendStrategyAnalyzer:
         
         return analysis
     
+    def _load_result(self, result: Union[str, Dict]) -> Dict:
+        """加载依赖分析结果"""
+        if isinstance(result, dict):
+            return result
+        with open(result, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
     def _design_data_visualization(self, field_data: Dict, type_data: Dict, cover_data: Dict) -> Dict:
         """设计数据可视化策略"""
         
@@ -382,51 +385,40 @@ class FrontendStrategyAnalyzer:
         }
 
 
-def main():
-    """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python frontend_strategy_analyzer.py <output_dir>")
-        sys.exit(1)
-    
-    output_dir = Path(sys.argv[1])
+def execute(output_dir: Path, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行前端策略分析任务，上游结果优先取自进程内上下文"""
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     print("🎨 T08: 前端展示策略分析任务")
     print("=" * 50)
     
-    # 查找依赖文件
-    field_result_file = output_dir.parent / "T01_field_extraction" / "deduplicated_fields.json"
-    type_result_file = output_dir.parent / "T02_structure_types" / "object_types_summary.json"
-    cover_result_file = output_dir.parent / "T03_set_cover" / "coverage_analysis.json"
+    # 获取依赖结果
+    dependencies = {
+        "T01字段提取结果": ("T01", "T01_field_extraction", "deduplicated_fields.json"),
+        "T02类型分析结果": ("T02", "T02_structure_types", "object_types_summary.json"),
+        "T03集合覆盖结果": ("T03", "T03_set_cover", "coverage_analysis.json")
+    }
     
-    # 检查依赖文件
+    upstream = {}
     missing_deps = []
-    if not field_result_file.exists():
-        missing_deps.append("T01字段提取结果")
-    if not type_result_file.exists():
-        missing_deps.append("T02类型分析结果")
-    if not cover_result_file.exists():
-        missing_deps.append("T03集合覆盖结果")
+    for dep_name, (task_id, upstream_dir, filename) in dependencies.items():
+        try:
+            upstream[task_id] = resolve_upstream_output(output_dir, context, task_id, upstream_dir, filename)
+        except MissingDependencyError:
+            missing_deps.append(dep_name)
     
     if missing_deps:
-        print(f"❌ 缺少依赖文件: {', '.join(missing_deps)}")
-        print("   请先执行相应的依赖任务")
-        sys.exit(1)
+        raise MissingDependencyError(2, f"缺少依赖文件: {', '.join(missing_deps)}")
     
     # 创建分析器
     analyzer = FrontendStrategyAnalyzer()
     
     # 执行分析
-    analysis = analyzer.analyze_frontend_strategy(
-        str(field_result_file),
-        str(type_result_file),
-        str(cover_result_file)
-    )
+    analysis = analyzer.analyze_frontend_strategy(upstream["T01"], upstream["T02"], upstream["T03"])
     
     # 保存设计规范
-    design_file = output_dir / "frontend_design_spec.json"
-    with open(design_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, ensure_ascii=False, indent=2)
+    design_file = save_json_outputs({"frontend_design_spec.json": analysis}, output_dir)[0]
     
     # 提取并保存技术架构
     tech_architecture = {
@@ -438,9 +430,7 @@ def main():
         "component_specifications": analysis["component_library"]
     }
     
-    tech_file = output_dir / "technical_architecture.json"
-    with open(tech_file, 'w', encoding='utf-8') as f:
-        json.dump(tech_architecture, f, ensure_ascii=False, indent=2)
+    tech_file = save_json_outputs({"technical_architecture.json": tech_architecture}, output_dir)[0]
     
     # 打印摘要
     ui_arch = analysis["ui_architecture"]
@@ -467,6 +457,25 @@ def main():
     print(f"   • 技术架构文档: {tech_file}")
     
     print(f"\\n🎉 T08任务完成!")
+    
+    return {
+        "frontend_design_spec.json": analysis,
+        "technical_architecture.json": tech_architecture
+    }
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2:
+        print("Usage: python frontend_strategy_analyzer.py <output_dir>")
+        sys.exit(1)
+    
+    try:
+        execute(Path(sys.argv[1]))
+    except MissingDependencyError as e:
+        print(f"❌ {e.strerror}")
+        print("   请先执行相应的依赖任务")
+        sys.exit(1)
 
 
 if __name__ == "__main__":